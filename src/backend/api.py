@@ -4,28 +4,32 @@ Main backend service that integrates AGI reasoning with Sui blockchain operation
 This serves as the bridge between the React frontend and the backend services.
 """
 
+import functools
 import json
 import time
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
-from flask import Flask, request, jsonify
+from typing import Callable, List, Dict, Any, Optional
+from dataclasses import asdict
+from flask import Flask, Response, request, jsonify, make_response
 from flask_cors import CORS
 
 # Import our custom modules
-from metta_integration import AGI_HerBid_Engine, PartnershipRecommendation, TeamFormation
+from api_response import APIResponse
+from idempotency import IdempotencyConflict, SQLiteIdempotencyStore, request_fingerprint
+from metta_integration import AGI_GigeBid_Engine, PartnershipRecommendation, TeamFormation
 from sui_api import SuiConnector, TeamMember, EscrowDetails, create_project_escrow_from_agi_recommendation
 
-@dataclass
-class APIResponse:
-    """Standard API response format"""
-    success: bool
-    data: Any = None
-    message: str = ""
-    error: str = ""
-
 class GigeBidBackendAPI:
     """Main backend API service for GigeBid platform"""
     
+    # Page size used when a client sends a cursor without a limit
+    DEFAULT_PAGE_SIZE = 10
+    
+    # Upper bound on pairs accepted by the batch scoring endpoint
+    MAX_SCORE_BATCH_SIZE = 10000
+    
+    # Upper bound on teams returned by the ranked teams endpoint
+    MAX_RANKED_TEAMS = 50
+    
     def __init__(self):
         """Initialize the backend services"""
         self.app = Flask(__name__)
@@ -35,11 +39,59 @@ class GigeBidBackendAPI:
         self.agi_engine = AGI_GigeBid_Engine()
         self.sui_connector = SuiConnector("devnet")
         
+        # Responses of keyed escrow requests, replayed to client retries.
+        # Kept in the ledger database, so a retry may reach any gunicorn worker.
+        self.idempotency = SQLiteIdempotencyStore()
+        
         # Setup API routes
         self._setup_routes()
         
         print("GigeBid Backend API initialized successfully")
     
+    def _idempotent(self, scope: str) -> Callable:
+        """
+        Decorate a route so requests with an Idempotency-Key header run once.
+        
+        Retries with the same key and body get the stored response back, marked
+        with an Idempotent-Replayed header; duplicates arriving while the first
+        request is running wait for it. 5xx responses are not stored, so a retry
+        after a server error runs again. Reusing a key with a different body is
+        rejected with 422.
+        
+        Args:
+            scope: Namespace for the route's keys
+        """
+        def decorator(view: Callable) -> Callable:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = request.headers.get('Idempotency-Key')
+                if not key:
+                    return view(*args, **kwargs)
+                
+                def compute():
+                    response = make_response(view(*args, **kwargs))
+                    return response.get_data(as_text=True), response.status_code, response.mimetype
+                
+                try:
+                    (body, status, mimetype), replayed = self.idempotency.run(
+                        (scope, key),
+                        request_fingerprint(request.get_data(as_text=True), kwargs),
+                        compute,
+                        cacheable=lambda result: result[1] < 500
+                    )
+                except IdempotencyConflict as e:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error=str(e)
+                    ))), 422
+                
+                response = Response(body, status=status, mimetype=mimetype)
+                if replayed:
+                    response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            return wrapper
+        return decorator
+    
     def _setup_routes(self):
         """Setup all API routes"""
         
@@ -48,17 +100,24 @@ class GigeBidBackendAPI:
             """Health check endpoint"""
             return jsonify(asdict(APIResponse(
                 success=True,
-                data={"status": "healthy", "timestamp": time.time()},
+                data={
+                    "status": "healthy",
+                    "timestamp": time.time(),
+                    "agi_cache": self.agi_engine.get_cache_stats()
+                },
                 message="GigeBid Backend API is running"
             )))
         
         @self.app.route('/api/partnerships/find', methods=['POST'])
         def find_partnerships():
-            """Find partnership recommendations"""
+            """Find partnership recommendations, optionally page by page"""
             try:
                 data = request.json
                 business_name = data.get('business_name')
                 contract_name = data.get('contract_name')
+                limit = data.get('limit')
+                min_score = data.get('min_score')
+                cursor = data.get('cursor')
                 
                 if not business_name or not contract_name:
                     return jsonify(asdict(APIResponse(
@@ -66,7 +125,44 @@ class GigeBidBackendAPI:
                         error="Missing required fields: business_name, contract_name"
                     ))), 400
                 
-                recommendations = self.agi_engine.find_partners(business_name, contract_name)
+                try:
+                    limit = int(limit) if limit is not None else None
+                    min_score = float(min_score) if min_score is not None else None
+                    if limit is not None and limit < 1:
+                        raise ValueError("limit must be at least 1")
+                except (TypeError, ValueError) as e:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error=f"Invalid paging parameters: {e}"
+                    ))), 400
+                
+                if cursor is not None or limit is not None:
+                    # Paged mode: return one page plus the cursor for the next one
+                    try:
+                        recommendations, next_cursor = self.agi_engine.find_partners_page(
+                            business_name, contract_name,
+                            limit=limit or self.DEFAULT_PAGE_SIZE,
+                            cursor=cursor,
+                            min_score=min_score
+                        )
+                    except ValueError as e:
+                        return jsonify(asdict(APIResponse(
+                            success=False,
+                            error=str(e)
+                        ))), 400
+                    
+                    return jsonify(asdict(APIResponse(
+                        success=True,
+                        data={
+                            "recommendations": [asdict(rec) for rec in recommendations],
+                            "next_cursor": next_cursor
+                        },
+                        message=f"Found {len(recommendations)} partnership recommendations"
+                    )))
+                
+                recommendations = self.agi_engine.find_partners(
+                    business_name, contract_name, min_score=min_score
+                )
                 
                 return jsonify(asdict(APIResponse(
                     success=True,
@@ -117,6 +213,60 @@ class GigeBidBackendAPI:
                     error=str(e)
                 ))), 500
         
+        @self.app.route('/api/teams/ranked', methods=['POST'])
+        def rank_teams():
+            """Rank the best teams for a contract, with the Pareto front of size vs. score"""
+            try:
+                data = request.json
+                contract_name = data.get('contract_name')
+                available_businesses = data.get('available_businesses', None)
+                k = data.get('k', 10)
+                max_size = data.get('max_size')
+                
+                if not contract_name:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error="Missing required field: contract_name"
+                    ))), 400
+                
+                try:
+                    k = int(k)
+                    max_size = int(max_size) if max_size is not None else None
+                    if not 1 <= k <= self.MAX_RANKED_TEAMS:
+                        raise ValueError(f"k must be between 1 and {self.MAX_RANKED_TEAMS}")
+                    if max_size is not None and max_size < 1:
+                        raise ValueError("max_size must be at least 1")
+                except (TypeError, ValueError) as e:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error=f"Invalid parameters: {e}"
+                    ))), 400
+                
+                ranking = self.agi_engine.rank_teams(
+                    contract_name,
+                    k=k,
+                    max_size=max_size,
+                    available_businesses=available_businesses
+                )
+                
+                if ranking is None:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        message="Contract not found"
+                    ))), 404
+                
+                return jsonify(asdict(APIResponse(
+                    success=True,
+                    data=asdict(ranking),
+                    message=f"Ranked {len(ranking.teams)} teams"
+                )))
+                
+            except Exception as e:
+                return jsonify(asdict(APIResponse(
+                    success=False,
+                    error=str(e)
+                ))), 500
+        
         @self.app.route('/api/partnerships/score', methods=['POST'])
         def get_partnership_score():
             """Get partnership compatibility score"""
@@ -145,7 +295,79 @@ class GigeBidBackendAPI:
                     error=str(e)
                 ))), 500
         
+        @self.app.route('/api/partnerships/score/batch', methods=['POST'])
+        def get_partnership_scores():
+            """Score many business pairs, or one business against many, in one request"""
+            try:
+                data = request.json
+                raw_pairs = data.get('pairs')
+                business = data.get('business')
+                candidates = data.get('candidates')
+                
+                if raw_pairs is None and (not business or candidates is None):
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error="Provide either pairs, or business and candidates"
+                    ))), 400
+                
+                if raw_pairs is None:
+                    if not isinstance(candidates, list):
+                        return jsonify(asdict(APIResponse(
+                            success=False,
+                            error="candidates must be a list"
+                        ))), 400
+                    raw_pairs = [[business, candidate] for candidate in candidates]
+                
+                if not isinstance(raw_pairs, list):
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error="pairs must be a list"
+                    ))), 400
+                
+                if len(raw_pairs) > self.MAX_SCORE_BATCH_SIZE:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error=f"Batch too large: {len(raw_pairs)} pairs (max {self.MAX_SCORE_BATCH_SIZE})"
+                    ))), 400
+                
+                # Malformed items are reported inline instead of failing the batch
+                results = [None] * len(raw_pairs)
+                pairs = []
+                positions = []
+                for position, item in enumerate(raw_pairs):
+                    if isinstance(item, dict):
+                        item = [item.get('business_a'), item.get('business_b')]
+                    if (not isinstance(item, (list, tuple)) or len(item) != 2 or
+                            not all(isinstance(name, str) and name for name in item)):
+                        results[position] = {
+                            "business_a": None,
+                            "business_b": None,
+                            "score": None,
+                            "error": "Each pair needs two business names"
+                        }
+                        continue
+                    pairs.append((item[0], item[1]))
+                    positions.append(position)
+                
+                for position, result in zip(positions, self.agi_engine.get_partnership_scores(pairs)):
+                    results[position] = result
+                
+                failed = sum(1 for result in results if result.get("error"))
+                
+                return jsonify(asdict(APIResponse(
+                    success=True,
+                    data=results,
+                    message=f"Scored {len(results) - failed} of {len(results)} pairs"
+                )))
+                
+            except Exception as e:
+                return jsonify(asdict(APIResponse(
+                    success=False,
+                    error=str(e)
+                ))), 500
+        
         @self.app.route('/api/escrow/create', methods=['POST'])
+        @self._idempotent('escrow_create')
         def create_escrow():
             """Create escrow contract on Sui blockchain"""
             try:
@@ -217,6 +439,7 @@ class GigeBidBackendAPI:
                 ))), 500
         
         @self.app.route('/api/escrow/release-milestone', methods=['POST'])
+        @self._idempotent('escrow_release_milestone')
         def release_milestone():
             """Release milestone payment"""
             try:
@@ -312,6 +535,45 @@ class GigeBidBackendAPI:
                     error=str(e)
                 ))), 500
         
+        @self.app.route('/api/businesses/<business_name>/opportunities', methods=['GET'])
+        def find_opportunities(business_name):
+            """Find contracts the business can contribute to, best first"""
+            try:
+                try:
+                    limit = request.args.get('limit')
+                    min_coverage = request.args.get('min_coverage')
+                    limit = int(limit) if limit is not None else None
+                    min_coverage = float(min_coverage) if min_coverage is not None else None
+                    if limit is not None and limit < 1:
+                        raise ValueError("limit must be at least 1")
+                except ValueError as e:
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error=f"Invalid parameters: {e}"
+                    ))), 400
+
+                if not self.agi_engine.get_business_profile(business_name):
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        message="Business not found"
+                    ))), 404
+
+                opportunities = self.agi_engine.find_opportunities(
+                    business_name, limit=limit, min_coverage=min_coverage
+                )
+
+                return jsonify(asdict(APIResponse(
+                    success=True,
+                    data=[asdict(opportunity) for opportunity in opportunities],
+                    message=f"Found {len(opportunities)} contract opportunities"
+                )))
+
+            except Exception as e:
+                return jsonify(asdict(APIResponse(
+                    success=False,
+                    error=str(e)
+                ))), 500
+
         @self.app.route('/api/contracts/<contract_name>', methods=['GET'])
         def get_contract_requirements(contract_name):
             """Get contract requirements"""
@@ -373,8 +635,20 @@ class GigeBidBackendAPI:
                         success=False,
                         error="Missing required fields: business_name, business_data"
                     ))), 400
+                if not isinstance(business_data, dict):
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error="business_data must be an object"
+                    ))), 400
                 
-                self.agi_engine.add_business_to_knowledge_base(business_name, business_data)
+                try:
+                    self.agi_engine.add_business_to_knowledge_base(business_name, business_data)
+                except ValueError as e:
+                    # Rejected profile (missing or malformed field); nothing was published
+                    return jsonify(asdict(APIResponse(
+                        success=False,
+                        error=str(e)
+                    ))), 400
                 
                 return jsonify(asdict(APIResponse(
                     success=True,
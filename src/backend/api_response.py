@@ -0,0 +1,19 @@
+"""
+GigeBid API Response
+Response envelope shared by the Flask API and the payment API.
+
+Kept in its own module so the payment API does not import the Flask app
+(and with it flask_cors, the AGI engine and NumPy) just for this class.
+"""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class APIResponse:
+    """Standard API response format"""
+    success: bool
+    data: Any = None
+    message: str = ""
+    error: str = ""
@@ -0,0 +1,327 @@
+"""
+HerBid Business Catalogue
+Compact struct-of-arrays storage for the businesses in the AGI knowledge base.
+
+Skills, locations and industries are interned to dense integer IDs, so each
+distinct string is stored once however many businesses share it. Per-business
+attributes live in typed columns (array module) indexed by row, and skills
+are stored CSR-style: one flat array of skill IDs plus a start offset and a
+count per row. Reading a business back as a dict rebuilds the same shape the
+knowledge base has always used, so callers see no difference.
+"""
+
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+# Profile keys stored in columns; anything else a business carries is kept as-is
+_COLUMN_KEYS = ("skills", "location", "industry", "reputation")
+
+
+class Interner:
+    """Bidirectional mapping between values and dense integer IDs"""
+    __slots__ = ("_ids", "values")
+
+    def __init__(self):
+        self._ids: Dict[Hashable, int] = {}
+        self.values: List[Hashable] = []
+
+    def intern(self, value: Hashable) -> int:
+        """ID of value, assigning the next free one if it is new"""
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def id_of(self, value: Hashable) -> Optional[int]:
+        """ID of value, or None if it was never interned"""
+        return self._ids.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def copy(self) -> "Interner":
+        clone = Interner()
+        clone._ids = dict(self._ids)
+        clone.values = list(self.values)
+        return clone
+
+
+class BusinessCatalogue(Mapping):
+    """
+    Read-mostly mapping of business name to profile dict, stored column-wise.
+
+    Lookups by name return a freshly built profile dict; hot paths should use
+    the typed accessors (skills_of, location_of, ...) or the row-level ones,
+    which avoid building dicts.
+    """
+
+    def __init__(self):
+        """Initialize an empty catalogue"""
+        self.skills = Interner()
+        self.locations = Interner()
+        self.industries = Interner()
+        self.names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._location_ids = array("I")
+        self._industry_ids = array("I")
+        self._reputations = array("d")
+        self._integer_reputation = bytearray()
+        self._skill_start = array("I")
+        self._skill_count = array("H")
+        self._skill_ids = array("I")
+        self._stale_skill_slots = 0
+        self._extras: Dict[int, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_businesses(cls, businesses: Dict[str, Dict[str, Any]]) -> "BusinessCatalogue":
+        """Build a catalogue from a knowledge base `businesses` mapping"""
+        catalogue = cls()
+        for business_name, business_data in businesses.items():
+            catalogue.add(business_name, business_data)
+        return catalogue
+
+    def copy(self) -> "BusinessCatalogue":
+        """Independent copy; columns are copied with single buffer copies"""
+        clone = BusinessCatalogue()
+        clone.skills = self.skills.copy()
+        clone.locations = self.locations.copy()
+        clone.industries = self.industries.copy()
+        clone.names = list(self.names)
+        clone._rows = dict(self._rows)
+        clone._location_ids = array("I", self._location_ids)
+        clone._industry_ids = array("I", self._industry_ids)
+        clone._reputations = array("d", self._reputations)
+        clone._integer_reputation = bytearray(self._integer_reputation)
+        clone._skill_start = array("I", self._skill_start)
+        clone._skill_count = array("H", self._skill_count)
+        clone._skill_ids = array("I", self._skill_ids)
+        clone._stale_skill_slots = self._stale_skill_slots
+        clone._extras = dict(self._extras)
+        return clone
+
+    def add(self, business_name: str, business_data: Dict[str, Any]) -> int:
+        """
+        Add a business or replace the profile of an existing one.
+
+        Returns:
+            The business's row
+
+        Raises:
+            ValueError: If location, industry or reputation is missing, or a
+                field has the wrong type; the message names the field
+        """
+        # Validate everything before any column changes
+        missing = [key for key in ("location", "industry", "reputation") if business_data.get(key) is None]
+        if missing:
+            raise ValueError(f"Missing business field(s): {', '.join(missing)}")
+        location = business_data["location"]
+        industry = business_data["industry"]
+        reputation = business_data["reputation"]
+        for key, value in (("location", location), ("industry", industry)):
+            if not isinstance(value, str):
+                raise ValueError(f"Invalid {key}: must be a string")
+        try:
+            if isinstance(reputation, bool):
+                raise TypeError
+            reputation_value = float(reputation)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid reputation: {reputation!r} is not a number") from None
+        skills = business_data.get("skills", ())
+        if not isinstance(skills, (list, tuple)) or not all(isinstance(skill, str) for skill in skills):
+            raise ValueError("Invalid skills: must be a list of strings")
+        skills = list(dict.fromkeys(skills))
+        extras = {key: value for key, value in business_data.items() if key not in _COLUMN_KEYS}
+
+        skill_ids = [self.skills.intern(skill) for skill in skills]
+        location_id = self.locations.intern(location)
+        industry_id = self.industries.intern(industry)
+        integer_reputation = isinstance(reputation, int) and not isinstance(reputation, bool)
+
+        row = self._rows.get(business_name)
+        if row is None:
+            row = self._rows[business_name] = len(self.names)
+            self.names.append(business_name)
+            self._location_ids.append(location_id)
+            self._industry_ids.append(industry_id)
+            self._reputations.append(reputation_value)
+            self._integer_reputation.append(integer_reputation)
+            self._skill_start.append(len(self._skill_ids))
+            self._skill_count.append(len(skill_ids))
+            self._skill_ids.extend(skill_ids)
+        else:
+            self._location_ids[row] = location_id
+            self._industry_ids[row] = industry_id
+            self._reputations[row] = reputation_value
+            self._integer_reputation[row] = integer_reputation
+            self._replace_skills(row, skill_ids)
+
+        if extras:
+            self._extras[row] = extras
+        else:
+            self._extras.pop(row, None)
+        return row
+
+    def _replace_skills(self, row: int, skill_ids: List[int]):
+        """Overwrite a row's skills in place, or append them when they no longer fit"""
+        start, count = self._skill_start[row], self._skill_count[row]
+        if len(skill_ids) <= count:
+            self._skill_ids[start:start + len(skill_ids)] = array("I", skill_ids)
+            self._stale_skill_slots += count - len(skill_ids)
+        else:
+            self._skill_start[row] = len(self._skill_ids)
+            self._skill_ids.extend(skill_ids)
+            self._stale_skill_slots += count
+        self._skill_count[row] = len(skill_ids)
+        if self._stale_skill_slots > len(self._skill_ids) // 2:
+            self._compact_skills()
+
+    def _compact_skills(self):
+        """Rewrite the skill array without slots left behind by replaced rows"""
+        compacted = array("I")
+        for row in range(len(self.names)):
+            start, count = self._skill_start[row], self._skill_count[row]
+            self._skill_start[row] = len(compacted)
+            compacted.extend(self._skill_ids[start:start + count])
+        self._skill_ids = compacted
+        self._stale_skill_slots = 0
+
+    # Mapping interface: name -> profile dict
+
+    def __getitem__(self, business_name: str) -> Dict[str, Any]:
+        return self.profile(self._rows[business_name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, business_name: object) -> bool:
+        return business_name in self._rows
+
+    # Row-level accessors
+
+    def row(self, business_name: str) -> int:
+        """Row of a business, raising KeyError for unknown names"""
+        return self._rows[business_name]
+
+    def skill_ids(self, row: int) -> array:
+        """Interned skill IDs of a row"""
+        start = self._skill_start[row]
+        return self._skill_ids[start:start + self._skill_count[row]]
+
+    def skill_mask(self, row: int) -> int:
+        """Skills of a row as a bitset over skill IDs"""
+        mask = 0
+        for skill_id in self.skill_ids(row):
+            mask |= 1 << skill_id
+        return mask
+
+    def location_id(self, row: int) -> int:
+        return self._location_ids[row]
+
+    def industry_id(self, row: int) -> int:
+        return self._industry_ids[row]
+
+    def columns(self) -> Tuple[array, array, array]:
+        """Location ID, industry ID and reputation columns indexed by row; callers must not modify them"""
+        return self._location_ids, self._industry_ids, self._reputations
+
+    def profile(self, row: int) -> Dict[str, Any]:
+        """Rebuild the knowledge base dict of a row"""
+        reputation = self._reputations[row]
+        profile = {
+            "skills": self.skill_names(self.skill_ids(row)),
+            "location": self.locations.values[self._location_ids[row]],
+            "industry": self.industries.values[self._industry_ids[row]],
+            "reputation": int(reputation) if self._integer_reputation[row] else reputation
+        }
+        extras = self._extras.get(row)
+        if extras:
+            profile.update(extras)
+        return profile
+
+    # Name-level accessors
+
+    def skill_names(self, skill_ids: Sequence[int]) -> List[str]:
+        """Skill strings for interned skill IDs"""
+        values = self.skills.values
+        return [values[skill_id] for skill_id in skill_ids]
+
+    def skills_of(self, business_name: str) -> List[str]:
+        """Skills of a business"""
+        return self.skill_names(self.skill_ids(self._rows[business_name]))
+
+    def location_of(self, business_name: str) -> Any:
+        return self.locations.values[self._location_ids[self._rows[business_name]]]
+
+    def industry_of(self, business_name: str) -> Any:
+        return self.industries.values[self._industry_ids[self._rows[business_name]]]
+
+    def reputation_of(self, business_name: str) -> float:
+        row = self._rows[business_name]
+        reputation = self._reputations[row]
+        return int(reputation) if self._integer_reputation[row] else reputation
+
+    def skill_mask_for(self, skills: Sequence[str]) -> int:
+        """Bitset of the given skill strings (skills never seen by the catalogue are ignored)"""
+        mask = 0
+        for skill in skills:
+            skill_id = self.skills.id_of(skill)
+            if skill_id is not None:
+                mask |= 1 << skill_id
+        return mask
+
+
+if __name__ == "__main__":
+    import json
+    import random
+    import sys
+    import time
+    import tracemalloc
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(7)
+    skill_pool = [f"Skill {i}" for i in range(400)]
+    towns = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika"]
+    industries = ["Technology", "Marketing", "Design", "Finance", "Logistics", "Agriculture"]
+    # Round-trip through JSON so strings are not shared, as when loaded from a request or file
+    payload = json.dumps({
+        f"Business {i}": {
+            "skills": rng.sample(skill_pool, rng.randint(2, 6)),
+            "location": rng.choice(towns),
+            "industry": rng.choice(industries),
+            "reputation": rng.randint(50, 100)
+        }
+        for i in range(count)
+    })
+
+    tracemalloc.start()
+    businesses = json.loads(payload)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    catalogue = BusinessCatalogue.from_businesses(json.loads(payload))
+    catalogue_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert all(catalogue[name] == profile for name, profile in businesses.items())
+    print(f"{count} businesses: dicts {dict_bytes / count:.0f} B/business, "
+          f"catalogue {catalogue_bytes / count:.0f} B/business "
+          f"({dict_bytes / catalogue_bytes:.1f}x smaller)")
+
+    required = rng.sample(skill_pool, 4)
+    names = list(businesses)
+    started = time.perf_counter()
+    required_set = set(required)
+    set_matches = sum(bool(required_set.intersection(businesses[name]["skills"])) for name in names)
+    set_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    required_ids = {catalogue.skills.id_of(skill) for skill in required}
+    id_matches = sum(not required_ids.isdisjoint(catalogue.skill_ids(row)) for row in range(len(catalogue)))
+    id_seconds = time.perf_counter() - started
+    assert set_matches == id_matches
+    print(f"Skill overlap scan: string sets {set_seconds * 1000:.1f}ms, interned IDs {id_seconds * 1000:.1f}ms")
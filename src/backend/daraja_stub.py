@@ -0,0 +1,227 @@
+"""
+GigeBid Daraja Stub
+Local stand-in for Safaricom's Daraja (M-Pesa) API, for offline development
+and load testing of MPesaConnector.
+
+Implements OAuth token generation, STK push and STK push query with
+configurable latency and a configurable share of transient 503 failures.
+With --callback-delay it also POSTs the STK result to the request's
+CallBackURL, dropping a configurable share of callbacks so the deposit
+sweeper has something to reconcile.
+
+Usage:
+    python3 daraja_stub.py --port 8089 --latency 0.05 --error-rate 0.02
+    MPESA_BASE_URL=http://localhost:8089 python3 payment_api.py
+
+    # Deliver callbacks to the payment API one second after each push; the
+    # payment API only accepts callbacks carrying its MPESA_CALLBACK_TOKEN
+    MPESA_BASE_URL=http://localhost:8089 MPESA_CALLBACK_TOKEN=dev-secret \
+        MPESA_CALLBACK_URL=http://localhost:5001/api/payments/mpesa/callback python3 payment_api.py
+    python3 daraja_stub.py --callback-delay 1 --callback-drop-rate 0.01
+
+    # Drive the connector against an in-process stub and report throughput
+    python3 daraja_stub.py --load-test 5000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import base64
+import random
+import secrets
+import time
+from typing import Any, Dict, Optional, Set
+
+import aiohttp
+from aiohttp import web
+
+from id_generator import new_id
+
+
+class DarajaStub:
+    """In-memory Daraja API"""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, token_lifetime: int = 3599,
+                 callback_delay: Optional[float] = None, callback_drop_rate: float = 0.0):
+        """
+        Args:
+            latency: Seconds each request takes to answer
+            error_rate: Fraction of STK requests that fail with 503
+            token_lifetime: Seconds issued tokens stay valid
+            callback_delay: Seconds after a push to POST its result to CallBackURL
+                (None disables callbacks)
+            callback_drop_rate: Fraction of callbacks never sent
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_lifetime = token_lifetime
+        self.callback_delay = callback_delay
+        self.callback_drop_rate = callback_drop_rate
+        self._callback_tasks: Set[asyncio.Task] = set()
+        self.tokens: Dict[str, float] = {}  # token -> expiry
+        self.checkouts: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"tokens_issued": 0, "stk_pushes": 0, "queries": 0, "injected_errors": 0, "unauthorized": 0,
+                      "callbacks_sent": 0, "callbacks_dropped": 0, "callback_errors": 0}
+        self.app = web.Application()
+        self.app.router.add_get('/oauth/v1/generate', self.generate_token)
+        self.app.router.add_post('/mpesa/stkpush/v1/processrequest', self.stk_push)
+        self.app.router.add_post('/mpesa/stkpushquery/v1/query', self.stk_query)
+        self.app.router.add_get('/stats', self.get_stats)
+
+    async def _delay(self):
+        """Simulate network and processing latency"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _authorized(self, request: web.Request) -> bool:
+        """Whether the request carries a live bearer token"""
+        header = request.headers.get("Authorization", "")
+        token = header[len("Bearer "):] if header.startswith("Bearer ") else ""
+        valid = self.tokens.get(token, 0) > time.monotonic()
+        if not valid:
+            self.stats["unauthorized"] += 1
+        return valid
+
+    async def generate_token(self, request: web.Request) -> web.Response:
+        """OAuth client-credentials grant"""
+        await self._delay()
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Basic ") or b":" not in base64.b64decode(header[6:] or b""):
+            return web.json_response({"errorMessage": "Invalid credentials"}, status=400)
+        token = secrets.token_urlsafe(24)
+        self.tokens[token] = time.monotonic() + self.token_lifetime
+        self.stats["tokens_issued"] += 1
+        return web.json_response({"access_token": token, "expires_in": str(self.token_lifetime)})
+
+    async def stk_push(self, request: web.Request) -> web.Response:
+        """Accept an STK push request"""
+        await self._delay()
+        if not self._authorized(request):
+            return web.json_response({"errorMessage": "Invalid Access Token"}, status=401)
+        if random.random() < self.error_rate:
+            self.stats["injected_errors"] += 1
+            return web.json_response({"errorMessage": "Service temporarily unavailable"}, status=503)
+
+        payload = await request.json()
+        checkout_request_id = new_id("ws_CO")
+        self.checkouts[checkout_request_id] = payload
+        self.stats["stk_pushes"] += 1
+        merchant_request_id = new_id("merchant")
+        if self.callback_delay is not None and payload.get("CallBackURL"):
+            task = asyncio.ensure_future(self._send_callback(payload, merchant_request_id, checkout_request_id))
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_tasks.discard)
+        return web.json_response({
+            "MerchantRequestID": merchant_request_id,
+            "CheckoutRequestID": checkout_request_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing"
+        })
+
+    async def _send_callback(self, payload: Dict[str, Any], merchant_request_id: str,
+                             checkout_request_id: str):
+        """POST a successful STK result to the push's CallBackURL"""
+        await asyncio.sleep(self.callback_delay)
+        if random.random() < self.callback_drop_rate:
+            self.stats["callbacks_dropped"] += 1
+            return
+        body = {"Body": {"stkCallback": {
+            "MerchantRequestID": merchant_request_id,
+            "CheckoutRequestID": checkout_request_id,
+            "ResultCode": 0,
+            "ResultDesc": "The service request is processed successfully.",
+            "CallbackMetadata": {"Item": [
+                {"Name": "Amount", "Value": payload.get("Amount")},
+                {"Name": "MpesaReceiptNumber", "Value": new_id("OGI")},
+                {"Name": "TransactionDate", "Value": int(time.strftime("%Y%m%d%H%M%S"))},
+                {"Name": "PhoneNumber", "Value": payload.get("PhoneNumber")}
+            ]}
+        }}}
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(payload["CallBackURL"], json=body) as response:
+                    await response.read()
+            self.stats["callbacks_sent"] += 1
+        except aiohttp.ClientError:
+            self.stats["callback_errors"] += 1
+
+    async def stk_query(self, request: web.Request) -> web.Response:
+        """Report the result of an STK push (every known push succeeds)"""
+        await self._delay()
+        if not self._authorized(request):
+            return web.json_response({"errorMessage": "Invalid Access Token"}, status=401)
+        payload = await request.json()
+        checkout_request_id = payload.get("CheckoutRequestID")
+        self.stats["queries"] += 1
+        known = checkout_request_id in self.checkouts
+        return web.json_response({
+            "ResponseCode": "0",
+            "ResponseDescription": "The service request has been accepted successfully",
+            "MerchantRequestID": new_id("merchant"),
+            "CheckoutRequestID": checkout_request_id,
+            "ResultCode": "0" if known else "1032",
+            "ResultDesc": ("The service request is processed successfully." if known
+                           else "Request cancelled by user")
+        })
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        """Request counters"""
+        return web.json_response(self.stats)
+
+
+async def load_test(requests: int, concurrency: int, latency: float, error_rate: float, port: int):
+    """Run the stub in-process and push `requests` STK pushes through MPesaConnector"""
+    from decimal import Decimal
+    from payment_system import MPesaConnector
+    import logging
+    logging.getLogger("payment_system").setLevel(logging.WARNING)
+    logging.getLogger("http_client").setLevel(logging.ERROR)
+
+    stub = DarajaStub(latency=latency, error_rate=error_rate)
+    runner = web.AppRunner(stub.app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def push(index: int):
+        nonlocal failures
+        async with semaphore:
+            # A fresh connector per request, as HybridPaymentSystem instances would create
+            connector = MPesaConnector(base_url=f"http://127.0.0.1:{port}")
+            try:
+                await connector.initiate_stk_push("+254708374149", Decimal("100"), f"load {index}")
+            except Exception:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(push(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    client = MPesaConnector(base_url=f"http://127.0.0.1:{port}").http
+    print(f"{requests} STK pushes in {elapsed:.2f}s ({requests / elapsed:,.0f}/s), {failures} failed")
+    print(f"HTTP requests: {client.requests}, retries: {client.retries}, stub stats: {stub.stats}")
+    await client.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Daraja API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of STK pushes failing with 503")
+    parser.add_argument("--callback-delay", type=float, help="seconds before POSTing each STK result")
+    parser.add_argument("--callback-drop-rate", type=float, default=0.0, help="fraction of callbacks never sent")
+    parser.add_argument("--load-test", type=int, metavar="N", help="push N STK requests through MPesaConnector")
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.load_test:
+        asyncio.run(load_test(args.load_test, args.concurrency, args.latency, args.error_rate, args.port))
+    else:
+        print(f"Daraja stub listening on {args.host}:{args.port}")
+        stub = DarajaStub(args.latency, args.error_rate,
+                          callback_delay=args.callback_delay, callback_drop_rate=args.callback_drop_rate)
+        web.run_app(stub.app, host=args.host, port=args.port)
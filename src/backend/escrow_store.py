@@ -0,0 +1,178 @@
+"""
+GigeBid Escrow Store
+SQLite-backed escrow state for SuiConnector.
+
+The mock connector stands in for on-chain escrow objects, which every API
+worker sees alike. Keeping that state in a per-process dict broke as soon as
+the API ran under several gunicorn workers: an escrow created by one worker
+was unknown to the others. The store keeps it in the ledger database
+instead, so every worker process reads and releases the same escrows, and a
+milestone is released at most once however many workers race for it.
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from transaction_ledger import ProcessLocalConnection, default_ledger_path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS escrows (
+    escrow_id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    total_amount INTEGER NOT NULL,
+    member_addresses TEXT NOT NULL,
+    milestone_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    team_members TEXT NOT NULL,
+    released_amount INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS escrow_releases (
+    escrow_id TEXT NOT NULL,
+    milestone_number INTEGER NOT NULL,
+    transaction_id TEXT NOT NULL,
+    gas_used INTEGER NOT NULL,
+    PRIMARY KEY (escrow_id, milestone_number)
+) WITHOUT ROWID;
+"""
+
+
+class EscrowStore(ProcessLocalConnection):
+    """
+    Escrow state shared by every process using the same database file.
+
+    Rows hold plain values; sui_api turns them back into its dataclasses.
+    Each process has its own connection, shared by its threads and
+    serialized with a lock, as in TransactionLedger; other processes are
+    serialized by SQLite.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (and if needed create) the escrow tables.
+
+        Args:
+            path: SQLite database file, or ":memory:" for a store private to
+                this process (default_ledger_path() when not given)
+        """
+        path = path or default_ledger_path()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._open_connection().executescript(_SCHEMA)
+        logger.info(f"Escrow store opened: {path}")
+
+    def add(self, escrow: Dict, team_members: list):
+        """
+        Store a new escrow.
+
+        Args:
+            escrow: EscrowDetails fields
+            team_members: TeamMember fields, one dict per member
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO escrows (escrow_id, project_id, total_amount, member_addresses, "
+                "milestone_count, created_at, status, team_members) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (escrow["escrow_id"], escrow["project_id"], escrow["total_amount"],
+                 json.dumps(escrow["member_addresses"]), escrow["milestone_count"],
+                 escrow["created_at"], escrow["status"], json.dumps(team_members))
+            )
+
+    def get(self, escrow_id: str) -> Optional[Dict]:
+        """
+        Look up an escrow.
+
+        Returns:
+            The escrow's fields plus "team_members", "released_amount" and
+            "releases" (milestone number -> (transaction ID, gas used)), or
+            None if there is no such escrow
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM escrows WHERE escrow_id = ?", (escrow_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            releases = self._connection.execute(
+                "SELECT milestone_number, transaction_id, gas_used FROM escrow_releases "
+                "WHERE escrow_id = ?", (escrow_id,)
+            ).fetchall()
+        escrow = dict(row)
+        escrow["member_addresses"] = json.loads(escrow["member_addresses"])
+        escrow["team_members"] = json.loads(escrow["team_members"])
+        escrow["releases"] = {
+            release["milestone_number"]: (release["transaction_id"], release["gas_used"])
+            for release in releases
+        }
+        return escrow
+
+    def record_release(self, escrow_id: str, milestone_number: int, amount: int,
+                       transaction_id: str, gas_used: int) -> Optional[tuple]:
+        """
+        Record a milestone release unless the milestone was already released.
+
+        The check, the insert and the balance update run in one write
+        transaction, so concurrent releases of the same milestone (from any
+        process) pay out once.
+
+        Args:
+            escrow_id: Escrow to release from
+            milestone_number: Milestone released (1-based)
+            amount: Amount the milestone releases
+            transaction_id: ID of the release transaction
+            gas_used: Gas the release used
+
+        Returns:
+            (transaction ID, gas used) of the release on record for the
+            milestone: the given one, or the earlier release. None if the
+            escrow does not exist.
+        """
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                escrow = connection.execute(
+                    "SELECT milestone_count FROM escrows WHERE escrow_id = ?", (escrow_id,)
+                ).fetchone()
+                if escrow is None:
+                    connection.execute("ROLLBACK")
+                    return None
+                inserted = connection.execute(
+                    "INSERT OR IGNORE INTO escrow_releases (escrow_id, milestone_number, transaction_id, gas_used) "
+                    "VALUES (?, ?, ?, ?)", (escrow_id, milestone_number, transaction_id, gas_used)
+                ).rowcount
+                if inserted:
+                    released = connection.execute(
+                        "SELECT COUNT(*) FROM escrow_releases WHERE escrow_id = ?", (escrow_id,)
+                    ).fetchone()[0]
+                    connection.execute(
+                        "UPDATE escrows SET released_amount = released_amount + ?, "
+                        "status = CASE WHEN ? >= milestone_count THEN 'completed' ELSE status END "
+                        "WHERE escrow_id = ?", (amount, released, escrow_id)
+                    )
+                    recorded = (transaction_id, gas_used)
+                else:
+                    row = connection.execute(
+                        "SELECT transaction_id, gas_used FROM escrow_releases "
+                        "WHERE escrow_id = ? AND milestone_number = ?", (escrow_id, milestone_number)
+                    ).fetchone()
+                    recorded = (row["transaction_id"], row["gas_used"])
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        return recorded
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM escrows").fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,240 @@
+"""
+GigeBid HTTP Client
+Shared asyncio HTTP client and OAuth token cache for outbound API calls.
+
+One aiohttp session (and with it one keep-alive connection pool) is shared by
+every connector in the process, with per-host connection limits, timeouts
+and retry with jittered exponential backoff. Only idempotent methods are
+retried after the request may have reached the server; a POST such as an
+STK push or B2C payment is retried only if it never left this process,
+unless the caller says it is safe to repeat.
+
+OAuth tokens are cached per process, refreshed ahead of expiry, and
+concurrent refreshes for the same credentials are coalesced into one
+request. Processes do not share tokens: each fetches and refreshes its own,
+costing one token request per process per token lifetime. The payment API
+runs as a single process, so in practice it holds one token.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: throttling and transient server/gateway failures
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Methods that can be repeated without repeating a side effect
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class HttpError(Exception):
+    """Non-retryable or retry-exhausted HTTP failure"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class PooledHttpClient:
+    """
+    Keep-alive aiohttp client shared across connectors.
+
+    The session is created lazily on the running event loop and recreated if
+    a later caller runs on a different loop (e.g. successive asyncio.run calls).
+    """
+
+    def __init__(self,
+                 max_connections: int = 100,
+                 max_connections_per_host: int = 20,
+                 keepalive_timeout: float = 30.0,
+                 connect_timeout: float = 5.0,
+                 total_timeout: float = 30.0,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.2,
+                 backoff_cap: float = 5.0):
+        """
+        Args:
+            max_connections: Pool size across all hosts
+            max_connections_per_host: Concurrent connections allowed per host
+            keepalive_timeout: Seconds idle connections are kept open
+            connect_timeout: Seconds allowed to establish a connection
+            total_timeout: Seconds allowed for a whole request attempt
+            max_retries: Retries after the first attempt for retryable failures
+            backoff_base: Base delay of the exponential backoff
+            backoff_cap: Maximum backoff delay
+        """
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.requests = 0
+        self.retries = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Session bound to the running loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._loop = loop
+        return self._session
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def request_json(self, method: str, url: str, retry: Optional[bool] = None,
+                           **kwargs) -> Dict[str, Any]:
+        """
+        Send a request and decode its JSON response, retrying transient failures.
+
+        Failures to connect are always retried, since nothing was sent. Timeouts,
+        dropped connections and retryable statuses happen after the server may
+        have acted on the request, so they are retried only for idempotent
+        methods or when retry is True.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            retry: Whether the request may be repeated after it was sent
+                (None: only if the method is idempotent)
+            **kwargs: Passed through to aiohttp (json, params, headers, auth, ...)
+
+        Returns:
+            Decoded JSON body
+
+        Raises:
+            HttpError: On a non-retryable status or once retries are exhausted
+            aiohttp.ClientError, asyncio.TimeoutError: If the last attempt failed to connect,
+                or a request that may not be repeated failed after it was sent
+        """
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        session = self._get_session()
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    if response.status < 400:
+                        return await response.json(content_type=None)
+                    body = await response.text()
+                    if (not retry or response.status not in RETRYABLE_STATUSES
+                            or attempt >= self.max_retries):
+                        raise HttpError(response.status, body[:200])
+                    retry_after = response.headers.get("Retry-After")
+                    logger.warning(f"{method} {url} returned {response.status}, retrying")
+            except aiohttp.ClientConnectorError as e:
+                # The connection was never established, so the request was not sent
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+                logger.warning(f"{method} {url} failed to connect ({e!r}), retrying")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not retry or attempt >= self.max_retries:
+                    raise
+                retry_after = None
+                logger.warning(f"{method} {url} failed ({e!r}), retrying")
+
+            delay = self.backoff_delay(attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), self.backoff_cap))
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+class OAuthTokenCache:
+    """
+    Process-wide OAuth token cache (not shared between processes).
+
+    Tokens are keyed by (token URL, client ID) and treated as expired
+    `refresh_margin` seconds early, so no request goes out with a token that
+    is about to lapse. While a token is being fetched, other callers for the
+    same key await that fetch instead of starting their own.
+    """
+
+    def __init__(self, refresh_margin: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            refresh_margin: Seconds before expiry at which a token is refreshed
+            clock: Monotonic time source (injectable for testing)
+        """
+        self.refresh_margin = refresh_margin
+        self._clock = clock
+        self._tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.fetches = 0
+
+    async def get_token(self, key: Tuple[str, str],
+                        fetch: Callable[[], Awaitable[Tuple[str, float]]]) -> str:
+        """
+        Return a valid token for key, fetching it if needed.
+
+        Args:
+            key: (token URL, client ID) identifying the credentials
+            fetch: Coroutine function returning (token, lifetime in seconds)
+        """
+        cached = self._tokens.get(key)
+        if cached is not None and self._clock() < cached[1]:
+            return cached[0]
+
+        task = self._inflight.get(key)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: Tuple[str, str],
+                     fetch: Callable[[], Awaitable[Tuple[str, float]]]) -> str:
+        """Fetch and store a token"""
+        self.fetches += 1
+        try:
+            token, lifetime = await fetch()
+            expires_at = self._clock() + max(float(lifetime) - self.refresh_margin, 0.0)
+            self._tokens[key] = (token, expires_at)
+            return token
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key: Tuple[str, str]):
+        """Drop a token the server rejected"""
+        self._tokens.pop(key, None)
+
+
+# Process-wide instances shared by every connector
+_shared_client = PooledHttpClient()
+_shared_token_cache = OAuthTokenCache()
+
+
+def get_shared_client() -> PooledHttpClient:
+    """Process-wide pooled HTTP client"""
+    return _shared_client
+
+
+def get_shared_token_cache() -> OAuthTokenCache:
+    """Process-wide OAuth token cache"""
+    return _shared_token_cache
@@ -0,0 +1,194 @@
+"""
+GigeBid ID Generator
+Unique, time-sortable identifiers for payments, escrows and transactions.
+
+IDs have the form ``<prefix>_<timestamp><node><sequence>`` in fixed-width
+lowercase hex:
+
+    timestamp  12 hex digits  milliseconds since the Unix epoch
+    node       10 hex digits  random per-process ID, regenerated after fork
+    sequence   10 hex digits  per-process counter
+
+Uniqueness within a process comes from the counter and across processes
+from the node ID. Timestamps are wall-clock milliseconds advanced by
+``time.monotonic_ns`` from a fixed anchor and never drop below the last one
+issued (``max(now, last)``), so IDs do not go backwards when the system
+clock is adjusted, not even in a process forked after the adjustment. The
+timestamp and sequence are taken together under a lock held for a few
+integer operations, so within a process string order is issue order, across
+threads too. Across processes IDs sort by millisecond only.
+
+A single call takes 2-3 microseconds (0.3-0.5M IDs/s on one core);
+``next_ids`` takes the clock and the lock once per batch and reaches
+about 1M IDs/s.
+"""
+
+import os
+import secrets
+import threading
+import time
+import weakref
+from typing import List, Tuple
+
+NODE_BITS = 40
+SEQUENCE_BITS = 40
+_SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+
+class IdGenerator:
+    """Thread-safe generator of sortable, collision-free string IDs"""
+
+    def __init__(self):
+        """Initialize with a fresh node ID and clock anchor"""
+        self._last_ms = 0
+        self._reseed()
+        # Child processes must not reuse the parent's node ID
+        generator = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: generator() and generator()._reseed())
+
+    def _reseed(self):
+        """Pick a new node ID, restart the sequence and re-anchor the clock"""
+        self.node_id = secrets.randbits(NODE_BITS)
+        self._node_hex = f"{self.node_id:010x}"
+        self._sequence = 0
+        # _last_ms carries over, so a forked child never issues an earlier timestamp
+        self._offset_ns = time.time_ns() - time.monotonic_ns()
+        # A lock held by another thread at fork time would stay locked in the child
+        self._lock = threading.Lock()
+
+    def timestamp_ms(self) -> int:
+        """Current time in milliseconds, never below the last timestamp issued"""
+        return max((self._offset_ns + time.monotonic_ns()) // 1_000_000, self._last_ms)
+
+    def _reserve(self, count: int) -> Tuple[int, int]:
+        """Take a timestamp and count consecutive sequence numbers, returning (timestamp, first)"""
+        now = (self._offset_ns + time.monotonic_ns()) // 1_000_000
+        with self._lock:
+            timestamp = self._last_ms
+            if now > timestamp:
+                self._last_ms = timestamp = now
+            sequence = self._sequence
+            self._sequence = sequence + count
+        return timestamp, sequence
+
+    def next_id(self, prefix: str = "") -> str:
+        """
+        Generate a new ID.
+
+        Args:
+            prefix: Type prefix such as "dep" or "escrow"; omitted when empty
+
+        Returns:
+            Unique ID string
+        """
+        # _reserve(1), inlined: this is the hot path
+        now = (self._offset_ns + time.monotonic_ns()) // 1_000_000
+        with self._lock:
+            timestamp = self._last_ms
+            if now > timestamp:
+                self._last_ms = timestamp = now
+            sequence = self._sequence
+            self._sequence = sequence + 1
+        if prefix:
+            return f"{prefix}_{timestamp:012x}{self._node_hex}{sequence & _SEQUENCE_MASK:010x}"
+        return f"{timestamp:012x}{self._node_hex}{sequence & _SEQUENCE_MASK:010x}"
+
+    def next_ids(self, count: int, prefix: str = "") -> List[str]:
+        """Generate several IDs at once, sharing one timestamp and one lock acquisition"""
+        timestamp, first = self._reserve(count)
+        head = f"{prefix}_{timestamp:012x}{self._node_hex}" if prefix else f"{timestamp:012x}{self._node_hex}"
+        return [f"{head}{sequence & _SEQUENCE_MASK:010x}" for sequence in range(first, first + count)]
+
+    @staticmethod
+    def parse(generated_id: str) -> Tuple[str, int, int, int]:
+        """
+        Split an ID into its parts.
+
+        Returns:
+            (prefix, timestamp_ms, node_id, sequence) tuple
+
+        Raises:
+            ValueError: If the ID was not produced by an IdGenerator
+        """
+        prefix, _, body = generated_id.rpartition("_")
+        if len(body) != 32:
+            raise ValueError(f"Not a generated ID: {generated_id}")
+        try:
+            return prefix, int(body[:12], 16), int(body[12:22], 16), int(body[22:], 16)
+        except ValueError as e:
+            raise ValueError(f"Not a generated ID: {generated_id}") from e
+
+
+# Process-wide generator shared by the payment and Sui modules
+_default_generator = IdGenerator()
+
+
+def new_id(prefix: str = "") -> str:
+    """Generate an ID from the process-wide generator"""
+    return _default_generator.next_id(prefix)
+
+
+# Benchmark: python3 id_generator.py [ids_per_thread] [threads] [processes]
+if __name__ == "__main__":
+    import sys
+    import threading
+    from multiprocessing import get_context
+
+    per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    thread_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    process_count = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    def run_threads(results: List[List[str]]):
+        """Generate per_thread IDs on each of thread_count threads"""
+        def worker(slot: int):
+            generate = _default_generator.next_id
+            results[slot] = [generate("tx") for _ in range(per_thread)]
+
+        threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Single thread throughput
+    generate = _default_generator.next_id
+    started = time.perf_counter()
+    single = [generate("tx") for _ in range(per_thread)]
+    elapsed = time.perf_counter() - started
+    assert len(set(single)) == len(single), "duplicate IDs on one thread"
+    assert single == sorted(single), "IDs not monotonic on one thread"
+    print(f"next_id, 1 thread:      {per_thread / elapsed:>12,.0f} IDs/s")
+
+    started = time.perf_counter()
+    batch = _default_generator.next_ids(per_thread, "tx")
+    elapsed = time.perf_counter() - started
+    assert len(set(batch)) == len(batch), "duplicate IDs in batch"
+    print(f"next_ids, 1 thread:     {per_thread / elapsed:>12,.0f} IDs/s")
+
+    # Concurrent threads sharing the generator
+    results: List[List[str]] = [[] for _ in range(thread_count)]
+    started = time.perf_counter()
+    run_threads(results)
+    elapsed = time.perf_counter() - started
+    generated = [generated_id for chunk in results for generated_id in chunk]
+    assert len(set(generated)) == len(generated), "duplicate IDs across threads"
+    print(f"next_id, {thread_count} threads:     {len(generated) / elapsed:>12,.0f} IDs/s")
+
+    # Forked processes, each with its own node ID
+    def generate_in_child(_) -> Tuple[float, List[str]]:
+        generate = _default_generator.next_id
+        child_started = time.perf_counter()
+        ids = [generate("tx") for _ in range(per_thread)]
+        return time.perf_counter() - child_started, ids
+
+    with get_context("fork").Pool(process_count) as pool:
+        timings, chunks = zip(*pool.map(generate_in_child, range(process_count)))
+    # Processes generate in parallel, so aggregate throughput is bounded by the slowest one
+    elapsed = max(timings)
+    generated = [generated_id for chunk in chunks for generated_id in chunk] + single + batch
+    assert len(set(generated)) == len(generated), "duplicate IDs across processes"
+    child_nodes = {IdGenerator.parse(chunk[0])[2] for chunk in chunks}
+    assert _default_generator.node_id not in child_nodes, "node ID reused after fork"
+    print(f"next_id, {process_count} processes:   {process_count * per_thread / elapsed:>12,.0f} IDs/s")
+
+    print(f"No duplicates among {len(generated):,} IDs")
@@ -0,0 +1,426 @@
+"""
+GigeBid Idempotency Store
+Replays the first result for a client-supplied idempotency key so retried
+requests do not repeat M-Pesa or Sui side effects.
+
+Keys are scoped (e.g. ("deposit", key)) and remembered for a fixed TTL.
+Because every entry lives for the same TTL, insertion order is expiry order.
+Expired entries are therefore evicted from the front of an OrderedDict in
+O(1) amortized time, and a lookup is one dict hit. A duplicate that arrives
+while the first request is still running waits for its result. If the first
+attempt fails, its entry is dropped and one waiter runs the operation again.
+
+IdempotencyStore serves threads of one process and AsyncIdempotencyStore
+coroutines on one event loop (the payment system, which runs as a single
+process). SQLiteIdempotencyStore keeps keys in the ledger database, so every
+gunicorn worker of the Flask API sees the same keys and a retry that lands
+on another worker is still replayed.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from id_generator import new_id
+from transaction_ledger import ProcessLocalConnection, default_ledger_path
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different request"""
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Stable digest of a request's parameters, used to detect key reuse"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _conflict(key: Hashable) -> IdempotencyConflict:
+    return IdempotencyConflict(f"Idempotency key {key[-1] if isinstance(key, tuple) else key!r} "
+                               f"was already used for a different request")
+
+
+class _Entry:
+    """One remembered request"""
+    __slots__ = ("fingerprint", "expires_at", "done", "result", "waiter")
+
+    def __init__(self, fingerprint: str, expires_at: float, waiter: Any):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = False
+        self.result: Any = None
+        self.waiter = waiter  # threading.Event or asyncio.Future signalled when the first run ends
+
+
+class _EntryTable:
+    """TTL-ordered entry table shared by the sync and async stores"""
+
+    def __init__(self, ttl: float, max_entries: int, clock: Callable[[], float]):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.replays = 0
+        self.executions = 0
+        self.waits = 0
+        self.evictions = 0
+
+    def _evict(self):
+        """Drop expired entries, then the oldest finished ones beyond max_entries"""
+        now = self._clock()
+        entries = self._entries
+        # Insertion order is expiry order, so expired entries are all at the front
+        while entries and next(iter(entries.values())).expires_at <= now:
+            entries.popitem(last=False)
+            self.evictions += 1
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            # Never evict a request that is still running; the few in flight are skipped over
+            oldest = []
+            for key, entry in entries.items():
+                if entry.done:
+                    oldest.append(key)
+                    if len(oldest) == excess:
+                        break
+            for key in oldest:
+                del entries[key]
+            self.evictions += len(oldest)
+
+    def _lookup(self, key: Hashable, fingerprint: str) -> Optional[_Entry]:
+        """Live entry for key, raising IdempotencyConflict on a mismatched request"""
+        self._evict()
+        entry = self._entries.get(key)
+        if entry is not None and entry.fingerprint != fingerprint:
+            raise _conflict(key)
+        return entry
+
+    def _insert(self, key: Hashable, fingerprint: str, waiter: Any) -> _Entry:
+        """Register the first run for key"""
+        entry = _Entry(fingerprint, self._clock() + self.ttl, waiter)
+        self._entries[key] = entry
+        self.executions += 1
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Store counters"""
+        return {
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "executions": self.executions,
+            "replays": self.replays,
+            "concurrent_waits": self.waits,
+            "evictions": self.evictions
+        }
+
+
+class IdempotencyStore(_EntryTable):
+    """Thread-safe idempotency store"""
+
+    def __init__(self, ttl: float = 24 * 3600, max_entries: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: Seconds a result is replayed for
+            max_entries: Most remembered keys before the oldest are dropped early
+            clock: Monotonic time source (injectable for testing)
+        """
+        super().__init__(ttl, max_entries, clock)
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, fingerprint: str, compute: Callable[[], Any],
+            cacheable: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, bool]:
+        """
+        Run compute once per key.
+
+        Args:
+            key: Scoped idempotency key
+            fingerprint: request_fingerprint of the request's parameters
+            compute: Performs the operation
+            cacheable: Whether a result should be replayed (e.g. not server errors)
+
+        Returns:
+            (result, replayed) tuple
+
+        Raises:
+            IdempotencyConflict: If key was used with a different fingerprint
+        """
+        while True:
+            with self._lock:
+                entry = self._lookup(key, fingerprint)
+                if entry is None:
+                    entry = self._insert(key, fingerprint, threading.Event())
+                    break
+                if entry.done:
+                    self.replays += 1
+                    return entry.result, True
+                self.waits += 1
+                waiter = entry.waiter
+            # Duplicate of a request still in flight: wait, then look again
+            waiter.wait()
+
+        keep = False
+        try:
+            result = compute()
+            keep = cacheable(result)
+            return result, False
+        finally:
+            with self._lock:
+                if keep:
+                    entry.result = result
+                    entry.done = True
+                elif self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.waiter.set()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires
+    ON idempotency_keys (expires_at);
+"""
+
+
+class SQLiteIdempotencyStore(ProcessLocalConnection):
+    """
+    Idempotency store shared by every process using the same database file.
+
+    The key column's primary key constraint decides which request runs: the
+    first to insert its key claims it, and duplicates poll the row until the
+    result is stored or the claim is dropped. A claim is held for `lease`
+    seconds, so a worker that dies mid-request does not block its key for
+    the whole TTL. Expired rows are deleted through the expiry index before
+    each claim, and the table is trimmed to max_entries every
+    TRIM_INTERVAL executions.
+
+    Results are stored as JSON, so tuples come back as lists.
+    """
+
+    # Executions between max_entries checks
+    TRIM_INTERVAL = 1024
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600,
+                 max_entries: int = 100000, lease: float = 120.0,
+                 poll_interval: float = 0.05, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path: SQLite database file, or ":memory:" for a store private to
+                this process (default_ledger_path() when not given)
+            ttl: Seconds a result is replayed for
+            max_entries: Most remembered keys before the oldest are dropped early
+            lease: Seconds a running request holds its key before a duplicate
+                may run it again; longer than the server's request timeout
+            poll_interval: Seconds between checks while waiting on a duplicate
+            clock: Wall-clock time source shared by all processes (injectable for testing)
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        path = path or default_ledger_path()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._open_connection().executescript(_SCHEMA)
+        self.replays = 0
+        self.executions = 0
+        self.waits = 0
+        self.evictions = 0
+
+    def _claim(self, key: str, fingerprint: str, owner: str) -> Optional[Tuple[str, int, Optional[str]]]:
+        """
+        Claim key for owner unless another request holds it.
+
+        Returns:
+            None if owner now holds the key, otherwise the existing
+            (fingerprint, done, result JSON) row
+        """
+        now = self._clock()
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.evictions += connection.execute(
+                    "DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,)
+                ).rowcount
+                row = connection.execute(
+                    "SELECT fingerprint, done, result FROM idempotency_keys WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    connection.execute(
+                        "INSERT INTO idempotency_keys (key, fingerprint, owner, expires_at) "
+                        "VALUES (?, ?, ?, ?)", (key, fingerprint, owner, now + self.lease)
+                    )
+                    self.executions += 1
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        return row
+
+    def _finish(self, key: str, owner: str, result: Any, keep: bool):
+        """Store owner's result for key, or drop its claim so a retry runs again"""
+        with self._lock:
+            if keep:
+                self._connection.execute(
+                    "UPDATE idempotency_keys SET done = 1, result = ?, expires_at = ? "
+                    "WHERE key = ? AND owner = ?",
+                    (json.dumps(result), self._clock() + self.ttl, key, owner)
+                )
+            else:
+                self._connection.execute(
+                    "DELETE FROM idempotency_keys WHERE key = ? AND owner = ?", (key, owner)
+                )
+
+    def _trim(self):
+        """Drop the oldest finished keys beyond max_entries"""
+        with self._lock:
+            excess = self._connection.execute(
+                "SELECT COUNT(*) FROM idempotency_keys"
+            ).fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.evictions += self._connection.execute(
+                    "DELETE FROM idempotency_keys WHERE key IN (SELECT key FROM idempotency_keys "
+                    "WHERE done = 1 ORDER BY expires_at LIMIT ?)", (excess,)
+                ).rowcount
+
+    def run(self, key: Hashable, fingerprint: str, compute: Callable[[], Any],
+            cacheable: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, bool]:
+        """
+        Run compute once per key across every process sharing the database.
+
+        Args:
+            key: Scoped idempotency key (JSON-serializable)
+            fingerprint: request_fingerprint of the request's parameters
+            compute: Performs the operation; its result must be JSON-serializable
+            cacheable: Whether a result should be replayed (e.g. not server errors)
+
+        Returns:
+            (result, replayed) tuple
+
+        Raises:
+            IdempotencyConflict: If key was used with a different fingerprint
+        """
+        stored_key = json.dumps(key, separators=(",", ":"))
+        owner = new_id("idem")
+        waited = False
+        while True:
+            row = self._claim(stored_key, fingerprint, owner)
+            if row is None:
+                break
+            stored_fingerprint, done, stored = row
+            if stored_fingerprint != fingerprint:
+                raise _conflict(key)
+            if done:
+                self.replays += 1
+                return json.loads(stored), True
+            # Duplicate of a request still in flight, maybe in another process
+            if not waited:
+                self.waits += 1
+                waited = True
+            time.sleep(self.poll_interval)
+
+        if self.executions % self.TRIM_INTERVAL == 0:
+            self._trim()
+        keep = False
+        try:
+            result = compute()
+            keep = cacheable(result)
+            return result, False
+        finally:
+            self._finish(stored_key, owner, result if keep else None, keep)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Store counters; all but size count this process only"""
+        return {
+            "size": len(self),
+            "ttl_seconds": self.ttl,
+            "executions": self.executions,
+            "replays": self.replays,
+            "concurrent_waits": self.waits,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
+
+
+class AsyncIdempotencyStore(_EntryTable):
+    """Idempotency store for coroutines sharing one event loop"""
+
+    def __init__(self, ttl: float = 24 * 3600, max_entries: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: Seconds a result is replayed for
+            max_entries: Most remembered keys before the oldest are dropped early
+            clock: Monotonic time source (injectable for testing)
+        """
+        super().__init__(ttl, max_entries, clock)
+
+    async def run(self, key: Hashable, fingerprint: str,
+                  compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await compute once per key; failures are not remembered.
+
+        Args:
+            key: Scoped idempotency key
+            fingerprint: request_fingerprint of the request's parameters
+            compute: Coroutine function performing the operation
+
+        Returns:
+            (result, replayed) tuple
+
+        Raises:
+            IdempotencyConflict: If key was used with a different fingerprint
+        """
+        while True:
+            entry = self._lookup(key, fingerprint)
+            if entry is None:
+                entry = self._insert(key, fingerprint, asyncio.get_running_loop().create_future())
+                break
+            if entry.done:
+                self.replays += 1
+                return entry.result, True
+            self.waits += 1
+            # Shielded so a cancelled duplicate does not cancel the shared waiter
+            await asyncio.shield(entry.waiter)
+
+        try:
+            result = await compute()
+        except BaseException:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            raise
+        else:
+            entry.result = result
+            entry.done = True
+            return result, False
+        finally:
+            if not entry.waiter.done():
+                entry.waiter.set_result(None)
@@ -0,0 +1,326 @@
+"""
+HerBid Knowledge Index
+Inverted indexes over the AGI knowledge base so partner lookups only touch
+businesses that can actually contribute to a contract.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from business_catalogue import BusinessCatalogue
+
+# (skill IDs, location ID, industry ID) of a catalogue row
+Terms = Tuple[FrozenSet[int], Optional[int], Optional[int]]
+
+_UNINDEXED: Terms = (frozenset(), None, None)
+
+
+class KnowledgeIndex:
+    """
+    Maintains skill, location and industry posting lists over a BusinessCatalogue.
+
+    Terms are the catalogue's interned IDs and each posting list is a sorted
+    array of catalogue rows, so the index holds no names or strings of its own;
+    a business's current terms are read from the catalogue columns. Rows are
+    assigned in insertion order, so candidate lists come back in the same order
+    as the knowledge base itself.
+
+    copy() is cheap: posting lists are shared with the original and only
+    copied the first time the copy changes them, so the original can keep
+    serving readers unchanged.
+    """
+
+    def __init__(self, catalogue: BusinessCatalogue):
+        """
+        Initialize empty indexes.
+
+        Args:
+            catalogue: Catalogue whose rows are indexed
+        """
+        self.catalogue = catalogue
+        self.skill_index: Dict[int, array] = {}
+        self.location_index: Dict[int, array] = {}
+        self.industry_index: Dict[int, array] = {}
+        # Terms whose posting lists this index owns, per posting dict; the rest are shared
+        self._owned: Dict[int, Set[int]] = {}
+
+    def copy(self, catalogue: BusinessCatalogue) -> "KnowledgeIndex":
+        """
+        Copy sharing every posting list until the copy modifies it.
+
+        Args:
+            catalogue: Copy of this index's catalogue that the copy indexes
+        """
+        clone = KnowledgeIndex(catalogue)
+        clone.skill_index = dict(self.skill_index)
+        clone.location_index = dict(self.location_index)
+        clone.industry_index = dict(self.industry_index)
+        return clone
+
+    @classmethod
+    def from_catalogue(cls, catalogue: BusinessCatalogue) -> "KnowledgeIndex":
+        """Build an index over every row of a catalogue"""
+        index = cls(catalogue)
+        for row in range(len(catalogue)):
+            index.add_row(row)
+        return index
+
+    def terms(self, row: int) -> Terms:
+        """Skill, location and industry IDs a row currently has in the catalogue"""
+        catalogue = self.catalogue
+        return frozenset(catalogue.skill_ids(row)), catalogue.location_id(row), catalogue.industry_id(row)
+
+    def add_row(self, row: int, previous: Optional[Terms] = None):
+        """
+        Index a catalogue row after it was added or replaced.
+
+        Args:
+            row: Catalogue row
+            previous: terms(row) from before the row was replaced (None for a new row)
+        """
+        skills, location, industry = self.terms(row)
+        old_skills, old_location, old_industry = previous or _UNINDEXED
+        for skill in old_skills - skills:
+            self._discard(self.skill_index, skill, row)
+        for skill in skills - old_skills:
+            self._insert(self.skill_index, skill, row)
+        for index, old_term, term in ((self.location_index, old_location, location),
+                                      (self.industry_index, old_industry, industry)):
+            if term != old_term:
+                if old_term is not None:
+                    self._discard(index, old_term, row)
+                self._insert(index, term, row)
+
+    def _postings(self, index: Dict[int, array], term: int) -> array:
+        """Posting list for term that this index may modify, copying a shared one first"""
+        owned = self._owned.setdefault(id(index), set())
+        postings = index.get(term)
+        if postings is None or term not in owned:
+            postings = index[term] = array("I", postings or ())
+            owned.add(term)
+        return postings
+
+    def _insert(self, index: Dict[int, array], term: int, row: int):
+        """Add a row to a posting list, keeping it sorted"""
+        postings = self._postings(index, term)
+        postings.insert(bisect_left(postings, row), row)
+
+    def _discard(self, index: Dict[int, array], term: int, row: int):
+        """Drop a posting and the posting list itself once it is empty"""
+        if term not in index:
+            return
+        postings = self._postings(index, term)
+        position = bisect_left(postings, row)
+        if position < len(postings) and postings[position] == row:
+            del postings[position]
+        if not postings:
+            del index[term]
+
+    def _names(self, index: Dict[int, array], term_id: Optional[int]) -> Set[str]:
+        """Names of the businesses posted under a term (None for a term never interned)"""
+        names = self.catalogue.names
+        return {names[row] for row in index.get(term_id, ())}
+
+    def businesses_with_skill(self, skill: str) -> Set[str]:
+        """Businesses that list the given skill"""
+        return self._names(self.skill_index, self.catalogue.skills.id_of(skill))
+
+    def businesses_in_location(self, location: str) -> Set[str]:
+        """Businesses located in the given location"""
+        return self._names(self.location_index, self.catalogue.locations.id_of(location))
+
+    def businesses_in_industry(self, industry: str) -> Set[str]:
+        """Businesses operating in the given industry"""
+        return self._names(self.industry_index, self.catalogue.industries.id_of(industry))
+
+    def ordinal(self, business_name: str) -> int:
+        """Position of a business in knowledge base insertion order"""
+        return self.catalogue.row(business_name)
+
+    def candidates_for_skills(self, skills: Iterable[str]) -> List[str]:
+        """
+        Businesses providing at least one of the given skills.
+
+        Args:
+            skills: Skills to look up
+
+        Returns:
+            Business names in knowledge base insertion order
+        """
+        skill_ids = self.catalogue.skills.id_of
+        rows: Set[int] = set()
+        for skill in skills:
+            rows.update(self.skill_index.get(skill_ids(skill), ()))
+        names = self.catalogue.names
+        return [names[row] for row in sorted(rows)]
+
+
+class ComplementaryIndustries:
+    """
+    Symmetric complementary-industry relation over interned industry IDs.
+
+    Each industry gets a dense integer ID and a bitset row, so a lookup is two
+    dict hits and a shift regardless of how many pairs are registered. A dense
+    boolean matrix is kept alongside for vectorized scoring and is patched in
+    place as pairs are added.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]] = ()):
+        """
+        Initialize the relation.
+
+        Args:
+            pairs: Complementary (industry_a, industry_b) pairs, order-insensitive
+        """
+        self._ids: Dict[Any, int] = {}
+        self._rows: List[int] = []
+        self._matrix = None
+        for industry_a, industry_b in pairs:
+            self.add_pair(industry_a, industry_b)
+
+    def copy(self) -> "ComplementaryIndustries":
+        """Independent copy; pairs added to it do not affect this relation"""
+        clone = ComplementaryIndustries()
+        clone._ids = dict(self._ids)
+        clone._rows = list(self._rows)
+        clone._matrix = self._matrix.copy() if self._matrix is not None else None
+        return clone
+
+    def __len__(self) -> int:
+        """Number of interned industries"""
+        return len(self._rows)
+
+    def industry_id(self, industry: Any) -> int:
+        """Intern an industry, returning its dense ID"""
+        industry_id = self._ids.get(industry)
+        if industry_id is None:
+            industry_id = self._ids[industry] = len(self._rows)
+            self._rows.append(0)
+        return industry_id
+
+    def add_pair(self, industry_a: Any, industry_b: Any):
+        """Mark two industries as complementary in both directions"""
+        id_a = self.industry_id(industry_a)
+        id_b = self.industry_id(industry_b)
+        self._rows[id_a] |= 1 << id_b
+        self._rows[id_b] |= 1 << id_a
+        matrix = self._matrix
+        if matrix is not None and max(id_a, id_b) < matrix.shape[0]:
+            matrix[id_a, id_b] = matrix[id_b, id_a] = True
+
+    def are_complementary(self, industry_a: Any, industry_b: Any) -> bool:
+        """Whether two industries are complementary (either order)"""
+        id_a = self._ids.get(industry_a)
+        id_b = self._ids.get(industry_b)
+        if id_a is None or id_b is None:
+            return False
+        return bool(self._rows[id_a] >> id_b & 1)
+
+    def are_complementary_ids(self, id_a: int, id_b: int) -> bool:
+        """Whether two interned industry IDs are complementary"""
+        return bool(self._rows[id_a] >> id_b & 1)
+
+    def dense_matrix(self, numpy_module):
+        """
+        Boolean adjacency matrix covering every interned industry.
+
+        The matrix grows geometrically, so adding industries only triggers an
+        occasional copy; pairs added afterwards are written straight into it.
+        """
+        size = len(self._rows)
+        matrix = self._matrix
+        if matrix is None or matrix.shape[0] < size:
+            capacity = max(size, 2 * matrix.shape[0] if matrix is not None else 16)
+            matrix = numpy_module.zeros((capacity, capacity), dtype=bool)
+            for industry_id, row in enumerate(self._rows):
+                while row:
+                    low_bit = row & -row
+                    matrix[industry_id, low_bit.bit_length() - 1] = True
+                    row ^= low_bit
+            self._matrix = matrix
+        return matrix
+
+
+class ContractIndex:
+    """
+    Maps each skill to the contracts that require it.
+
+    Used to find the contracts a business change can affect and the contracts
+    a business can contribute to. Like KnowledgeIndex, copies share posting
+    lists until they modify them.
+    """
+
+    def __init__(self):
+        """Initialize an empty index"""
+        self.skill_index: Dict[str, Set[str]] = {}
+        self._required: Dict[str, frozenset] = {}
+        self._owned: Set[str] = set()
+        # Contracts without required skills; any business can staff them
+        self.unconstrained: frozenset = frozenset()
+
+    @classmethod
+    def from_contracts(cls, contracts: Dict[str, Dict[str, Any]]) -> "ContractIndex":
+        """Build an index from a knowledge base `contracts` mapping"""
+        index = cls()
+        for contract_name, contract_data in contracts.items():
+            index.add_contract(contract_name, contract_data)
+        return index
+
+    def copy(self) -> "ContractIndex":
+        """Copy sharing every posting list until the copy modifies it"""
+        clone = ContractIndex()
+        clone.skill_index = dict(self.skill_index)
+        clone._required = dict(self._required)
+        clone.unconstrained = self.unconstrained
+        return clone
+
+    def _postings(self, skill: str) -> Set[str]:
+        """Posting list for skill that this index may modify, copying a shared one first"""
+        postings = self.skill_index.get(skill)
+        if postings is None or skill not in self._owned:
+            postings = self.skill_index[skill] = set(postings or ())
+            self._owned.add(skill)
+        return postings
+
+    def add_contract(self, contract_name: str, contract_data: Dict[str, Any]):
+        """Index a contract, replacing any postings from a previous version"""
+        required = frozenset(contract_data.get("required_skills", ()))
+        for skill in self._required.get(contract_name, frozenset()) - required:
+            postings = self._postings(skill)
+            postings.discard(contract_name)
+            if not postings:
+                del self.skill_index[skill]
+        for skill in required:
+            self._postings(skill).add(contract_name)
+        self._required[contract_name] = required
+        if required:
+            self.unconstrained = self.unconstrained - {contract_name}
+        else:
+            self.unconstrained = self.unconstrained | {contract_name}
+
+    def required_skills(self, contract_name: str) -> frozenset:
+        """Skills a contract requires"""
+        return self._required.get(contract_name, frozenset())
+
+    def contracts_requiring(self, skills: Iterable[str]) -> Set[str]:
+        """Contracts requiring at least one of the given skills"""
+        contracts: Set[str] = set()
+        for skill in skills:
+            contracts.update(self.skill_index.get(skill, ()))
+        return contracts
+
+    def matches(self, skills: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Contracts requiring at least one of the given skills.
+
+        Runs in time proportional to the number of (skill, contract) matches.
+
+        Returns:
+            Contract name -> the given skills it requires, in the order given
+        """
+        matched: Dict[str, List[str]] = {}
+        for skill in dict.fromkeys(skills):
+            for contract_name in self.skill_index.get(skill, ()):
+                matched.setdefault(contract_name, []).append(skill)
+        return matched
@@ -0,0 +1,323 @@
+"""
+HerBid Knowledge Snapshots
+Copy-on-write versions of the AGI knowledge base for lock-free concurrent reads.
+
+Readers take the current KnowledgeSnapshot, a single attribute read, and work
+against it for the whole query; nothing reachable from a published snapshot
+is modified again, so readers need no locks and never observe a half-applied
+write. Writers stage their changes on a SnapshotDraft built from copies of
+the current version and publish it with one reference swap. Writes that
+arrive while another publish is in progress are folded into the next draft
+(group commit), so a burst of writes costs one copy and one publish.
+
+Each snapshot also carries materialized results (the optimal team for every
+contract). A draft records which contracts its writes can affect, found
+through a skill -> contracts index, and only those are recomputed before the
+snapshot is published.
+"""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+from business_catalogue import BusinessCatalogue
+from knowledge_index import ComplementaryIndustries, ContractIndex, KnowledgeIndex
+from partnership_scoring import PartnershipScorer
+from result_cache import FrozenDict
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """One immutable version of the knowledge base and its derived indexes"""
+    version: int
+    businesses: BusinessCatalogue
+    contracts: Mapping[str, Mapping[str, Any]]  # read-only FrozenDicts
+    complementary_pairs: Tuple[Tuple[str, str], ...]
+    index: KnowledgeIndex
+    complementary_industries: ComplementaryIndustries
+    scorer: PartnershipScorer
+    knowledge_base: Mapping[str, Any]  # read-only view in the engine's knowledge base shape
+    contract_index: ContractIndex
+    teams: Mapping[str, Any]  # contract name -> materialized optimal team (None if unstaffable)
+
+    @classmethod
+    def build(cls, knowledge_base: Dict[str, Any], version: int = 0,
+              materialize: Optional["Materializer"] = None) -> "KnowledgeSnapshot":
+        """Build the first snapshot from a knowledge base dict"""
+        draft = SnapshotDraft.empty()
+        for industry_a, industry_b in knowledge_base.get("complementary_industries", ()):
+            draft.add_complementary_industries(industry_a, industry_b)
+        for business_name, business_data in knowledge_base["businesses"].items():
+            draft.add_business(business_name, business_data)
+        for contract_name, contract_data in knowledge_base["contracts"].items():
+            draft.add_contract(contract_name, contract_data)
+        return draft.freeze(version, materialize)
+
+
+# Computes the results for the given contracts (None = all) against a new snapshot
+Materializer = Callable[[KnowledgeSnapshot, Optional[Set[str]]], Dict[str, Any]]
+
+
+class SnapshotDraft:
+    """Mutable copy of a snapshot that writes are staged on"""
+
+    def __init__(self, businesses: BusinessCatalogue, contracts: Dict[str, Mapping[str, Any]],
+                 complementary_pairs: List[Tuple[str, str]], index: KnowledgeIndex,
+                 complementary_industries: ComplementaryIndustries, scorer: PartnershipScorer,
+                 contract_index: ContractIndex, teams: Dict[str, Any]):
+        self.businesses = businesses
+        self.contracts = contracts
+        self.complementary_pairs = complementary_pairs
+        self.index = index
+        self.complementary_industries = complementary_industries
+        self.scorer = scorer
+        self.contract_index = contract_index
+        self.teams = teams
+        # Contracts whose materialized team may be stale; None means all of them
+        self.dirty_contracts: Optional[Set[str]] = set()
+        self.writes = 0
+
+    @classmethod
+    def empty(cls) -> "SnapshotDraft":
+        catalogue = BusinessCatalogue()
+        relation = ComplementaryIndustries()
+        return cls(catalogue, {}, [], KnowledgeIndex(catalogue), relation,
+                   PartnershipScorer(catalogue, relation), ContractIndex(), {})
+
+    @classmethod
+    def from_snapshot(cls, snapshot: KnowledgeSnapshot) -> "SnapshotDraft":
+        """Copy a snapshot; posting lists are shared until modified"""
+        catalogue = snapshot.businesses.copy()
+        relation = snapshot.complementary_industries.copy()
+        return cls(
+            catalogue,
+            dict(snapshot.contracts),
+            list(snapshot.complementary_pairs),
+            snapshot.index.copy(catalogue),
+            relation,
+            snapshot.scorer.copy(catalogue, relation),
+            snapshot.contract_index.copy(),
+            dict(snapshot.teams)
+        )
+
+    def _mark_dirty(self, contracts):
+        if self.dirty_contracts is not None:
+            self.dirty_contracts.update(contracts)
+
+    def add_business(self, business_name: str, business_data: Dict[str, Any]):
+        """Add or replace a business"""
+        businesses = self.businesses
+        previous_terms = None
+        previous_skills = ()
+        if business_name in businesses:
+            previous_terms = self.index.terms(businesses.row(business_name))
+            previous_skills = businesses.skill_names(previous_terms[0])
+        # The catalogue validates location/industry/reputation before anything else changes
+        row = businesses.add(business_name, business_data)
+        # Teams that could include the business, before or after the change
+        self._mark_dirty(self.contract_index.contracts_requiring(previous_skills))
+        self._mark_dirty(self.contract_index.contracts_requiring(business_data.get("skills", ())))
+        self._mark_dirty(self.contract_index.unconstrained)
+        self.scorer.refresh()
+        self.index.add_row(row, previous_terms)
+        self.writes += 1
+
+    def add_contract(self, contract_name: str, contract_data: Dict[str, Any]):
+        """Add or replace a contract"""
+        # Published contracts are shared by every later version and handed to
+        # callers as is, so they are stored read-only with tuples for lists
+        contract_data = FrozenDict({
+            **{key: tuple(value) if isinstance(value, list) else value
+               for key, value in contract_data.items()},
+            "required_skills": tuple(contract_data.get("required_skills", ()))
+        })
+        self.contracts[contract_name] = contract_data
+        self.contract_index.add_contract(contract_name, contract_data)
+        self._mark_dirty((contract_name,))
+        self.writes += 1
+
+    def add_complementary_industries(self, industry_a: str, industry_b: str):
+        """Register two industries as complementary (order-insensitive)"""
+        if not self.complementary_industries.are_complementary(industry_a, industry_b):
+            self.complementary_pairs.append((industry_a, industry_b))
+        self.complementary_industries.add_pair(industry_a, industry_b)
+        # Industry synergy feeds every team's score
+        self.dirty_contracts = None
+        self.writes += 1
+
+    def freeze(self, version: int, materialize: Optional[Materializer] = None) -> KnowledgeSnapshot:
+        """
+        Turn the draft into a snapshot; the draft must not be used afterwards.
+
+        Args:
+            version: Version number of the snapshot
+            materialize: Recomputes results for the dirty contracts before the
+                snapshot is returned (and so before anyone can read it)
+        """
+        businesses = self.businesses
+        contracts = MappingProxyType(self.contracts)
+        complementary_pairs = tuple(self.complementary_pairs)
+        snapshot = KnowledgeSnapshot(
+            version=version,
+            businesses=businesses,
+            contracts=contracts,
+            complementary_pairs=complementary_pairs,
+            index=self.index,
+            complementary_industries=self.complementary_industries,
+            scorer=self.scorer,
+            knowledge_base=MappingProxyType({
+                "businesses": businesses,
+                "contracts": contracts,
+                "complementary_industries": complementary_pairs
+            }),
+            contract_index=self.contract_index,
+            teams=MappingProxyType(self.teams)
+        )
+        if materialize is not None:
+            dirty = self.dirty_contracts
+            if dirty is None or dirty:
+                # Filled in before publication; readers only ever see the finished mapping
+                self.teams.update(materialize(snapshot, dirty))
+        return snapshot
+
+
+class _PendingWrite:
+    """A write waiting for a publish"""
+    __slots__ = ("apply", "error")
+
+    def __init__(self, apply: Callable[[SnapshotDraft], None]):
+        self.apply = apply
+        self.error: Optional[BaseException] = None
+
+
+class SnapshotStore:
+    """
+    Holds the current knowledge base snapshot and publishes new versions.
+
+    Every write runs under the publish lock against a draft of the current
+    version. A writer that finds its write already applied by another thread's
+    publish returns without copying anything.
+    """
+
+    def __init__(self, knowledge_base: Dict[str, Any], materialize: Optional[Materializer] = None):
+        """
+        Args:
+            knowledge_base: Initial knowledge base dict (copied)
+            materialize: Computes per-contract results for each new snapshot
+        """
+        self._materialize = materialize
+        self._current = KnowledgeSnapshot.build(knowledge_base, materialize=materialize)
+        self._publish_lock = threading.Lock()
+        self._queue_lock = threading.Lock()
+        self._pending: List[_PendingWrite] = []
+        self._local = threading.local()
+        self.publishes = 0
+        self.writes = 0
+
+    @property
+    def current(self) -> KnowledgeSnapshot:
+        """Latest published snapshot"""
+        return self._current
+
+    def write(self, apply: Callable[[SnapshotDraft], None]):
+        """
+        Apply a write and publish it (together with any writes queued meanwhile).
+
+        Inside batch() on the same thread the write is staged on the batch's
+        draft instead and published when the batch ends.
+
+        Args:
+            apply: Function staging the write on a draft
+
+        Raises:
+            Whatever apply raises; other queued writes are still published.
+            If the new version cannot be built (materializing its results
+            fails), that error, and nothing is published.
+        """
+        draft = getattr(self._local, "draft", None)
+        if draft is not None:
+            apply(draft)
+            return
+
+        pending = _PendingWrite(apply)
+        with self._queue_lock:
+            self._pending.append(pending)
+        with self._publish_lock:
+            draft, drained = self._drain(None)
+            if draft is not None:
+                self._publish(draft, drained)
+        if pending.error is not None:
+            raise pending.error
+
+    @contextmanager
+    def batch(self) -> Iterator[SnapshotDraft]:
+        """
+        Stage several writes and publish them as one version.
+
+        Nothing is published if the block raises. Nested batches join the
+        outermost one.
+        """
+        if getattr(self._local, "draft", None) is not None:
+            yield self._local.draft
+            return
+
+        with self._publish_lock:
+            draft = SnapshotDraft.from_snapshot(self._current)
+            self._local.draft = draft
+            try:
+                yield draft
+            finally:
+                self._local.draft = None
+            # Writes queued while the batch ran go out in the same version
+            draft, drained = self._drain(draft)
+            self._publish(draft, drained)
+
+    def _drain(self, draft: Optional[SnapshotDraft]) -> Tuple[Optional[SnapshotDraft], List[_PendingWrite]]:
+        """
+        Apply queued writes to draft (created on demand); caller holds the publish lock
+
+        Returns:
+            (draft, the queued writes applied to it)
+        """
+        with self._queue_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return draft, pending
+        if draft is None:
+            draft = SnapshotDraft.from_snapshot(self._current)
+        for write in pending:
+            try:
+                write.apply(draft)
+            except Exception as e:
+                write.error = e
+        return draft, pending
+
+    def _publish(self, draft: SnapshotDraft, drained: List[_PendingWrite] = ()):
+        """
+        Swap in the draft as the next version; caller holds the publish lock
+
+        If building the snapshot fails nothing is published, and every write
+        drained into the draft fails with the same error.
+        """
+        if not draft.writes:
+            return
+        try:
+            snapshot = draft.freeze(self._current.version + 1, self._materialize)
+        except Exception as e:
+            for write in drained:
+                if write.error is None:
+                    write.error = e
+            raise
+        self.writes += draft.writes
+        self.publishes += 1
+        self._current = snapshot
+
+    def stats(self) -> Dict[str, int]:
+        """Publish counters"""
+        return {
+            "version": self._current.version,
+            "publishes": self.publishes,
+            "writes": self.writes
+        }
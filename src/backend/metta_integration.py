@@ -6,54 +6,235 @@ using MeTTa symbolic reasoning.
 
 import os
 import json
-from typing import List, Dict, Any, Optional, Tuple
+import base64
+import heapq
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Any, Mapping, Optional, Set, Tuple
 from dataclasses import dataclass
 
+from business_catalogue import BusinessCatalogue
+from knowledge_index import ComplementaryIndustries, KnowledgeIndex
+from knowledge_snapshot import KnowledgeSnapshot, SnapshotDraft, SnapshotStore
+from metta_loader import build_knowledge_base, load_fact_store
+from partnership_scoring import MAX_PAIR_SCORE, PartnershipScorer
+from result_cache import FrozenDict, ResultCache
+from skill_coverage import SearchTimeout, SkillCoverageSolver
+from team_enumeration import TeamCandidate, TeamEnumerator, TeamObjective
+
 # Note: In a real implementation, you would install metta-py
 # pip install metta-py
 # For now, we'll create a mock implementation that demonstrates the structure
 
-@dataclass
+DEFAULT_KNOWLEDGE_GRAPH_PATH = os.path.join(os.path.dirname(__file__), 'herbid_agi', 'knowledge_graph.metta')
+
+# Partners are ranked by (-compatibility_score, knowledge base ordinal)
+RankKey = Tuple[float, int]
+
+def _encode_cursor(rank_key: RankKey) -> str:
+    """Encode the rank key of the last returned partner as an opaque cursor"""
+    payload = json.dumps(list(rank_key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def _decode_cursor(cursor: str) -> RankKey:
+    """Decode a cursor produced by _encode_cursor"""
+    try:
+        negative_score, ordinal = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(negative_score), int(ordinal)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+@dataclass(frozen=True, slots=True)
 class PartnershipRecommendation:
-    """Data class for partnership recommendations"""
+    """Data class for partnership recommendations (immutable: cached results are shared)"""
     partner_name: str
-    skills: List[str]
+    skills: Tuple[str, ...]
     compatibility_score: float
     location: str
     industry: str
     reputation_score: int
     reasoning: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class ContractOpportunity:
+    """Data class for a contract a business can contribute to (immutable: results are cached)"""
+    contract_name: str
+    matched_skills: Tuple[str, ...]
+    missing_skills: Tuple[str, ...]
+    coverage: float  # share of the required skills the business provides
+    budget: Any
+    deadline: Optional[str]
+
+def _numeric_budget(budget: Any) -> Optional[float]:
+    """Contract budget as a number, None when missing or malformed"""
+    try:
+        return float(budget)
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True, slots=True)
 class TeamFormation:
-    """Data class for multi-partner team formations"""
-    team_members: List[str]
+    """Data class for multi-partner team formations (immutable: cached and materialized teams are shared)"""
+    team_members: Tuple[str, ...]
     total_score: float
-    skill_coverage: Dict[str, str]  # skill -> business mapping
-    collaborative_bonuses: List[str]
+    skill_coverage: Mapping[str, str]  # skill -> business mapping (FrozenDict)
+    collaborative_bonuses: Tuple[str, ...]
+
+@dataclass(frozen=True, slots=True)
+class RankedTeam:
+    """Data class for one team in a ranking (immutable: rankings are cached)"""
+    team_members: Tuple[str, ...]
+    objective_score: float
+    total_score: float  # mean pairwise compatibility, as in TeamFormation
+    average_reputation: float
+    skill_coverage: Mapping[str, str]  # skill -> business mapping (FrozenDict)
+    collaborative_bonuses: Tuple[str, ...]
+
+@dataclass(frozen=True, slots=True)
+class TeamRanking:
+    """Data class for ranked team formation results (immutable: rankings are cached)"""
+    contract_name: str
+    teams: Tuple[RankedTeam, ...]  # best first
+    pareto_front: Tuple[RankedTeam, ...]  # smallest first; each outscores every smaller team
+    exact: bool  # False when the search ran out of time
 
 class AGI_GigeBid_Engine:
     """
     Advanced AGI engine for GigeBid platform that combines symbolic reasoning 
     with practical partnership recommendations for gig economy professionals.
+    
+    The knowledge base is held as immutable versioned snapshots (see
+    knowledge_snapshot). Each query pins the current snapshot for its whole
+    duration, so queries never lock and never see a write half-applied, while
+    writes publish a new version atomically. Every snapshot carries the optimal
+    team for each contract; a write recomputes only the teams it can change.
     """
     
-    def __init__(self):
-        """Initialize the MeTTa runtime and load knowledge graph"""
+    def __init__(self, knowledge_graph_path: Optional[str] = DEFAULT_KNOWLEDGE_GRAPH_PATH,
+                 team_solver_time_budget: float = 1.0,
+                 cache_size: int = 1024,
+                 cache_ttl: float = 300.0):
+        """
+        Initialize the MeTTa runtime and load knowledge graph
+        
+        Args:
+            knowledge_graph_path: .metta file to load facts from; falls back to the
+                built-in mock knowledge base when None or missing
+            team_solver_time_budget: Seconds allowed per exact team formation search
+            cache_size: Maximum number of memoized query results
+            cache_ttl: Seconds a memoized query result stays valid
+        """
+        self.fact_store = None
+        self._pinned = threading.local()
+        self.result_cache = ResultCache(max_entries=cache_size, ttl=cache_ttl)
+        self.coverage_solver = SkillCoverageSolver(time_budget=team_solver_time_budget)
+        self.team_enumerator = TeamEnumerator(time_budget=team_solver_time_budget)
+        self.team_solves = 0
+
         try:
             # In real implementation:
             # from metta import MeTTa
             # self.metta = MeTTa()
             # self.metta.load_file(os.path.join(os.path.dirname(__file__), 'herbid_agi/knowledge_graph.metta'))
             
-            # Mock implementation for demonstration
-            self.knowledge_base = self._load_mock_knowledge_base()
+            if knowledge_graph_path and os.path.exists(knowledge_graph_path):
+                self.fact_store = load_fact_store(knowledge_graph_path)
+                knowledge_base = build_knowledge_base(self.fact_store)
+            else:
+                # Mock implementation for demonstration
+                knowledge_base = self._load_mock_knowledge_base()
+            self.snapshots = SnapshotStore(knowledge_base, materialize=self._materialize_teams)
             self.initialized = True
             print("AGI Engine initialized successfully")
         except Exception as e:
             print(f"Error initializing AGI Engine: {e}")
             self.initialized = False
     
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        """Snapshot pinned by the current query, else the latest one"""
+        pinned = getattr(self._pinned, "snapshot", None)
+        return pinned if pinned is not None else self.snapshots.current
+
+    @contextmanager
+    def read_snapshot(self) -> Iterator[KnowledgeSnapshot]:
+        """Pin one snapshot for every knowledge base read on this thread inside the block"""
+        pinned = getattr(self._pinned, "snapshot", None)
+        if pinned is not None:
+            yield pinned
+            return
+        with self._pin(self.snapshots.current) as snapshot:
+            yield snapshot
+
+    @contextmanager
+    def _pin(self, snapshot: KnowledgeSnapshot) -> Iterator[KnowledgeSnapshot]:
+        """Pin a specific snapshot on this thread, restoring the previous pin afterwards"""
+        previous = getattr(self._pinned, "snapshot", None)
+        self._pinned.snapshot = snapshot
+        try:
+            yield snapshot
+        finally:
+            self._pinned.snapshot = previous
+
+    def _materialize_teams(self, snapshot: KnowledgeSnapshot,
+                           contracts: Optional[Set[str]]) -> Dict[str, Optional[TeamFormation]]:
+        """
+        Solve the optimal team of each given contract against a snapshot about to be published.
+
+        Args:
+            snapshot: The new snapshot
+            contracts: Contracts whose team may have changed; None means all
+
+        Returns:
+            Contract name -> team (None if no team covers the contract)
+        """
+        if contracts is None:
+            contracts = snapshot.contracts
+        teams = {}
+        with self._pin(snapshot):
+            for contract_name in contracts:
+                self.team_solves += 1
+                try:
+                    teams[contract_name] = self._form_optimal_team(contract_name, None)
+                except (SearchTimeout, ValueError) as e:
+                    # Anything else is a bug and fails the publish rather than hiding as "no team"
+                    print(f"Error forming team for {contract_name}: {e}")
+                    teams[contract_name] = None
+        return teams
+
+    @contextmanager
+    def batch_updates(self) -> Iterator[SnapshotDraft]:
+        """Publish every knowledge base write made inside the block as one version"""
+        with self.snapshots.batch() as draft:
+            yield draft
+
+    @property
+    def knowledge_base(self) -> Mapping[str, Any]:
+        """Read-only knowledge base of the current snapshot"""
+        return self.snapshot.knowledge_base
+
+    @property
+    def catalogue(self) -> BusinessCatalogue:
+        """Business catalogue of the current snapshot"""
+        return self.snapshot.businesses
+
+    @property
+    def index(self) -> KnowledgeIndex:
+        return self.snapshot.index
+
+    @property
+    def complementary_industries(self) -> ComplementaryIndustries:
+        return self.snapshot.complementary_industries
+
+    @property
+    def scorer(self) -> PartnershipScorer:
+        return self.snapshot.scorer
+
+    @property
+    def generation(self) -> int:
+        """Knowledge base version; part of every cache key"""
+        return self.snapshot.version
+
     def _load_mock_knowledge_base(self) -> Dict[str, Any]:
         """Load mock knowledge base for demonstration"""
         return {
@@ -115,16 +296,20 @@ class AGI_GigeBid_Engine:
             ]
         }
 
-    def find_partners(self, user_business_name: str, contract_name: str) -> List[PartnershipRecommendation]:
+    def find_partners(self, user_business_name: str, contract_name: str,
+                      limit: Optional[int] = None,
+                      min_score: Optional[float] = None) -> List[PartnershipRecommendation]:
         """
         Queries the MeTTa knowledge graph to find viable partners for a given contract.
         
         Args:
             user_business_name: Name of the user's business
             contract_name: Name of the contract/project
+            limit: Return only the top `limit` partners (optional)
+            min_score: Drop partners scoring below this value (optional)
             
         Returns:
-            List of partnership recommendations
+            List of partnership recommendations, best first
         """
         if not self.initialized:
             return []
@@ -135,84 +320,155 @@ class AGI_GigeBid_Engine:
             # results = self.metta.query(query_pattern)
             
             # Mock implementation
-            recommendations = self._mock_find_partners(user_business_name, contract_name)
-            return recommendations
+            with self.read_snapshot():
+                cache_key = ("find_partners", user_business_name, contract_name, limit, min_score, None, self.generation)
+                recommendations = self.result_cache.get_or_compute(
+                    cache_key,
+                    lambda: self._mock_find_partners(user_business_name, contract_name, limit, min_score)
+                )
+            return list(recommendations)
             
         except Exception as e:
             print(f"Error finding partners: {e}")
             return []
 
-    def _mock_find_partners(self, user_business: str, contract: str) -> List[PartnershipRecommendation]:
-        """Mock implementation of partner finding logic"""
+    def find_partners_page(self, user_business_name: str, contract_name: str, limit: int,
+                           cursor: Optional[str] = None,
+                           min_score: Optional[float] = None) -> Tuple[List[PartnershipRecommendation], Optional[str]]:
+        """
+        Page through partner recommendations in ranking order.
+        
+        Args:
+            user_business_name: Name of the user's business
+            contract_name: Name of the contract/project
+            limit: Page size
+            cursor: Cursor returned with the previous page, None for the first page
+            min_score: Drop partners scoring below this value (optional)
+            
+        Returns:
+            (recommendations, next_cursor) tuple; next_cursor is None on the last page
+            
+        Raises:
+            ValueError: If limit is not positive or the cursor is malformed
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        after = _decode_cursor(cursor) if cursor else None
+        
+        if not self.initialized:
+            return [], None
+        
+        with self.read_snapshot():
+            # Fetch one extra partner to learn whether another page exists
+            cache_key = ("find_partners", user_business_name, contract_name, limit + 1, min_score, after, self.generation)
+            recommendations = self.result_cache.get_or_compute(
+                cache_key,
+                lambda: self._mock_find_partners(user_business_name, contract_name, limit + 1, min_score, after)
+            )
+            
+            page = list(recommendations[:limit])
+            next_cursor = None
+            if len(recommendations) > limit:
+                last = page[-1]
+                next_cursor = _encode_cursor((-last.compatibility_score, self.index.ordinal(last.partner_name)))
+        return page, next_cursor
+
+    def _mock_find_partners(self, user_business: str, contract: str,
+                            limit: Optional[int] = None,
+                            min_score: Optional[float] = None,
+                            after: Optional[RankKey] = None) -> Tuple[PartnershipRecommendation, ...]:
+        """Mock implementation of partner finding logic (a tuple, as results are cached)"""
         recommendations = []
         
         if contract not in self.knowledge_base["contracts"]:
-            return recommendations
+            return ()
         
         contract_info = self.knowledge_base["contracts"][contract]
         required_skills = contract_info["required_skills"]
         
-        user_business_info = self.knowledge_base["businesses"].get(user_business)
-        if not user_business_info:
-            return recommendations
+        catalogue = self.catalogue
+        if user_business not in catalogue:
+            return ()
         
-        user_skills = set(user_business_info["skills"])
+        user_skills = set(catalogue.skills_of(user_business))
         missing_skills = set(required_skills) - user_skills
+        # Overlaps are computed on interned skill IDs rather than strings
+        missing_ids = {catalogue.skills.id_of(skill) for skill in missing_skills} - {None}
         
         # Find businesses that can provide missing skills
-        for business_name, business_info in self.knowledge_base["businesses"].items():
+        candidates = []
+        for business_name in self.index.candidates_for_skills(missing_skills):
             if business_name == user_business:
                 continue
-                
-            business_skills = set(business_info["skills"])
-            skill_overlap = missing_skills.intersection(business_skills)
+            
+            row = catalogue.row(business_name)
+            skill_overlap = missing_ids.intersection(catalogue.skill_ids(row))
             
             if skill_overlap:
-                score = self._calculate_partnership_score(user_business_info, business_info)
-                
-                recommendation = PartnershipRecommendation(
-                    partner_name=business_name,
-                    skills=list(skill_overlap),
-                    compatibility_score=score,
-                    location=business_info["location"],
-                    industry=business_info["industry"],
-                    reputation_score=business_info["reputation"],
-                    reasoning=f"Provides {', '.join(skill_overlap)} skills needed for the project"
-                )
-                recommendations.append(recommendation)
+                candidates.append((business_name, row, skill_overlap))
         
-        # Sort by compatibility score
-        recommendations.sort(key=lambda x: x.compatibility_score, reverse=True)
-        return recommendations
-
-    def _calculate_partnership_score(self, business_a: Dict, business_b: Dict) -> float:
-        """Calculate compatibility score between two businesses"""
-        score = 50.0  # Base score
-        
-        # Location bonus
-        if business_a["location"] == business_b["location"]:
-            score += 15.0
+        # Score all candidates in a single batch
+        scores = self.score_partnerships(user_business, [name for name, _, _ in candidates])
         
-        # Industry synergy bonus
-        industry_a = business_a["industry"]
-        industry_b = business_b["industry"]
-        if (industry_a, industry_b) in self.knowledge_base["complementary_industries"] or \
-           (industry_b, industry_a) in self.knowledge_base["complementary_industries"]:
-            score += 10.0
+        ranked = (
+            ((-score, self.index.ordinal(candidate[0])), score, candidate)
+            for candidate, score in zip(candidates, scores)
+            if (min_score is None or score >= min_score)
+        )
+        if after is not None:
+            ranked = (item for item in ranked if item[0] > after)
+        
+        # Bounded heap keeps only the top `limit`; ties stay in knowledge base order
+        if limit is None:
+            survivors = sorted(ranked, key=lambda item: item[0])
+        else:
+            survivors = heapq.nsmallest(limit, ranked, key=lambda item: item[0])
+        
+        # Reasoning text is only built for partners that are actually returned
+        for _, score, (business_name, row, skill_overlap) in survivors:
+            skills = tuple(catalogue.skill_names(sorted(skill_overlap)))
+            recommendation = PartnershipRecommendation(
+                partner_name=business_name,
+                skills=skills,
+                compatibility_score=score,
+                location=catalogue.location_of(business_name),
+                industry=catalogue.industry_of(business_name),
+                reputation_score=catalogue.reputation_of(business_name),
+                reasoning=f"Provides {', '.join(skills)} skills needed for the project"
+            )
+            recommendations.append(recommendation)
+        
+        return tuple(recommendations)
+
+    def score_partnerships(self, business_name: str, candidate_names: List[str]) -> List[float]:
+        """
+        Score one business against many candidates in a single vectorized pass.
         
-        # Reputation bonus
-        avg_reputation = (business_a["reputation"] + business_b["reputation"]) / 2
-        if avg_reputation >= 85:
-            score += 15.0
-        elif avg_reputation >= 75:
-            score += 10.0
+        Args:
+            business_name: Name of the business to score from
+            candidate_names: Names of the businesses to score against
+            
+        Returns:
+            Compatibility scores (0-100) aligned with candidate_names
+        """
+        return self.scorer.score_one_to_many(business_name, candidate_names)
+
+    def partnership_score_matrix(self, names_a: List[str], names_b: List[str]) -> List[List[float]]:
+        """
+        Score every business in names_a against every business in names_b.
         
-        return min(score, 100.0)
+        Returns:
+            len(names_a) x len(names_b) matrix of compatibility scores
+        """
+        return self.scorer.score_matrix(names_a, names_b)
 
     def form_optimal_team(self, contract_name: str, available_businesses: List[str] = None) -> Optional[TeamFormation]:
         """
         Forms the optimal team for a given contract using multi-partner logic.
         
+        Without available_businesses this is a lookup of the team materialized
+        in the current snapshot.
+        
         Args:
             contract_name: Name of the contract
             available_businesses: List of available business names (optional)
@@ -220,14 +476,102 @@ class AGI_GigeBid_Engine:
         Returns:
             TeamFormation object with optimal team configuration
         """
-        if not self.initialized or contract_name not in self.knowledge_base["contracts"]:
+        if not self.initialized:
             return None
         
+        with self.read_snapshot() as snapshot:
+            if contract_name not in snapshot.contracts:
+                return None
+            if available_businesses is None:
+                # Maintained incrementally as the knowledge base changes
+                return snapshot.teams.get(contract_name)
+            
+            cache_key = (
+                "form_optimal_team",
+                contract_name,
+                tuple(available_businesses),
+                self.generation
+            )
+            return self.result_cache.get_or_compute(
+                cache_key,
+                lambda: self._form_optimal_team(contract_name, available_businesses)
+            )
+
+    def find_opportunities(self, business_name: str, limit: Optional[int] = None,
+                           min_coverage: Optional[float] = None) -> List[ContractOpportunity]:
+        """
+        Find the contracts where a business fills at least one required skill.
+        
+        Contracts come from the skill -> contracts index, so the cost grows with
+        the number of matches rather than the number of contracts.
+        
+        Args:
+            business_name: Name of the business
+            limit: Return only the top `limit` contracts (optional)
+            min_coverage: Drop contracts where the business covers less than this
+                share of the required skills (optional)
+            
+        Returns:
+            Opportunities ranked by coverage, then budget (highest first)
+        """
+        if not self.initialized:
+            return []
+        
+        with self.read_snapshot():
+            if business_name not in self.catalogue:
+                return []
+            cache_key = ("find_opportunities", business_name, limit, min_coverage, self.generation)
+            opportunities = self.result_cache.get_or_compute(
+                cache_key,
+                lambda: self._find_opportunities(business_name, limit, min_coverage)
+            )
+        return list(opportunities)
+
+    def _find_opportunities(self, business_name: str, limit: Optional[int],
+                            min_coverage: Optional[float]) -> Tuple[ContractOpportunity, ...]:
+        """Uncached ranking behind find_opportunities"""
+        snapshot = self.snapshot
+        contract_index = snapshot.contract_index
+        contracts = snapshot.contracts
+        
+        ranked = []
+        for contract_name, matched in contract_index.matches(self.catalogue.skills_of(business_name)).items():
+            coverage = len(matched) / len(contract_index.required_skills(contract_name))
+            if min_coverage is not None and coverage < min_coverage:
+                continue
+            budget = contracts[contract_name].get("budget")
+            ranked.append(((-coverage, -(_numeric_budget(budget) or 0.0), contract_name), matched))
+        
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked, key=lambda entry: entry[0])
+        else:
+            ranked.sort(key=lambda entry: entry[0])
+        
+        opportunities = []
+        for (negative_coverage, _, contract_name), matched in ranked:
+            contract_info = contracts[contract_name]
+            matched_set = set(matched)
+            opportunities.append(ContractOpportunity(
+                contract_name=contract_name,
+                matched_skills=tuple(matched),
+                missing_skills=tuple(skill for skill in contract_info["required_skills"] if skill not in matched_set),
+                coverage=-negative_coverage,
+                budget=contract_info.get("budget"),
+                deadline=contract_info.get("deadline")
+            ))
+        return tuple(opportunities)
+
+    def _form_optimal_team(self, contract_name: str, available_businesses: Optional[List[str]]) -> Optional[TeamFormation]:
+        """Uncached team formation behind form_optimal_team"""
         contract_info = self.knowledge_base["contracts"][contract_name]
         required_skills = set(contract_info["required_skills"])
         
         if available_businesses is None:
-            available_businesses = list(self.knowledge_base["businesses"].keys())
+            if required_skills:
+                # Only businesses offering a required skill can be in a minimal team
+                available_businesses = self.index.candidates_for_skills(required_skills)
+            else:
+                available_businesses = list(self.catalogue)
         
         # Find minimal team that covers all required skills
         best_team = self._find_minimal_skill_coverage(required_skills, available_businesses)
@@ -241,28 +585,128 @@ class AGI_GigeBid_Engine:
         bonuses = self._identify_team_bonuses(best_team)
         
         return TeamFormation(
-            team_members=best_team,
+            team_members=tuple(best_team),
             total_score=total_score,
-            skill_coverage=skill_coverage,
-            collaborative_bonuses=bonuses
+            skill_coverage=FrozenDict(skill_coverage),
+            collaborative_bonuses=tuple(bonuses)
+        )
+
+    def rank_teams(self, contract_name: str, k: int = 10, max_size: Optional[int] = None,
+                   available_businesses: Optional[List[str]] = None,
+                   objective: TeamObjective = TeamObjective()) -> Optional[TeamRanking]:
+        """
+        Rank the best teams for a contract instead of returning one minimal team.
+        
+        Teams are scored by the objective (compatibility, reputation, size and
+        budget per member); see team_enumeration for the search.
+        
+        Args:
+            contract_name: Name of the contract
+            k: Number of teams to return
+            max_size: Largest team considered (optional)
+            available_businesses: List of available business names (optional)
+            objective: Objective weights
+            
+        Returns:
+            TeamRanking with the k best teams and the Pareto front of size vs.
+            score, or None for an unknown contract
+            
+        Raises:
+            ValueError: If k is not positive
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        if not self.initialized:
+            return None
+        
+        with self.read_snapshot() as snapshot:
+            if contract_name not in snapshot.contracts:
+                return None
+            cache_key = (
+                "rank_teams",
+                contract_name,
+                k,
+                max_size,
+                objective,
+                tuple(available_businesses) if available_businesses is not None else None,
+                self.generation
+            )
+            return self.result_cache.get_or_compute(
+                cache_key,
+                lambda: self._rank_teams(contract_name, k, max_size, available_businesses, objective)
+            )
+
+    def _rank_teams(self, contract_name: str, k: int, max_size: Optional[int],
+                    available_businesses: Optional[List[str]], objective: TeamObjective) -> TeamRanking:
+        """Uncached ranking behind rank_teams"""
+        contract_info = self.knowledge_base["contracts"][contract_name]
+        required_skills = contract_info["required_skills"]
+        catalogue = self.catalogue
+        scorer = self.scorer
+        
+        if available_businesses is None:
+            if required_skills:
+                available_businesses = self.index.candidates_for_skills(set(required_skills))
+            else:
+                available_businesses = list(catalogue)
+        names = [business for business in available_businesses if business in catalogue]
+        candidates = [
+            TeamCandidate(
+                name=business,
+                skills=catalogue.skills_of(business),
+                location=catalogue.location_of(business),
+                industry=catalogue.industry_of(business),
+                reputation=catalogue.reputation_of(business)
+            )
+            for business in names
+        ]
+        rows = dict(zip(names, scorer.rows(names)))
+        
+        result = self.team_enumerator.enumerate(
+            required_skills,
+            candidates,
+            lambda a, b: scorer.score_rows([rows[a.name]], [rows[b.name]])[0],
+            k=k,
+            max_size=max_size,
+            budget=_numeric_budget(contract_info.get("budget")),
+            objective=objective,
+            max_pair_score=MAX_PAIR_SCORE
+        )
+        if not result.exact:
+            print(f"Team ranking exceeded time budget, returning best teams found ({result.nodes_explored} nodes)")
+        
+        skills = set(required_skills)
+        
+        def ranked(team) -> RankedTeam:
+            return RankedTeam(
+                team_members=tuple(team.members),
+                objective_score=team.score,
+                total_score=team.compatibility,
+                average_reputation=team.average_reputation,
+                skill_coverage=FrozenDict(self._map_skills_to_businesses(team.members, skills)),
+                collaborative_bonuses=tuple(self._identify_team_bonuses(team.members))
+            )
+        
+        return TeamRanking(
+            contract_name=contract_name,
+            teams=tuple(ranked(team) for team in result.teams),
+            pareto_front=tuple(ranked(team) for team in result.pareto_front),
+            exact=result.exact
         )
 
     def _find_minimal_skill_coverage(self, required_skills: set, available_businesses: List[str]) -> List[str]:
         """Find minimal set of businesses that cover all required skills"""
-        from itertools import combinations
+        catalogue = self.catalogue
+        candidates = [
+            (business, catalogue.skills_of(business) if business in catalogue else ())
+            for business in available_businesses
+        ]
         
-        # Try different team sizes, starting from 1
-        for team_size in range(1, len(available_businesses) + 1):
-            for team_combo in combinations(available_businesses, team_size):
-                team_skills = set()
-                for business in team_combo:
-                    if business in self.knowledge_base["businesses"]:
-                        team_skills.update(self.knowledge_base["businesses"][business]["skills"])
-                
-                if required_skills.issubset(team_skills):
-                    return list(team_combo)
+        result = self.coverage_solver.solve(required_skills, candidates)
+        if not result.exact:
+            print(f"Team formation exceeded time budget, using best team found ({len(result.team)} members)")
         
-        return []
+        return result.team
 
     def _calculate_team_score(self, team: List[str]) -> float:
         """Calculate overall team compatibility score"""
@@ -273,12 +717,10 @@ class AGI_GigeBid_Engine:
         pair_count = 0
         
         # Calculate pairwise compatibility scores
+        scores = self.partnership_score_matrix(team, team)
         for i in range(len(team)):
             for j in range(i + 1, len(team)):
-                business_a = self.knowledge_base["businesses"][team[i]]
-                business_b = self.knowledge_base["businesses"][team[j]]
-                score = self._calculate_partnership_score(business_a, business_b)
-                total_score += score
+                total_score += scores[i][j]
                 pair_count += 1
         
         return total_score / pair_count if pair_count > 0 else 50.0
@@ -286,10 +728,12 @@ class AGI_GigeBid_Engine:
     def _map_skills_to_businesses(self, team: List[str], required_skills: set) -> Dict[str, str]:
         """Map each required skill to the business that provides it"""
         skill_mapping = {}
+        catalogue = self.catalogue
+        team_skills = [set(catalogue.skills_of(business)) for business in team]
         
         for skill in required_skills:
-            for business in team:
-                if skill in self.knowledge_base["businesses"][business]["skills"]:
+            for business, skills in zip(team, team_skills):
+                if skill in skills:
                     skill_mapping[skill] = business
                     break
         
@@ -300,7 +744,8 @@ class AGI_GigeBid_Engine:
         bonuses = []
         
         # Check for location clustering
-        locations = [self.knowledge_base["businesses"][b]["location"] for b in team]
+        catalogue = self.catalogue
+        locations = [catalogue.location_of(b) for b in team]
         location_counts = {}
         for loc in locations:
             location_counts[loc] = location_counts.get(loc, 0) + 1
@@ -310,10 +755,10 @@ class AGI_GigeBid_Engine:
                 bonuses.append(f"Local cluster bonus in {loc}")
         
         # Check for industry synergies
-        industries = [self.knowledge_base["businesses"][b]["industry"] for b in team]
+        industries = [catalogue.industry_of(b) for b in team]
         for i in range(len(industries)):
             for j in range(i + 1, len(industries)):
-                if (industries[i], industries[j]) in self.knowledge_base["complementary_industries"]:
+                if self.complementary_industries.are_complementary(industries[i], industries[j]):
                     bonuses.append(f"Industry synergy: {industries[i]} + {industries[j]}")
         
         return bonuses
@@ -337,40 +782,83 @@ class AGI_GigeBid_Engine:
             # local_bonus_query = f"(local-collaboration-bonus '{business_a}' '{business_b}')"
             # is_local = self.metta.query(local_bonus_query)
             
-            business_a_info = self.knowledge_base["businesses"].get(business_a)
-            business_b_info = self.knowledge_base["businesses"].get(business_b)
-            
-            if not business_a_info or not business_b_info:
+            scorer = self.scorer
+            if business_a not in scorer or business_b not in scorer:
                 return 0.0
             
-            return self._calculate_partnership_score(business_a_info, business_b_info)
+            return scorer.score_matrix([business_a], [business_b])[0][0]
             
         except Exception as e:
             print(f"Error calculating partnership score: {e}")
             return 0.0
 
+    def get_partnership_scores(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Score many business pairs in one vectorized pass.
+        
+        Args:
+            pairs: (business_a, business_b) name pairs
+            
+        Returns:
+            One result per pair, in order, with a `score` on success or an
+            `error` describing why that pair could not be scored
+        """
+        results = [{"business_a": a, "business_b": b, "score": None} for a, b in pairs]
+        if not self.initialized:
+            for result in results:
+                result["error"] = "AGI engine not initialized"
+            return results
+        
+        scorer = self.scorer
+        valid_positions = []
+        for position, (business_a, business_b) in enumerate(pairs):
+            missing = [name for name in (business_a, business_b) if name not in scorer]
+            if missing:
+                results[position]["error"] = f"Unknown business: {', '.join(missing)}"
+            else:
+                valid_positions.append(position)
+        
+        scores = scorer.score_pairs([pairs[position] for position in valid_positions])
+        for position, score in zip(valid_positions, scores):
+            results[position]["score"] = score
+        
+        return results
+
     def get_business_profile(self, business_name: str) -> Optional[Dict[str, Any]]:
         """Get detailed profile of a business"""
-        return self.knowledge_base["businesses"].get(business_name)
+        return self.catalogue.get(business_name)
 
-    def get_contract_requirements(self, contract_name: str) -> Optional[Dict[str, Any]]:
-        """Get requirements for a specific contract"""
+    def get_contract_requirements(self, contract_name: str) -> Optional[Mapping[str, Any]]:
+        """Get requirements for a specific contract (read-only; skills as a tuple)"""
         return self.knowledge_base["contracts"].get(contract_name)
 
     def add_business_to_knowledge_base(self, business_name: str, business_data: Dict[str, Any]):
         """Add a new business to the knowledge base"""
         # In real implementation, this would update the MeTTa knowledge graph
-        self.knowledge_base["businesses"][business_name] = business_data
+        self.snapshots.write(lambda draft: draft.add_business(business_name, business_data))
+
+    def add_complementary_industries(self, industry_a: str, industry_b: str):
+        """Register two industries as complementary (order-insensitive)"""
+        self.snapshots.write(lambda draft: draft.add_complementary_industries(industry_a, industry_b))
 
     def add_contract_to_knowledge_base(self, contract_name: str, contract_data: Dict[str, Any]):
         """Add a new contract to the knowledge base"""
         # In real implementation, this would update the MeTTa knowledge graph
-        self.knowledge_base["contracts"][contract_name] = contract_data
+        self.snapshots.write(lambda draft: draft.add_contract(contract_name, contract_data))
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the query result cache"""
+        stats = self.result_cache.stats()
+        stats["knowledge_base_generation"] = self.generation
+        stats["knowledge_base_publishes"] = self.snapshots.publishes
+        stats["materialized_teams"] = len(self.snapshot.teams)
+        stats["team_solves"] = self.team_solves
+        return stats
 
 # Example usage
 if __name__ == "__main__":
     # Initialize the AGI engine
-    agi_engine = AGI_HerBid_Engine()
+    agi_engine = AGI_GigeBid_Engine()
     
     # Example: Find partners for Sarah's Marketing Agency for Government Tender #123
     recommendations = agi_engine.find_partners("Sarah's Marketing Agency", "Government Tender #123")
@@ -0,0 +1,403 @@
+"""
+HerBid MeTTa Fact Loader
+Streams ground facts out of a .metta knowledge graph into interned, deduplicated,
+columnar fact tables, and caches the result as a compiled binary snapshot so
+warm starts skip parsing entirely.
+"""
+
+import marshal
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Bare atoms like Nairobi or 85; quoted strings may contain escaped quotes
+_ATOM = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"|([^\s()";]+)')
+_TOKEN = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"|;.*|([()])|([^\s()";]+)')
+_INTEGER = re.compile(r'-?\d+$')
+_FLOAT = re.compile(r'-?\d+\.\d*$')
+_ESCAPE = re.compile(r'\\(.)')
+
+# Heads that introduce rules or type declarations rather than ground facts
+_RULE_HEADS = frozenset({":-", "=", ":"})
+
+_SNAPSHOT_MAGIC = b"HBKG"
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sHBqq")
+
+Fact = Tuple[str, Tuple[Any, ...]]
+
+
+def _bare_atom(token: str) -> Any:
+    """Convert an unquoted atom to int/float where it looks numeric"""
+    if token[0] not in "-0123456789":
+        return token
+    if _INTEGER.match(token):
+        return int(token)
+    if _FLOAT.match(token):
+        return float(token)
+    return token
+
+
+def _quoted_atom(body: str) -> str:
+    """Unescape the body of a quoted string atom"""
+    return _ESCAPE.sub(r"\1", body) if "\\" in body else body
+
+
+def _is_ground(args: Iterable[Any]) -> bool:
+    """Facts may not contain pattern variables"""
+    return not any(isinstance(arg, str) and arg.startswith("$") for arg in args)
+
+
+def parse_metta_facts(lines: Iterable[str]) -> Iterator[Fact]:
+    """
+    Stream ground facts from MeTTa source lines.
+
+    Flat single-line facts such as ``(has-skill "A" "Web Development")`` take a
+    regex fast path. Anything else is tokenized with a depth-tracking parser so
+    multi-line rules are consumed and skipped.
+
+    Args:
+        lines: Iterable of source lines (e.g. an open file)
+
+    Yields:
+        (predicate, args) tuples for every ground, non-nested fact
+    """
+    stack: List[List[Any]] = []
+
+    for line in lines:
+        if not stack:
+            stripped = line.strip()
+            if not stripped or stripped[0] == ";":
+                continue
+            if (stripped[0] == "(" and stripped[-1] == ")" and ";" not in stripped and
+                    stripped.count("(") == 1 and stripped.count(")") == 1):
+                # Fast path: one flat fact on its own line. A bare atom is never
+                # empty, so an empty `bare` group marks a quoted atom.
+                atoms = _ATOM.findall(stripped, 1, len(stripped) - 1)
+                if atoms and atoms[0][1] and atoms[0][1] not in _RULE_HEADS:
+                    args = tuple(
+                        _bare_atom(bare) if bare else _quoted_atom(quoted)
+                        for quoted, bare in atoms[1:]
+                    )
+                    if _is_ground(args):
+                        yield atoms[0][1], args
+                continue
+
+        for token in _TOKEN.finditer(line):
+            quoted, paren, bare = token.groups()
+            if paren == "(":
+                stack.append([])
+            elif paren == ")":
+                if not stack:
+                    raise ValueError(f"Unbalanced ')' in MeTTa source: {line.strip()}")
+                expression = stack.pop()
+                if stack:
+                    stack[-1].append(expression)
+                    continue
+                if (expression and isinstance(expression[0], str) and
+                        expression[0] not in _RULE_HEADS and
+                        not any(isinstance(arg, list) for arg in expression) and
+                        _is_ground(expression[1:])):
+                    yield expression[0], tuple(expression[1:])
+            elif quoted is not None:
+                if stack:
+                    stack[-1].append(_quoted_atom(quoted))
+            elif bare is not None:
+                if stack:
+                    stack[-1].append(_bare_atom(bare))
+
+    if stack:
+        raise ValueError("Unterminated expression at end of MeTTa source")
+
+
+class FactTable:
+    """Columnar storage for all facts sharing a predicate and arity"""
+
+    def __init__(self, predicate: str, arity: int, columns: Optional[List[array]] = None):
+        self.predicate = predicate
+        self.arity = arity
+        self.columns = columns if columns is not None else [array("q") for _ in range(arity)]
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+
+class FactStore:
+    """
+    Interned, deduplicated fact tables.
+
+    Every atom is stored once in ``symbols``; each (predicate, arity) pair owns a
+    FactTable whose columns hold symbol IDs.
+    """
+
+    def __init__(self):
+        self.symbols: List[Any] = []
+        # Strings are keyed directly; other atoms by (type, value) so 1 != 1.0
+        self._string_ids: Dict[str, int] = {}
+        self._symbol_ids: Dict[Any, int] = {}
+        self.tables: Dict[Tuple[str, int], FactTable] = {}
+        self._seen: Optional[set] = set()
+
+    def intern(self, value: Any) -> int:
+        """Return the symbol ID for a value, adding it if new"""
+        if self._seen is None:
+            self._rebuild_lookup()
+        if type(value) is str:
+            symbol_id = self._string_ids.get(value)
+            if symbol_id is None:
+                symbol_id = self._string_ids[value] = len(self.symbols)
+                self.symbols.append(value)
+            return symbol_id
+        key = (type(value), value)
+        symbol_id = self._symbol_ids.get(key)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[key] = len(self.symbols)
+            self.symbols.append(value)
+        return symbol_id
+
+    def add_fact(self, predicate: str, args: Tuple[Any, ...]) -> bool:
+        """
+        Add a fact unless an identical one is already stored.
+
+        Returns:
+            True if the fact was new
+        """
+        return self.add_facts([(predicate, args)]) == 1
+
+    def add_facts(self, facts: Iterable[Fact]) -> int:
+        """
+        Bulk-add facts, skipping duplicates.
+
+        This is the loader's hot loop, so interning is inlined rather than going
+        through intern() once per atom.
+
+        Returns:
+            Number of new facts stored
+        """
+        if self._seen is None:
+            self._rebuild_lookup()
+
+        symbols = self.symbols
+        string_ids = self._string_ids
+        symbol_ids = self._symbol_ids
+        seen = self._seen
+        tables = self.tables
+        get_string_id = string_ids.get
+        added = 0
+
+        for predicate, args in facts:
+            row = [get_string_id(predicate)]
+            if row[0] is None:
+                row[0] = string_ids[predicate] = len(symbols)
+                symbols.append(predicate)
+            for arg in args:
+                if type(arg) is str:
+                    symbol_id = get_string_id(arg)
+                    if symbol_id is None:
+                        symbol_id = string_ids[arg] = len(symbols)
+                        symbols.append(arg)
+                else:
+                    key = (type(arg), arg)
+                    symbol_id = symbol_ids.get(key)
+                    if symbol_id is None:
+                        symbol_id = symbol_ids[key] = len(symbols)
+                        symbols.append(arg)
+                row.append(symbol_id)
+
+            # (predicate_id, *arg_ids) also encodes the arity
+            key = tuple(row)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            table = tables.get((predicate, len(args)))
+            if table is None:
+                table = tables[(predicate, len(args))] = FactTable(predicate, len(args))
+            for column, symbol_id in zip(table.columns, row[1:]):
+                column.append(symbol_id)
+            added += 1
+
+        return added
+
+    def release_lookup(self):
+        """
+        Free the intern map and dedup set once loading is finished.
+
+        They are rebuilt from the fact tables on the next add.
+        """
+        self._seen = None
+        self._string_ids = {}
+        self._symbol_ids = {}
+
+    def facts(self, predicate: str, arity: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        """Iterate decoded fact arguments for a predicate, in load order"""
+        symbols = self.symbols
+        for (table_predicate, table_arity), table in self.tables.items():
+            if table_predicate != predicate or (arity is not None and table_arity != arity):
+                continue
+            for row in zip(*table.columns):
+                yield tuple(symbols[symbol_id] for symbol_id in row)
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables.values())
+
+    def _rebuild_lookup(self):
+        """Recreate the intern map and dedup set after loading a snapshot"""
+        self._seen = set()
+        self._string_ids = {}
+        self._symbol_ids = {}
+        for i, value in enumerate(self.symbols):
+            if type(value) is str:
+                self._string_ids[value] = i
+            else:
+                self._symbol_ids[(type(value), value)] = i
+        for (predicate, _), table in self.tables.items():
+            predicate_id = self._string_ids[predicate]
+            self._seen.update((predicate_id, *row) for row in zip(*table.columns))
+
+
+def save_snapshot(store: FactStore, snapshot_path: str, source_path: str):
+    """
+    Write a compiled binary snapshot of a fact store.
+
+    The header records the source file's size and mtime so stale snapshots are
+    ignored automatically.
+    """
+    source_stat = os.stat(source_path)
+    payload = marshal.dumps((
+        sys.byteorder,
+        store.symbols,
+        [(predicate, arity, [column.tobytes() for column in table.columns])
+         for (predicate, arity), table in store.tables.items()]
+    ))
+    header = _SNAPSHOT_HEADER.pack(
+        _SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, 0, source_stat.st_size, source_stat.st_mtime_ns
+    )
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(header)
+        snapshot_file.write(payload)
+    os.replace(temp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path: str, source_path: str) -> Optional[FactStore]:
+    """Load a snapshot if it exists and matches the current source file"""
+    try:
+        source_stat = os.stat(source_path)
+        with open(snapshot_path, "rb") as snapshot_file:
+            header = snapshot_file.read(_SNAPSHOT_HEADER.size)
+            magic, version, _, size, mtime_ns = _SNAPSHOT_HEADER.unpack(header)
+            if (magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION or
+                    size != source_stat.st_size or mtime_ns != source_stat.st_mtime_ns):
+                return None
+            byteorder, symbols, tables = marshal.loads(snapshot_file.read())
+    except (OSError, struct.error, ValueError, EOFError, TypeError):
+        return None
+
+    store = FactStore()
+    store.symbols = symbols
+    for predicate, arity, raw_columns in tables:
+        columns = []
+        for raw in raw_columns:
+            column = array("q")
+            column.frombytes(raw)
+            if byteorder != sys.byteorder:
+                column.byteswap()
+            columns.append(column)
+        store.tables[(predicate, arity)] = FactTable(predicate, arity, columns)
+    store.release_lookup()
+    return store
+
+
+def load_fact_store(source_path: str, snapshot_path: Optional[str] = None,
+                    use_snapshot: bool = True) -> FactStore:
+    """
+    Load a .metta knowledge graph, preferring a valid compiled snapshot.
+
+    Args:
+        source_path: Path to the .metta file
+        snapshot_path: Where to read/write the snapshot (defaults next to the source)
+        use_snapshot: Set False to always re-parse and skip writing a snapshot
+
+    Returns:
+        Populated FactStore
+    """
+    if snapshot_path is None:
+        snapshot_path = f"{source_path}.snapshot"
+
+    if use_snapshot:
+        store = load_snapshot(snapshot_path, source_path)
+        if store is not None:
+            return store
+
+    store = FactStore()
+    with open(source_path, "r", encoding="utf-8") as source_file:
+        store.add_facts(parse_metta_facts(source_file))
+    store.release_lookup()
+
+    if use_snapshot:
+        try:
+            save_snapshot(store, snapshot_path, source_path)
+        except OSError as e:
+            print(f"Could not write knowledge graph snapshot: {e}")
+
+    return store
+
+
+def build_knowledge_base(store: FactStore) -> Dict[str, Any]:
+    """
+    Project fact tables into the knowledge base shape used by the AGI engine.
+
+    Conflicting facts are resolved deterministically: the last fact wins for
+    single-valued attributes, and ``has-reputation`` takes precedence over the
+    legacy ``reputation-score`` predicate.
+    """
+    businesses: Dict[str, Dict[str, Any]] = {}
+    for business, skill in store.facts("has-skill", 2):
+        businesses.setdefault(business, {"skills": []})["skills"].append(skill)
+
+    def single_valued(predicate: str) -> Dict[Any, Any]:
+        return {subject: value for subject, value in store.facts(predicate, 2)}
+
+    locations = single_valued("is-located-in")
+    industries = single_valued("has-industry")
+    reputations = single_valued("reputation-score")
+    reputations.update(single_valued("has-reputation"))
+
+    for business_name, business_data in businesses.items():
+        business_data["location"] = locations.get(business_name, "Unknown")
+        business_data["industry"] = industries.get(business_name, "Unknown")
+        business_data["reputation"] = reputations.get(business_name, 0)
+
+    contracts: Dict[str, Dict[str, Any]] = {}
+    for contract, skill in store.facts("requires-skill", 2):
+        contracts.setdefault(contract, {"required_skills": []})["required_skills"].append(skill)
+
+    budgets = single_valued("contract-budget")
+    deadlines = single_valued("contract-deadline")
+    for contract_name, contract_data in contracts.items():
+        if contract_name in budgets:
+            contract_data["budget"] = budgets[contract_name]
+        if contract_name in deadlines:
+            contract_data["deadline"] = deadlines[contract_name]
+
+    collaboration_history = [
+        {
+            "businesses": (business_a, business_b),
+            "project": project,
+            "success_score": success_score,
+            "completed_on": completed_on
+        }
+        for business_a, business_b, project, success_score, completed_on
+        in store.facts("collaboration-history", 5)
+    ]
+
+    return {
+        "businesses": businesses,
+        "contracts": contracts,
+        "complementary_industries": list(store.facts("complementary-industries", 2)),
+        "collaboration_history": collaboration_history
+    }
@@ -0,0 +1,351 @@
+"""
+GigeBid M-Pesa Callbacks
+Callback-driven settlement of M-Pesa STK push deposits.
+
+Daraja POSTs the outcome of every STK push to our callback URL. Callbacks
+are checked against a shared secret and/or source allowlist, acknowledged
+immediately and queued; a batcher drains the queue and settles each batch
+with one indexed ledger lookup and one write transaction. A callback whose
+amount or phone number disagrees with the ledger leaves its deposit pending
+for review. Status polling is kept only as a rate-limited sweeper for
+deposits whose callback never arrived.
+
+Milestone payouts (B2C) report their results on separate result and queue
+timeout URLs, parsed here by parse_b2c_result.
+"""
+
+import asyncio
+import hmac
+import ipaddress
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from payment_system import HybridPaymentSystem
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StkCallbackResult:
+    """Outcome of one STK push as reported by an M-Pesa callback"""
+    checkout_request_id: str
+    merchant_request_id: str
+    result_code: str
+    result_desc: str
+    metadata: Dict[str, Any]
+
+
+def parse_stk_callback(payload: Dict[str, Any]) -> StkCallbackResult:
+    """
+    Parse a Daraja STK callback body.
+
+    Raises:
+        ValueError: If the payload is not an STK callback
+    """
+    try:
+        callback = payload["Body"]["stkCallback"]
+        checkout_request_id = callback["CheckoutRequestID"]
+        result_code = callback["ResultCode"]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Not an STK callback: missing {e}") from e
+    items = (callback.get("CallbackMetadata") or {}).get("Item") or []
+    return StkCallbackResult(
+        checkout_request_id=str(checkout_request_id),
+        merchant_request_id=str(callback.get("MerchantRequestID", "")),
+        result_code=str(result_code),
+        result_desc=str(callback.get("ResultDesc", "")),
+        metadata={item.get("Name"): item.get("Value") for item in items if isinstance(item, dict)}
+    )
+
+
+@dataclass
+class B2CResult:
+    """Outcome of one B2C payment as reported by an M-Pesa result callback"""
+    conversation_id: str
+    originator_conversation_id: str
+    result_code: str
+    result_desc: str
+    transaction_receipt: str
+
+
+def parse_b2c_result(payload: Dict[str, Any]) -> B2CResult:
+    """
+    Parse a Daraja B2C result (or queue timeout) body.
+
+    Raises:
+        ValueError: If the payload is not a B2C result
+    """
+    try:
+        result = payload["Result"]
+        result_code = result["ResultCode"]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Not a B2C result: missing {e}") from e
+    conversation_id = str(result.get("ConversationID") or "")
+    originator_conversation_id = str(result.get("OriginatorConversationID") or "")
+    if not conversation_id and not originator_conversation_id:
+        raise ValueError("Not a B2C result: missing 'ConversationID'")
+    return B2CResult(
+        conversation_id=conversation_id,
+        originator_conversation_id=originator_conversation_id,
+        result_code=str(result_code),
+        result_desc=str(result.get("ResultDesc", "")),
+        transaction_receipt=str(result.get("TransactionID") or "")
+    )
+
+
+class CallbackVerifier:
+    """
+    Decides whether a callback request really came from Daraja.
+
+    Daraja does not sign callbacks, so two checks are offered and every
+    configured one must pass:
+    - a shared secret in the callback URL's `token` query parameter
+      (MPESA_CALLBACK_TOKEN; MPesaConnector appends it to the CallBackURL)
+    - a source allowlist of addresses or CIDR ranges
+      (MPESA_CALLBACK_ALLOWED_IPS, comma separated)
+
+    With neither configured every callback is rejected and deposits are
+    settled by the sweeper's status queries instead.
+    """
+
+    def __init__(self, token: Optional[str] = None, allowed_networks: Iterable[str] = ()):
+        """
+        Args:
+            token: Shared secret expected in the `token` query parameter
+            allowed_networks: Addresses or CIDR ranges callbacks may come from
+
+        Raises:
+            ValueError: If an allowlist entry is not an address or network
+        """
+        self.token = token or None
+        self.allowed_networks = [
+            ipaddress.ip_network(network.strip(), strict=False)
+            for network in allowed_networks if network.strip()
+        ]
+        self.rejected = 0
+        if not self.configured:
+            logger.warning("No M-Pesa callback token or allowlist configured; callbacks will be rejected")
+
+    @classmethod
+    def from_env(cls) -> "CallbackVerifier":
+        """Verifier configured from MPESA_CALLBACK_TOKEN and MPESA_CALLBACK_ALLOWED_IPS"""
+        return cls(os.environ.get("MPESA_CALLBACK_TOKEN"),
+                   os.environ.get("MPESA_CALLBACK_ALLOWED_IPS", "").split(","))
+
+    @property
+    def configured(self) -> bool:
+        return self.token is not None or bool(self.allowed_networks)
+
+    def verify(self, token: Optional[str], remote_address: Optional[str]) -> bool:
+        """
+        Check one callback request.
+
+        Args:
+            token: The request's `token` query parameter
+            remote_address: Address the request came from
+        """
+        accepted = self.configured
+        if accepted and self.token is not None:
+            accepted = token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+        if accepted and self.allowed_networks:
+            try:
+                address = ipaddress.ip_address(remote_address)
+            except ValueError:
+                accepted = False
+            else:
+                accepted = any(address in network for network in self.allowed_networks)
+        if not accepted:
+            self.rejected += 1
+        return accepted
+
+
+class CallbackBatcher:
+    """
+    Queues STK callback results and settles them in batches.
+
+    A batch is flushed once `max_batch_size` results are queued or
+    `max_delay` seconds after its first result arrived, whichever is first.
+    """
+
+    def __init__(self, payment_system: HybridPaymentSystem,
+                 max_batch_size: int = 500, max_delay: float = 0.05):
+        """
+        Args:
+            payment_system: Payment system whose ledger holds the deposits
+            max_batch_size: Largest number of callbacks settled together
+            max_delay: Seconds a queued callback may wait for its batch to fill
+        """
+        self.payment_system = payment_system
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.settled = 0
+        self.outcomes: Dict[str, int] = {}
+
+    def start(self):
+        """Start draining the queue on the running event loop"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Flush queued callbacks and stop"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def submit(self, result: StkCallbackResult):
+        """Queue a callback result for settlement"""
+        if self._queue is None:
+            raise RuntimeError("CallbackBatcher is not running")
+        self._queue.put_nowait(result)
+
+    async def _run(self):
+        """Collect results into batches and settle them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                # Settlement blocks on the SQLite ledger, so keep it off the event loop
+                await asyncio.to_thread(self._settle, batch)
+            except Exception as e:
+                # Unsettled deposits stay pending and are picked up by the sweeper
+                logger.error(f"Failed to settle {len(batch)} M-Pesa callbacks: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _settle(self, batch: List[StkCallbackResult]):
+        """Settle one batch against the ledger"""
+        outcomes = self.payment_system.complete_deposits_from_callbacks(
+            [(result.checkout_request_id, result.result_code, result.result_desc, result.metadata)
+             for result in batch]
+        )
+        self.batches += 1
+        self.settled += len(batch)
+        for outcome in outcomes.values():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if outcome == "unknown":
+                logger.warning("M-Pesa callback for unknown CheckoutRequestID")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Batcher counters"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "callbacks_settled": self.settled,
+            "average_batch_size": self.settled / self.batches if self.batches else 0.0,
+            "outcomes": dict(self.outcomes)
+        }
+
+
+class DepositSweeper:
+    """
+    Reconciles deposits whose STK callback never arrived.
+
+    Every `interval` seconds, up to `batch_size` deposits that have been
+    pending for more than `grace_period` seconds are polled via
+    process_deposit_completion. Polls are spaced so no more than
+    `max_polls_per_second` are started each second.
+    """
+
+    def __init__(self, payment_system: HybridPaymentSystem,
+                 interval: float = 60.0, grace_period: float = 120.0,
+                 batch_size: int = 100, max_polls_per_second: float = 5.0):
+        """
+        Args:
+            payment_system: Payment system whose deposits to reconcile
+            interval: Seconds between sweeps
+            grace_period: Seconds a deposit may wait for its callback before being polled
+            batch_size: Most deposits polled per sweep
+            max_polls_per_second: Rate limit on M-Pesa status queries
+        """
+        self.payment_system = payment_system
+        self.interval = interval
+        self.grace_period = grace_period
+        self.batch_size = batch_size
+        self.max_polls_per_second = max_polls_per_second
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.polls = 0
+        self.poll_failures = 0
+
+    def start(self):
+        """Start sweeping on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop sweeping"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        """Sweep forever"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Deposit sweep failed: {e}")
+
+    async def sweep(self) -> int:
+        """
+        Poll overdue pending deposits once.
+
+        Returns:
+            Number of deposits polled
+        """
+        overdue = await asyncio.to_thread(
+            self.payment_system.get_stale_pending_deposits, self.grace_period, self.batch_size
+        )
+        self.sweeps += 1
+        if not overdue:
+            return 0
+
+        logger.info(f"Polling {len(overdue)} deposits without an M-Pesa callback")
+        spacing = 1.0 / self.max_polls_per_second
+        polls = []
+        for index, transaction in enumerate(overdue):
+            if index:
+                await asyncio.sleep(spacing)
+            polls.append(asyncio.ensure_future(
+                self.payment_system.process_deposit_completion(transaction.transaction_id)
+            ))
+        results = await asyncio.gather(*polls, return_exceptions=True)
+        self.polls += len(results)
+        self.poll_failures += sum(isinstance(result, Exception) for result in results)
+        return len(results)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Sweeper counters"""
+        return {
+            "sweeps": self.sweeps,
+            "polls": self.polls,
+            "poll_failures": self.poll_failures
+        }
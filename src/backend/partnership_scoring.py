@@ -0,0 +1,203 @@
+"""
+HerBid Partnership Scoring
+Batch compatibility scoring for the AGI engine. Pairs are scored straight
+from the business catalogue's integer columns, so whole candidate blocks can
+be scored in one vectorized pass instead of one Python call per pair.
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from business_catalogue import BusinessCatalogue
+from knowledge_index import ComplementaryIndustries
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; scoring falls back to pure Python
+    np = None
+
+BASE_SCORE = 50.0
+LOCATION_BONUS = 15.0
+SYNERGY_BONUS = 10.0
+HIGH_REPUTATION_THRESHOLD = 85
+HIGH_REPUTATION_BONUS = 15.0
+GOOD_REPUTATION_THRESHOLD = 75
+GOOD_REPUTATION_BONUS = 10.0
+MAX_SCORE = 100.0
+# Best score any pair can reach
+MAX_PAIR_SCORE = min(MAX_SCORE, BASE_SCORE + LOCATION_BONUS + SYNERGY_BONUS + HIGH_REPUTATION_BONUS)
+
+
+class PartnershipScorer:
+    """
+    Scores business pairs by catalogue row.
+
+    Location IDs, industry IDs and reputations are read from the
+    BusinessCatalogue columns; the scorer's only state is a table mapping
+    catalogue industry IDs to the IDs of the engine's ComplementaryIndustries
+    relation. A pair scores a base of 50, +15 for a shared location, +10 for
+    complementary industries, and +15/+10 when the pair's average reputation
+    is at least 85/75, capped at 100. tests/test_partnership_scoring.py checks
+    both scoring paths against a scalar reference implementation.
+    """
+
+    def __init__(self, catalogue: BusinessCatalogue,
+                 complementary_industries: Optional[ComplementaryIndustries] = None):
+        """
+        Initialize a scorer over a catalogue.
+
+        Args:
+            catalogue: Catalogue holding the businesses to score
+            complementary_industries: Relation deciding the synergy bonus; the
+                catalogue's industries are interned through it
+        """
+        # An empty relation is falsy (it has a length), so test for None explicitly
+        if complementary_industries is None:
+            complementary_industries = ComplementaryIndustries()
+        self.catalogue = catalogue
+        self.complementary_industries = complementary_industries
+        self._relation_ids = array("i")  # catalogue industry ID -> relation industry ID
+        self._relation_ids_array = None
+        self.refresh()
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: Dict[str, Any],
+                            complementary_industries: Optional[ComplementaryIndustries] = None
+                            ) -> "PartnershipScorer":
+        """Build a scorer (and its catalogue) for every business in an engine knowledge base"""
+        if complementary_industries is None:
+            complementary_industries = ComplementaryIndustries(
+                knowledge_base.get("complementary_industries", ())
+            )
+        return cls(BusinessCatalogue.from_businesses(knowledge_base["businesses"]), complementary_industries)
+
+    def copy(self, catalogue: BusinessCatalogue,
+             complementary_industries: Optional[ComplementaryIndustries] = None) -> "PartnershipScorer":
+        """
+        Scorer for a copy of this scorer's catalogue.
+
+        Args:
+            catalogue: The catalogue copy to score
+            complementary_industries: Relation for the copy (a copy of this
+                scorer's relation by default)
+        """
+        if complementary_industries is None:
+            complementary_industries = self.complementary_industries.copy()
+        # Only the industry table is rebuilt; it has one entry per distinct industry
+        return PartnershipScorer(catalogue, complementary_industries)
+
+    def refresh(self):
+        """Intern industries the catalogue gained since the last call; call after adding businesses"""
+        industries = self.catalogue.industries.values
+        if len(self._relation_ids) < len(industries):
+            for industry in industries[len(self._relation_ids):]:
+                self._relation_ids.append(self.complementary_industries.industry_id(industry))
+            self._relation_ids_array = None
+
+    def __contains__(self, business_name: str) -> bool:
+        return business_name in self.catalogue
+
+    def rows(self, business_names: Iterable[str]) -> List[int]:
+        """Resolve business names to catalogue rows, raising KeyError for unknown names"""
+        row = self.catalogue.row
+        return [row(name) for name in business_names]
+
+    def _numpy_columns(self):
+        """
+        Zero-copy NumPy views of the catalogue columns plus the industry table.
+
+        The views pin the catalogue's buffers (arrays cannot grow while they are
+        exported), so they are only held for the duration of one scoring call.
+        """
+        if self._relation_ids_array is None:
+            self._relation_ids_array = np.array(self._relation_ids, dtype=np.intp)
+        locations, industries, reputations = self.catalogue.columns()
+        return (
+            np.frombuffer(locations, dtype=locations.typecode),
+            np.frombuffer(industries, dtype=industries.typecode),
+            np.frombuffer(reputations, dtype=reputations.typecode),
+            self._relation_ids_array
+        )
+
+    def score_rows(self, rows_a: Sequence[int], rows_b: Sequence[int]) -> List[float]:
+        """
+        Score aligned row pairs (rows_a[i] with rows_b[i]).
+
+        Returns:
+            List of scores, one per pair
+        """
+        if np is not None and len(rows_a) > 1:
+            index_a = np.asarray(rows_a, dtype=np.intp)
+            index_b = np.asarray(rows_b, dtype=np.intp)
+            return self._score_arrays(index_a, index_b).tolist()
+
+        locations, industries, reputations = self.catalogue.columns()
+        relation_ids = self._relation_ids
+        are_complementary = self.complementary_industries.are_complementary_ids
+        scores = []
+        for row_a, row_b in zip(rows_a, rows_b):
+            score = BASE_SCORE
+            if locations[row_a] == locations[row_b]:
+                score += LOCATION_BONUS
+            if are_complementary(relation_ids[industries[row_a]], relation_ids[industries[row_b]]):
+                score += SYNERGY_BONUS
+            average_reputation = (reputations[row_a] + reputations[row_b]) / 2
+            if average_reputation >= HIGH_REPUTATION_THRESHOLD:
+                score += HIGH_REPUTATION_BONUS
+            elif average_reputation >= GOOD_REPUTATION_THRESHOLD:
+                score += GOOD_REPUTATION_BONUS
+            scores.append(min(score, MAX_SCORE))
+        return scores
+
+    def _score_arrays(self, index_a, index_b):
+        """Vectorized scoring over broadcastable NumPy row indices"""
+        locations, industries, reputations, relation_ids = self._numpy_columns()
+        complementary = self.complementary_industries.dense_matrix(np)
+        average_reputation = (reputations[index_a] + reputations[index_b]) / 2
+        score = (
+            BASE_SCORE
+            + LOCATION_BONUS * (locations[index_a] == locations[index_b])
+            + SYNERGY_BONUS * complementary[relation_ids[industries[index_a]], relation_ids[industries[index_b]]]
+            + np.where(
+                average_reputation >= HIGH_REPUTATION_THRESHOLD,
+                HIGH_REPUTATION_BONUS,
+                np.where(average_reputation >= GOOD_REPUTATION_THRESHOLD, GOOD_REPUTATION_BONUS, 0.0)
+            )
+        )
+        return np.minimum(score, MAX_SCORE)
+
+    def score_one_to_many(self, business_name: str, others: Sequence[str]) -> List[float]:
+        """
+        Score one business against many.
+
+        Args:
+            business_name: Business to score from
+            others: Businesses to score against
+
+        Returns:
+            List of scores aligned with `others`
+        """
+        row = self.catalogue.row(business_name)
+        other_rows = self.rows(others)
+        return self.score_rows([row] * len(other_rows), other_rows)
+
+    def score_matrix(self, names_a: Sequence[str], names_b: Sequence[str]) -> List[List[float]]:
+        """
+        Score every business in `names_a` against every business in `names_b`.
+
+        Returns:
+            len(names_a) x len(names_b) nested list of scores
+        """
+        rows_a = self.rows(names_a)
+        rows_b = self.rows(names_b)
+        if np is not None and rows_a and rows_b:
+            index_a = np.asarray(rows_a, dtype=np.intp)[:, None]
+            index_b = np.asarray(rows_b, dtype=np.intp)[None, :]
+            return self._score_arrays(index_a, index_b).tolist()
+        return [self.score_rows([row_a] * len(rows_b), rows_b) for row_a in rows_a]
+
+    def score_pairs(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Score arbitrary (business_a, business_b) pairs in one pass"""
+        rows_a = self.rows(a for a, _ in pairs)
+        rows_b = self.rows(b for _, b in pairs)
+        return self.score_rows(rows_a, rows_b)
@@ -0,0 +1,447 @@
+"""
+GigeBid Payment API
+Asyncio-native HTTP layer for the hybrid M-Pesa/Sui payment system.
+
+The Flask API serves the AGI and Sui routes from worker threads. Payment flows
+spend most of their time waiting on M-Pesa and the Sui network, so they are
+served from a single aiohttp event loop instead, where those waits overlap
+rather than each one pinning a thread. Blocking calls (Sui, the SQLite
+ledger) run in the default thread pool via asyncio.to_thread.
+
+Usage:
+    python3 payment_api.py --port 5001
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from dataclasses import asdict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict
+
+from aiohttp import web
+
+from api_response import APIResponse
+from http_client import get_shared_client
+from idempotency import IdempotencyConflict
+from mpesa_callbacks import (CallbackBatcher, CallbackVerifier, DepositSweeper, parse_b2c_result,
+                             parse_stk_callback)
+from payment_system import HybridPaymentSystem, create_payment_system
+from sui_api import AsyncSuiConnector
+
+# Decimals (KES/USDC amounts, rates) are serialized as strings so no precision is lost
+_dumps = functools.partial(json.dumps, default=str)
+
+
+def _respond(response: APIResponse, status: int = 200) -> web.Response:
+    """Serialize an APIResponse the same way the Flask API does"""
+    return web.json_response(asdict(response), status=status, dumps=_dumps)
+
+
+def _parse_amount(value: Any, field: str) -> Decimal:
+    """Parse a positive monetary amount from a request body"""
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"{field} must be a number")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError(f"{field} must be a positive number")
+    return amount
+
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    """Allow cross-origin calls from the frontend, mirroring Flask-CORS defaults"""
+    if request.method == "OPTIONS":
+        response = web.Response()
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = request.headers.get(
+            "Access-Control-Request-Headers", "Content-Type"
+        )
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+class GigeBidPaymentAPI:
+    """Async payment API service for GigeBid platform"""
+
+    # History page size when the client sends no limit, and the largest allowed
+    DEFAULT_HISTORY_PAGE_SIZE = 50
+    MAX_HISTORY_PAGE_SIZE = 500
+
+    # Recipients paid concurrently by a milestone payout unless the client asks otherwise
+    DEFAULT_PAYOUT_CONCURRENCY = 10
+
+    def __init__(self, payment_system: HybridPaymentSystem = None,
+                 callback_verifier: CallbackVerifier = None):
+        """
+        Initialize the payment services.
+
+        Args:
+            payment_system: Payment system to expose (a Sui-backed one by default)
+            callback_verifier: Checks M-Pesa callback origins (configured from
+                the environment by default)
+        """
+        self.app = web.Application(middlewares=[cors_middleware])
+        self.payment_system = payment_system or create_payment_system(AsyncSuiConnector())
+        self.callback_verifier = callback_verifier or CallbackVerifier.from_env()
+        self.callback_batcher = CallbackBatcher(self.payment_system)
+        self.deposit_sweeper = DepositSweeper(self.payment_system)
+        self.app.on_startup.append(self._start_background_tasks)
+        self.app.on_cleanup.append(self._stop_background_tasks)
+
+        # Setup API routes
+        self._setup_routes()
+
+        print("GigeBid Payment API initialized successfully")
+
+    async def _start_background_tasks(self, app: web.Application):
+        """Start callback settlement and the deposit sweeper on the app's loop"""
+        self.callback_batcher.start()
+        self.deposit_sweeper.start()
+
+    async def _stop_background_tasks(self, app: web.Application):
+        """Flush pending callbacks, stop sweeping and close outbound connections"""
+        await self.callback_batcher.stop()
+        await self.deposit_sweeper.stop()
+        await get_shared_client().close()
+
+    async def _json_body(self, request: web.Request) -> Dict[str, Any]:
+        """Decode a JSON object body, raising ValueError when it is not one"""
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            raise ValueError("Request body must be valid JSON")
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        return data
+
+    def _setup_routes(self):
+        """Setup all API routes"""
+
+        async def health_check(request: web.Request) -> web.Response:
+            """Health check endpoint"""
+            return _respond(APIResponse(
+                success=True,
+                data={
+                    "status": "healthy",
+                    "timestamp": time.time(),
+                    "exchange_rate": self.payment_system.exchange_service.get_metrics(),
+                    "mpesa_callbacks": {
+                        **self.callback_batcher.get_metrics(),
+                        "rejected": self.callback_verifier.rejected
+                    },
+                    "deposit_sweeper": self.deposit_sweeper.get_metrics()
+                },
+                message="GigeBid Payment API is running"
+            ))
+
+        async def initiate_deposit(request: web.Request) -> web.Response:
+            """Start an M-Pesa deposit that is converted to USDC"""
+            try:
+                try:
+                    data = await self._json_body(request)
+                    user_id = data.get('user_id')
+                    phone_number = data.get('phone_number')
+                    if not user_id or not phone_number or data.get('amount_kes') is None:
+                        raise ValueError("Missing required fields: user_id, phone_number, amount_kes")
+                    amount_kes = _parse_amount(data['amount_kes'], 'amount_kes')
+                except ValueError as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 400)
+
+                try:
+                    transaction = await self.payment_system.initiate_deposit(
+                        user_id, phone_number, amount_kes,
+                        data.get('project_reference', ''),
+                        idempotency_key=request.headers.get('Idempotency-Key')
+                    )
+                except IdempotencyConflict as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 422)
+
+                return _respond(APIResponse(
+                    success=True,
+                    data=asdict(transaction),
+                    message="Deposit initiated, awaiting M-Pesa confirmation"
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        async def complete_deposit(request: web.Request) -> web.Response:
+            """Settle a deposit once its M-Pesa payment has gone through"""
+            try:
+                transaction_id = request.match_info['transaction_id']
+                if await asyncio.to_thread(self.payment_system.get_transaction, transaction_id) is None:
+                    return _respond(APIResponse(
+                        success=False,
+                        error=f"Transaction not found: {transaction_id}"
+                    ), 404)
+
+                completed = await self.payment_system.process_deposit_completion(transaction_id)
+                transaction = await asyncio.to_thread(self.payment_system.get_transaction, transaction_id)
+
+                return _respond(APIResponse(
+                    success=completed,
+                    data=asdict(transaction),
+                    message="Deposit completed" if completed else "",
+                    error="" if completed else "M-Pesa payment failed"
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        async def mpesa_callback(request: web.Request) -> web.Response:
+            """Receive an STK push result from M-Pesa and queue it for settlement"""
+            if not self.callback_verifier.verify(request.query.get('token'), request.remote):
+                return web.json_response({"ResultCode": 1, "ResultDesc": "Forbidden"}, status=403)
+            try:
+                result = parse_stk_callback(await self._json_body(request))
+            except ValueError as e:
+                return web.json_response({"ResultCode": 1, "ResultDesc": str(e)}, status=400)
+
+            self.callback_batcher.submit(result)
+            # Daraja only needs an acknowledgement; settlement happens in the batcher
+            return web.json_response({"ResultCode": 0, "ResultDesc": "Accepted"})
+
+        async def b2c_result(request: web.Request, timed_out: bool = False) -> web.Response:
+            """Receive a milestone payout's B2C result from M-Pesa and settle the payout"""
+            if not self.callback_verifier.verify(request.query.get('token'), request.remote):
+                return web.json_response({"ResultCode": 1, "ResultDesc": "Forbidden"}, status=403)
+            try:
+                result = parse_b2c_result(await self._json_body(request))
+            except ValueError as e:
+                return web.json_response({"ResultCode": 1, "ResultDesc": str(e)}, status=400)
+
+            # A request that timed out in M-Pesa's queue was never paid
+            result_code = "timeout" if timed_out else result.result_code
+            try:
+                await asyncio.to_thread(
+                    self.payment_system.complete_payouts_from_b2c_results,
+                    [(result.conversation_id, result.originator_conversation_id,
+                      result_code, result.result_desc)]
+                )
+            except Exception as e:
+                # Not acknowledged, so Daraja sends the result again
+                return web.json_response({"ResultCode": 1, "ResultDesc": str(e)}, status=500)
+            return web.json_response({"ResultCode": 0, "ResultDesc": "Accepted"})
+
+        async def b2c_timeout(request: web.Request) -> web.Response:
+            """Receive a B2C queue timeout from M-Pesa and fail the payout"""
+            return await b2c_result(request, timed_out=True)
+
+        async def create_escrow(request: web.Request) -> web.Response:
+            """Fund a project escrow in KES and lock it on Sui as USDC"""
+            try:
+                try:
+                    data = await self._json_body(request)
+                    project_id = data.get('project_id')
+                    client_user_id = data.get('client_user_id')
+                    milestones = data.get('milestones')
+                    participants = data.get('participants')
+                    if (not project_id or not client_user_id or not milestones
+                            or not participants or data.get('total_amount_kes') is None):
+                        raise ValueError(
+                            "Missing required fields: project_id, client_user_id, "
+                            "total_amount_kes, milestones, participants"
+                        )
+                    if not isinstance(milestones, list) or not isinstance(participants, list):
+                        raise ValueError("milestones and participants must be lists")
+                    total_amount_kes = _parse_amount(data['total_amount_kes'], 'total_amount_kes')
+                except ValueError as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 400)
+
+                try:
+                    escrow = await self.payment_system.create_project_escrow(
+                        project_id, client_user_id, total_amount_kes, milestones, participants,
+                        idempotency_key=request.headers.get('Idempotency-Key')
+                    )
+                except IdempotencyConflict as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 422)
+
+                return _respond(APIResponse(
+                    success=True,
+                    data=asdict(escrow),
+                    message="Project escrow created"
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        async def get_escrow(request: web.Request) -> web.Response:
+            """Get escrow details"""
+            try:
+                escrow_id = request.match_info['escrow_id']
+                escrow = self.payment_system.get_escrow_details(escrow_id)
+
+                if not escrow:
+                    return _respond(APIResponse(
+                        success=False,
+                        error=f"Escrow not found: {escrow_id}"
+                    ), 404)
+
+                return _respond(APIResponse(
+                    success=True,
+                    data=asdict(escrow),
+                    message="Escrow details retrieved"
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        async def release_milestone(request: web.Request) -> web.Response:
+            """Release a milestone from escrow and pay the recipient in KES"""
+            try:
+                escrow_id = request.match_info['escrow_id']
+                try:
+                    milestone_index = int(request.match_info['milestone_index'])
+                    data = await self._json_body(request)
+                    recipient_user_id = data.get('recipient_user_id')
+                    if not recipient_user_id:
+                        raise ValueError("Missing required field: recipient_user_id")
+                except ValueError as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 400)
+
+                escrow = self.payment_system.get_escrow_details(escrow_id)
+                if not escrow:
+                    return _respond(APIResponse(
+                        success=False,
+                        error=f"Escrow not found: {escrow_id}"
+                    ), 404)
+                if not 0 <= milestone_index < len(escrow.milestones):
+                    return _respond(APIResponse(
+                        success=False,
+                        error=f"Invalid milestone index: {milestone_index}"
+                    ), 400)
+
+                transaction = await self.payment_system.release_milestone_payment(
+                    escrow_id, milestone_index, recipient_user_id
+                )
+
+                return _respond(APIResponse(
+                    success=True,
+                    data=asdict(transaction),
+                    message=f"Milestone {milestone_index} payment released"
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        async def payout_milestone(request: web.Request) -> web.Response:
+            """Release a milestone to every escrow participant at once"""
+            try:
+                escrow_id = request.match_info['escrow_id']
+                try:
+                    milestone_index = int(request.match_info['milestone_index'])
+                    data = await self._json_body(request) if request.can_read_body else {}
+                    phone_numbers = data.get('recipient_phone_numbers')
+                    if phone_numbers is not None and not isinstance(phone_numbers, dict):
+                        raise ValueError("recipient_phone_numbers must be an object")
+                    max_concurrency = int(data.get('max_concurrency', self.DEFAULT_PAYOUT_CONCURRENCY))
+                    if max_concurrency < 1:
+                        raise ValueError("max_concurrency must be at least 1")
+                except ValueError as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 400)
+
+                if not self.payment_system.get_escrow_details(escrow_id):
+                    return _respond(APIResponse(
+                        success=False,
+                        error=f"Escrow not found: {escrow_id}"
+                    ), 404)
+
+                try:
+                    payout = await self.payment_system.release_milestone_to_participants(
+                        escrow_id, milestone_index,
+                        recipient_phone_numbers=phone_numbers,
+                        max_concurrency=max_concurrency
+                    )
+                except ValueError as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 400)
+
+                submitted = len(payout.transactions) - len(payout.failed_recipients)
+                return _respond(APIResponse(
+                    success=not payout.failed_recipients,
+                    data=asdict(payout),
+                    message=(f"Milestone {milestone_index} submitted to M-Pesa for {submitted} of "
+                             f"{len(payout.transactions)} participants"),
+                    error=("" if not payout.failed_recipients
+                           else "Some payouts failed; retry the request to resume them")
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        async def get_transaction_history(request: web.Request) -> web.Response:
+            """Get one page of a user's payment transactions, newest first"""
+            try:
+                user_id = request.match_info['user_id']
+                query = request.query
+                try:
+                    limit = int(query.get('limit', self.DEFAULT_HISTORY_PAGE_SIZE))
+                    if not 1 <= limit <= self.MAX_HISTORY_PAGE_SIZE:
+                        raise ValueError(f"limit must be between 1 and {self.MAX_HISTORY_PAGE_SIZE}")
+                    transactions, next_cursor = await asyncio.to_thread(
+                        self.payment_system.get_transaction_history_page,
+                        user_id,
+                        limit=limit,
+                        cursor=query.get('cursor'),
+                        status=query.get('status'),
+                        transaction_type=query.get('type'),
+                        since=query.get('since'),
+                        until=query.get('until')
+                    )
+                except ValueError as e:
+                    return _respond(APIResponse(success=False, error=str(e)), 400)
+
+                return _respond(APIResponse(
+                    success=True,
+                    data={
+                        "transactions": [asdict(tx) for tx in transactions],
+                        "next_cursor": next_cursor
+                    },
+                    message=f"Found {len(transactions)} transactions"
+                ))
+
+            except Exception as e:
+                return _respond(APIResponse(success=False, error=str(e)), 500)
+
+        self.app.router.add_get('/api/payments/health', health_check)
+        self.app.router.add_post('/api/payments/deposit', initiate_deposit)
+        self.app.router.add_post('/api/payments/deposit/{transaction_id}/complete', complete_deposit)
+        self.app.router.add_post('/api/payments/mpesa/callback', mpesa_callback)
+        self.app.router.add_post('/api/payments/mpesa/b2c/result', b2c_result)
+        self.app.router.add_post('/api/payments/mpesa/b2c/timeout', b2c_timeout)
+        self.app.router.add_post('/api/payments/escrow', create_escrow)
+        self.app.router.add_get('/api/payments/escrow/{escrow_id}', get_escrow)
+        self.app.router.add_post(
+            '/api/payments/escrow/{escrow_id}/milestones/{milestone_index}/release',
+            release_milestone
+        )
+        self.app.router.add_post(
+            '/api/payments/escrow/{escrow_id}/milestones/{milestone_index}/payout',
+            payout_milestone
+        )
+        self.app.router.add_get('/api/payments/history/{user_id}', get_transaction_history)
+
+    def run(self, host='localhost', port=5001):
+        """Run the aiohttp application on its own event loop"""
+        print(f"Starting GigeBid Payment API on {host}:{port}")
+        web.run_app(self.app, host=host, port=port)
+
+# Factory function for creating the API instance
+def create_payment_api(payment_system: HybridPaymentSystem = None,
+                       callback_verifier: CallbackVerifier = None):
+    """Factory function to create GigeBid payment API instance"""
+    return GigeBidPaymentAPI(payment_system, callback_verifier)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the GigeBid payment API")
+    parser.add_argument("--host", default=os.environ.get("GIGEBID_PAYMENTS_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("GIGEBID_PAYMENTS_PORT", 5001)))
+    args = parser.parse_args()
+
+    create_payment_api().run(host=args.host, port=args.port)
@@ -4,34 +4,31 @@ Handles seamless conversion between M-Pesa (KES) and Sui blockchain (USDC)
 All user interactions happen in KES while smart contracts operate in USDC
 """
 
+import asyncio
+import base64
 import json
+import os
+import statistics
 import time
 import hashlib
-import requests
-from typing import Dict, Any, Optional, List
+from typing import Awaitable, Callable, Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass, asdict
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from urllib.parse import urlencode
 import logging
 
+import aiohttp
+
+from fixed_point import MICRO_USDC_PER_USDC, FixedPointConverter
+from http_client import HttpError, OAuthTokenCache, PooledHttpClient, get_shared_client, get_shared_token_cache
+from id_generator import new_id
+from idempotency import AsyncIdempotencyStore, request_fingerprint
+from transaction_ledger import PaymentTransaction, TransactionLedger
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
-class PaymentTransaction:
-    """Payment transaction record"""
-    transaction_id: str
-    user_id: str
-    amount_kes: Decimal
-    amount_usdc: Decimal
-    exchange_rate: Decimal
-    transaction_type: str  # 'deposit', 'withdrawal', 'escrow_payment'
-    status: str  # 'pending', 'completed', 'failed'
-    mpesa_transaction_id: Optional[str] = None
-    sui_transaction_id: Optional[str] = None
-    created_at: str = ""
-    completed_at: Optional[str] = None
-
 @dataclass
 class EscrowPayment:
     """Escrow payment details"""
@@ -44,53 +41,157 @@ class EscrowPayment:
     created_at: str
     status: str = "active"
 
+@dataclass
+class MilestonePayout:
+    """Outcome of releasing one milestone to every escrow participant"""
+    escrow_id: str
+    milestone_index: int
+    exchange_rate: Decimal
+    transactions: List[PaymentTransaction]
+    failed_recipients: Dict[str, str]  # recipient -> error
+    status: str  # 'submitted' (awaiting B2C results), 'completed' or 'partial'
+
 class MPesaConnector:
-    """M-Pesa API integration for KES transactions"""
+    """
+    M-Pesa API integration for KES transactions
+    
+    Calls to the Daraja API go through the process-wide pooled HTTP client,
+    and OAuth tokens come from the process-wide token cache, so connectors are
+    cheap to create and share connections and tokens. Without credentials
+    (MPESA_CONSUMER_KEY/MPESA_CONSUMER_SECRET) or a base_url override the
+    connector returns mock responses for development.
+    """
     
-    def __init__(self, environment: str = "sandbox"):
+    SANDBOX_URL = "https://sandbox.safaricom.co.ke"
+    PRODUCTION_URL = "https://api.safaricom.co.ke"
+    
+    def __init__(self, environment: str = "sandbox", base_url: Optional[str] = None,
+                 http_client: Optional[PooledHttpClient] = None,
+                 token_cache: Optional[OAuthTokenCache] = None):
+        """
+        Args:
+            environment: "sandbox" or "production"
+            base_url: Daraja base URL override (e.g. a local daraja_stub server);
+                defaults to MPESA_BASE_URL or the environment's URL
+            http_client: HTTP client to use (the shared pooled client by default)
+            token_cache: OAuth token cache to use (the shared cache by default)
+        """
         self.environment = environment
-        self.base_url = "https://sandbox.safaricom.co.ke" if environment == "sandbox" else "https://api.safaricom.co.ke"
-        self.consumer_key = "your_consumer_key"  # From environment variables
-        self.consumer_secret = "your_consumer_secret"
-        self.access_token = None
-        self.token_expires_at = 0
+        self.base_url = (base_url or os.environ.get("MPESA_BASE_URL")
+                         or (self.SANDBOX_URL if environment == "sandbox" else self.PRODUCTION_URL))
+        self.consumer_key = os.environ.get("MPESA_CONSUMER_KEY", "your_consumer_key")
+        self.consumer_secret = os.environ.get("MPESA_CONSUMER_SECRET", "your_consumer_secret")
+        self.shortcode = os.environ.get("MPESA_SHORTCODE", "174379")
+        self.passkey = os.environ.get("MPESA_PASSKEY", "")
+        callback_token = os.environ.get("MPESA_CALLBACK_TOKEN")
+        self.callback_url = self._with_token(
+            os.environ.get("MPESA_CALLBACK_URL", "https://example.com/mpesa/callback"), callback_token)
+        # B2C results arrive on their own routes; they are not STK callbacks
+        self.b2c_result_url = self._with_token(
+            os.environ.get("MPESA_B2C_RESULT_URL", "https://example.com/mpesa/b2c/result"), callback_token)
+        self.b2c_timeout_url = self._with_token(
+            os.environ.get("MPESA_B2C_TIMEOUT_URL", "https://example.com/mpesa/b2c/timeout"), callback_token)
+        self.live = bool(base_url or os.environ.get("MPESA_BASE_URL") or "MPESA_CONSUMER_KEY" in os.environ)
+        self.http = http_client or get_shared_client()
+        self.token_cache = token_cache or get_shared_token_cache()
+        self._token_key = (self.base_url, self.consumer_key)
+        
+    @staticmethod
+    def _with_token(url: str, token: Optional[str]) -> str:
+        """Append the callback token to a callback URL"""
+        if not token or "token=" in url:
+            return url
+        # Daraja does not sign callbacks; the payment API checks this token instead
+        separator = "&" if "?" in url else "?"
+        return f"{url}{separator}{urlencode({'token': token})}"
         
     async def get_access_token(self) -> str:
         """Get OAuth access token for M-Pesa API"""
-        if self.access_token and time.time() < self.token_expires_at:
-            return self.access_token
-            
         try:
-            # In production, load from environment variables
-            auth_url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
-            
-            # Mock response for development
-            self.access_token = "mock_access_token_" + str(int(time.time()))
-            self.token_expires_at = time.time() + 3600  # 1 hour
-            
-            logger.info("M-Pesa access token refreshed")
-            return self.access_token
-            
+            return await self.token_cache.get_token(self._token_key, self._fetch_access_token)
         except Exception as e:
             logger.error(f"Failed to get M-Pesa access token: {e}")
             raise
     
+    async def _fetch_access_token(self) -> Tuple[str, float]:
+        """Request a new OAuth token, returning (token, lifetime in seconds)"""
+        if not self.live:
+            # Mock response for development
+            logger.info("M-Pesa access token refreshed")
+            return "mock_access_token_" + str(int(time.time())), 3600  # 1 hour
+        
+        auth_url = f"{self.base_url}/oauth/v1/generate"
+        response = await self.http.request_json(
+            "GET", auth_url,
+            params={"grant_type": "client_credentials"},
+            auth=aiohttp.BasicAuth(self.consumer_key, self.consumer_secret)
+        )
+        logger.info("M-Pesa access token refreshed")
+        return response["access_token"], float(response.get("expires_in", 3599))
+    
+    async def _authorized_post(self, path: str, payload: Dict[str, Any],
+                               retry: bool = False) -> Dict[str, Any]:
+        """
+        POST to Daraja with a bearer token, refreshing it once if rejected
+        
+        Args:
+            path: API path
+            payload: JSON body
+            retry: Whether the request is safe to repeat after it was sent
+                (a query; never a payment request)
+        """
+        for attempt in range(2):
+            token = await self.get_access_token()
+            try:
+                return await self.http.request_json(
+                    "POST", f"{self.base_url}{path}",
+                    retry=retry,
+                    json=payload,
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+            except HttpError as e:
+                if e.status != 401 or attempt:
+                    raise
+                self.token_cache.invalidate(self._token_key)
+    
+    def _password(self) -> Tuple[str, str]:
+        """Daraja request password and the timestamp it was derived from"""
+        timestamp = time.strftime("%Y%m%d%H%M%S")
+        raw = f"{self.shortcode}{self.passkey}{timestamp}".encode()
+        return base64.b64encode(raw).decode(), timestamp
+    
     async def initiate_stk_push(self, phone_number: str, amount: Decimal, reference: str) -> Dict[str, Any]:
         """Initiate STK Push for payment collection"""
         try:
-            await self.get_access_token()
-            
-            # Mock STK Push response for development
-            transaction_id = f"stk_{int(time.time())}_{hash(phone_number) % 10000}"
-            
-            # In production, this would make actual API call to M-Pesa
-            response = {
-                "MerchantRequestID": f"merchant_{int(time.time())}",
-                "CheckoutRequestID": transaction_id,
-                "ResponseCode": "0",
-                "ResponseDescription": "Success. Request accepted for processing",
-                "CustomerMessage": f"Success. Request accepted for processing. Please complete payment on your phone."
-            }
+            if not self.live:
+                await self.get_access_token()
+                
+                # Mock STK Push response for development
+                transaction_id = new_id("stk")
+                response = {
+                    "MerchantRequestID": new_id("merchant"),
+                    "CheckoutRequestID": transaction_id,
+                    "ResponseCode": "0",
+                    "ResponseDescription": "Success. Request accepted for processing",
+                    "CustomerMessage": f"Success. Request accepted for processing. Please complete payment on your phone."
+                }
+            else:
+                password, timestamp = self._password()
+                phone = phone_number.lstrip("+")
+                response = await self._authorized_post("/mpesa/stkpush/v1/processrequest", {
+                    "BusinessShortCode": self.shortcode,
+                    "Password": password,
+                    "Timestamp": timestamp,
+                    "TransactionType": "CustomerPayBillOnline",
+                    "Amount": int(amount.to_integral_value(rounding=ROUND_HALF_UP)),
+                    "PartyA": phone,
+                    "PartyB": self.shortcode,
+                    "PhoneNumber": phone,
+                    "CallBackURL": self.callback_url,
+                    "AccountReference": reference[:12] or "GigeBid",
+                    "TransactionDesc": reference[:13] or "GigeBid"
+                })
+                transaction_id = response["CheckoutRequestID"]
             
             logger.info(f"STK Push initiated: {transaction_id} for KES {amount}")
             return response
@@ -102,8 +203,16 @@ class MPesaConnector:
     async def check_transaction_status(self, checkout_request_id: str) -> Dict[str, Any]:
         """Check M-Pesa transaction status"""
         try:
+            if self.live:
+                password, timestamp = self._password()
+                return await self._authorized_post("/mpesa/stkpushquery/v1/query", {
+                    "BusinessShortCode": self.shortcode,
+                    "Password": password,
+                    "Timestamp": timestamp,
+                    "CheckoutRequestID": checkout_request_id
+                }, retry=True)
+            
             # Mock transaction status check
-            # In production, this would query M-Pesa API
             status_response = {
                 "ResponseCode": "0",
                 "ResponseDescription": "The service request has been accepted successfully",
@@ -123,26 +232,164 @@ class MPesaConnector:
             logger.error(f"Transaction status check failed: {e}")
             raise
 
+    async def initiate_b2c_payment(self, phone_number: str, amount: Decimal,
+                                   reference: str, originator_id: str) -> Dict[str, Any]:
+        """
+        Send KES to a recipient's M-Pesa (B2C)
+        
+        Acceptance only means M-Pesa queued the payment; its outcome arrives
+        later on the B2C result (or queue timeout) URL.
+        
+        Args:
+            phone_number: Recipient MSISDN
+            amount: Amount in KES
+            reference: Payment remarks
+            originator_id: Our unique ID for the payment; M-Pesa echoes it back
+        """
+        try:
+            if self.live:
+                response = await self._authorized_post("/mpesa/b2c/v3/paymentrequest", {
+                    "OriginatorConversationID": originator_id,
+                    "InitiatorName": os.environ.get("MPESA_B2C_INITIATOR", "testapi"),
+                    "SecurityCredential": os.environ.get("MPESA_B2C_SECURITY_CREDENTIAL", ""),
+                    "CommandID": "BusinessPayment",
+                    "Amount": int(amount.to_integral_value(rounding=ROUND_HALF_UP)),
+                    "PartyA": self.shortcode,
+                    "PartyB": phone_number.lstrip("+"),
+                    "Remarks": reference[:100] or "GigeBid payout",
+                    "QueueTimeOutURL": self.b2c_timeout_url,
+                    "ResultURL": self.b2c_result_url,
+                    "Occasion": reference[:100]
+                })
+            else:
+                # Mock B2C response for development
+                response = {
+                    "ConversationID": new_id("AG"),
+                    "OriginatorConversationID": originator_id,
+                    "ResponseCode": "0",
+                    "ResponseDescription": "Accept the service request successfully."
+                }
+            
+            if str(response.get("ResponseCode")) != "0":
+                raise RuntimeError(f"B2C payment rejected: {response.get('ResponseDescription')}")
+            
+            logger.info(f"B2C payment initiated: {response['ConversationID']} for KES {amount}")
+            return response
+            
+        except Exception as e:
+            logger.error(f"B2C payment failed: {e}")
+            raise
+
+async def mock_usd_to_kes_source() -> Decimal:
+    """Development rate source quoting KES per USD"""
+    return Decimal("143.50")  # Approximate rate
+
 class ExchangeRateService:
-    """Service for KES to USDC exchange rate management"""
+    """
+    Service for KES to USDC exchange rate management
+    
+    The cached rate is refreshed in the background once it is within
+    `refresh_ahead` seconds of expiry, so callers keep getting the cached value
+    instead of all missing together. Only one fetch runs at a time; callers
+    that need a rate while it is in flight await the same fetch. A fetch asks
+    every source concurrently, each bounded by `fetch_timeout`, and uses the
+    median of the quotes that arrive.
+    """
     
-    def __init__(self):
-        self.cache_duration = 300  # 5 minutes cache
-        self.cached_rate = None
-        self.cache_timestamp = 0
+    def __init__(self,
+                 sources: Optional[Dict[str, Callable[[], Awaitable[Decimal]]]] = None,
+                 cache_duration: float = 300,
+                 refresh_ahead: float = 60,
+                 fetch_timeout: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            sources: Named coroutine functions each returning a KES per USD quote
+            cache_duration: Seconds a fetched rate stays valid
+            refresh_ahead: Seconds before expiry at which a background refresh starts
+            fetch_timeout: Seconds to wait for each source
+            clock: Monotonic time source (injectable for testing)
+        """
+        self.sources = sources or {"mock": mock_usd_to_kes_source}
+        self.cache_duration = cache_duration  # 5 minutes cache by default
+        self.refresh_ahead = refresh_ahead
+        self.fetch_timeout = fetch_timeout
+        self._clock = clock
+        self.cached_rate: Optional[Decimal] = None
+        self.cache_timestamp = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced_waits = 0
+        self.background_refreshes = 0
+        self.fetches = 0
+        self.fetch_failures = 0
+        self.source_failures: Dict[str, int] = {name: 0 for name in self.sources}
+        self.last_fetch_latency = 0.0
+        self.total_fetch_latency = 0.0
         
     async def get_kes_to_usdc_rate(self) -> Decimal:
         """Get current KES to USDC exchange rate"""
-        current_time = time.time()
+        if self.cached_rate is not None:
+            age = self._clock() - self.cache_timestamp
+            if age < self.cache_duration:
+                self.hits += 1
+                if age >= self.cache_duration - self.refresh_ahead and not self._fetch_running():
+                    self.background_refreshes += 1
+                    self._start_fetch()
+                return self.cached_rate
         
-        if (self.cached_rate and 
-            current_time - self.cache_timestamp < self.cache_duration):
+        self.misses += 1
+        if self._fetch_running():
+            self.coalesced_waits += 1
+            task = self._inflight
+        else:
+            task = self._start_fetch()
+        # Shielded so one cancelled caller does not cancel the fetch for everyone else
+        rate = await asyncio.shield(task)
+        if rate is not None:
+            return rate
+        if self.cached_rate is not None:
+            logger.warning("Serving expired exchange rate after failed refresh")
             return self.cached_rate
-        
+        # Fallback rate
+        return Decimal("0.007")  # Approximate fallback
+    
+    def _fetch_running(self) -> bool:
+        """Whether a fetch started on the current event loop is still in flight"""
+        task = self._inflight
+        return (task is not None and not task.done()
+                and task.get_loop() is asyncio.get_running_loop())
+    
+    def _start_fetch(self) -> asyncio.Task:
+        """Start the single shared fetch task"""
+        self._inflight = asyncio.ensure_future(self._fetch_and_store())
+        return self._inflight
+    
+    async def _fetch_and_store(self) -> Optional[Decimal]:
+        """Fetch a fresh rate and cache it; returns None if every source failed"""
+        started = time.perf_counter()
+        self.fetches += 1
         try:
-            # In production, fetch from multiple exchange APIs
-            # For development, using mock rate
-            usd_to_kes = Decimal("143.50")  # Approximate rate
+            names = list(self.sources)
+            quotes = await asyncio.gather(
+                *(asyncio.wait_for(self.sources[name](), self.fetch_timeout) for name in names),
+                return_exceptions=True
+            )
+            
+            usd_to_kes_quotes = []
+            for name, quote in zip(names, quotes):
+                if isinstance(quote, BaseException):
+                    self.source_failures[name] = self.source_failures.get(name, 0) + 1
+                    logger.warning(f"Exchange rate source {name} failed: {quote!r}")
+                else:
+                    usd_to_kes_quotes.append(Decimal(quote))
+            if not usd_to_kes_quotes:
+                raise RuntimeError("No exchange rate source responded")
+            
+            usd_to_kes = statistics.median(usd_to_kes_quotes)
             usdc_to_usd = Decimal("1.00")   # USDC is pegged to USD
             
             kes_to_usdc = (usdc_to_usd / usd_to_kes).quantize(
@@ -150,31 +397,104 @@ class ExchangeRateService:
             )
             
             self.cached_rate = kes_to_usdc
-            self.cache_timestamp = current_time
+            self.cache_timestamp = self._clock()
             
-            logger.info(f"Exchange rate updated: 1 KES = {kes_to_usdc} USDC")
+            logger.info(f"Exchange rate updated: 1 KES = {kes_to_usdc} USDC "
+                        f"(median of {len(usd_to_kes_quotes)}/{len(names)} sources)")
             return kes_to_usdc
             
         except Exception as e:
+            self.fetch_failures += 1
             logger.error(f"Failed to get exchange rate: {e}")
-            # Fallback rate
-            return Decimal("0.007")  # Approximate fallback
+            return None
+        
+        finally:
+            self.last_fetch_latency = time.perf_counter() - started
+            self.total_fetch_latency += self.last_fetch_latency
     
-    def kes_to_usdc(self, kes_amount: Decimal) -> Decimal:
-        """Convert KES amount to USDC"""
-        rate = self.get_kes_to_usdc_rate()
+    def get_metrics(self) -> Dict[str, Any]:
+        """Cache and fetch metrics for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "cached_rate": str(self.cached_rate) if self.cached_rate is not None else None,
+            "staleness_seconds": (self._clock() - self.cache_timestamp
+                                  if self.cached_rate is not None else None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "coalesced_waits": self.coalesced_waits,
+            "background_refreshes": self.background_refreshes,
+            "fetches": self.fetches,
+            "fetch_failures": self.fetch_failures,
+            "source_failures": dict(self.source_failures),
+            "last_fetch_latency_seconds": self.last_fetch_latency,
+            "average_fetch_latency_seconds": (self.total_fetch_latency / self.fetches
+                                              if self.fetches else 0.0)
+        }
+    
+    async def kes_to_usdc(self, kes_amount: Decimal, rate: Optional[Decimal] = None) -> Decimal:
+        """
+        Convert KES amount to USDC
+        
+        Args:
+            kes_amount: Amount in KES
+            rate: KES to USDC rate to apply; fetched when not given
+        """
+        if rate is None:
+            rate = await self.get_kes_to_usdc_rate()
         usdc_amount = (kes_amount * rate).quantize(
             Decimal('0.000001'), rounding=ROUND_HALF_UP
         )
         return usdc_amount
     
-    def usdc_to_kes(self, usdc_amount: Decimal) -> Decimal:
-        """Convert USDC amount to KES"""
-        rate = self.get_kes_to_usdc_rate()
+    async def usdc_to_kes(self, usdc_amount: Decimal, rate: Optional[Decimal] = None) -> Decimal:
+        """
+        Convert USDC amount to KES
+        
+        Args:
+            usdc_amount: Amount in USDC
+            rate: KES to USDC rate to apply; fetched when not given
+        """
+        if rate is None:
+            rate = await self.get_kes_to_usdc_rate()
         kes_amount = (usdc_amount / rate).quantize(
             Decimal('0.01'), rounding=ROUND_HALF_UP
         )
         return kes_amount
+    
+    async def kes_to_usdc_batch(self, kes_cents, rate: Optional[Decimal] = None):
+        """
+        Convert many KES amounts to USDC on integer minor units
+        
+        Rounds exactly like kes_to_usdc, without a Decimal per amount.
+        
+        Args:
+            kes_cents: Amounts in KES cents (list of ints or NumPy array)
+            rate: KES to USDC rate to apply; fetched when not given
+            
+        Returns:
+            Amounts in micro-USDC, as a NumPy array for array input and a list otherwise
+        """
+        if rate is None:
+            rate = await self.get_kes_to_usdc_rate()
+        return FixedPointConverter(rate).kes_cents_to_micro_usdc(kes_cents)
+    
+    async def usdc_to_kes_batch(self, micro_usdc, rate: Optional[Decimal] = None):
+        """
+        Convert many USDC amounts to KES on integer minor units
+        
+        Rounds exactly like usdc_to_kes, without a Decimal per amount.
+        
+        Args:
+            micro_usdc: Amounts in micro-USDC (list of ints or NumPy array)
+            rate: KES to USDC rate to apply; fetched when not given
+            
+        Returns:
+            Amounts in KES cents, as a NumPy array for array input and a list otherwise
+        """
+        if rate is None:
+            rate = await self.get_kes_to_usdc_rate()
+        return FixedPointConverter(rate).micro_usdc_to_kes_cents(micro_usdc)
 
 class HybridPaymentSystem:
     """
@@ -182,28 +502,58 @@ class HybridPaymentSystem:
     Users interact only in KES, while smart contracts operate in USDC
     """
     
-    def __init__(self, sui_connector=None):
+    def __init__(self, sui_connector=None, ledger=None):
+        """
+        Args:
+            sui_connector: Async escrow connector exposing awaitable
+                create_escrow_contract/release_milestone_payment, such as
+                sui_api.AsyncSuiConnector
+            ledger: TransactionLedger persisting transactions (the default
+                on-disk ledger when not given)
+        """
         self.mpesa = MPesaConnector()
         self.exchange_service = ExchangeRateService()
         self.sui_connector = sui_connector
-        self.transaction_history: Dict[str, PaymentTransaction] = {}
+        self.ledger = ledger if ledger is not None else TransactionLedger()
         self.escrow_contracts: Dict[str, EscrowPayment] = {}
+        self._payout_locks: Dict[Tuple[str, int], List[Any]] = {}
+        # Results of keyed deposit/escrow requests, replayed to client retries
+        self.idempotency = AsyncIdempotencyStore()
         
     async def initiate_deposit(self, user_id: str, phone_number: str, 
-                             amount_kes: Decimal, project_reference: str) -> PaymentTransaction:
+                             amount_kes: Decimal, project_reference: str,
+                             idempotency_key: Optional[str] = None) -> PaymentTransaction:
         """
         Initiate deposit from M-Pesa to platform
         1. User pays in KES via M-Pesa
         2. System converts to USDC at current rate
         3. USDC is deposited to user's Sui wallet
+        
+        A retry carrying the same idempotency_key returns the original
+        transaction instead of sending a second STK push.
+        
+        Raises:
+            IdempotencyConflict: If idempotency_key was used for a different deposit
         """
+        if idempotency_key is None:
+            return await self._initiate_deposit(user_id, phone_number, amount_kes, project_reference)
+        transaction, _ = await self.idempotency.run(
+            ("deposit", idempotency_key),
+            request_fingerprint(user_id, phone_number, amount_kes, project_reference),
+            lambda: self._initiate_deposit(user_id, phone_number, amount_kes, project_reference)
+        )
+        return transaction
+    
+    async def _initiate_deposit(self, user_id: str, phone_number: str,
+                                amount_kes: Decimal, project_reference: str) -> PaymentTransaction:
+        """Send the STK push for a new deposit and record it"""
         try:
             # Generate transaction ID
-            transaction_id = f"dep_{int(time.time())}_{hash(user_id) % 10000}"
+            transaction_id = new_id("dep")
             
             # Get exchange rate
             exchange_rate = await self.exchange_service.get_kes_to_usdc_rate()
-            amount_usdc = self.exchange_service.kes_to_usdc(amount_kes)
+            amount_usdc = await self.exchange_service.kes_to_usdc(amount_kes, exchange_rate)
             
             # Create transaction record
             transaction = PaymentTransaction(
@@ -214,7 +564,8 @@ class HybridPaymentSystem:
                 exchange_rate=exchange_rate,
                 transaction_type="deposit",
                 status="pending",
-                created_at=time.strftime("%Y-%m-%d %H:%M:%S")
+                created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+                phone_number=phone_number
             )
             
             # Initiate M-Pesa STK Push
@@ -223,7 +574,7 @@ class HybridPaymentSystem:
             )
             
             transaction.mpesa_transaction_id = stk_response["CheckoutRequestID"]
-            self.transaction_history[transaction_id] = transaction
+            await asyncio.to_thread(self.ledger.record, transaction)
             
             logger.info(f"Deposit initiated: {transaction_id} - KES {amount_kes} -> USDC {amount_usdc}")
             return transaction
@@ -235,60 +586,196 @@ class HybridPaymentSystem:
     async def process_deposit_completion(self, transaction_id: str) -> bool:
         """
         Process completed M-Pesa payment and mint USDC to Sui wallet
+        
+        Polls M-Pesa for the result; normally the STK callback settles deposits
+        first (see complete_deposits_from_callbacks) and this is only used to
+        reconcile deposits whose callback never arrived.
         """
         try:
-            transaction = self.transaction_history.get(transaction_id)
+            transaction = await asyncio.to_thread(self.ledger.get, transaction_id)
             if not transaction:
                 raise ValueError(f"Transaction not found: {transaction_id}")
+            if transaction.status != "pending":
+                # Already settled by a callback or an earlier poll
+                return transaction.status == "completed"
             
             # Check M-Pesa transaction status
             mpesa_status = await self.mpesa.check_transaction_status(
                 transaction.mpesa_transaction_id
             )
             
-            if mpesa_status["ResultCode"] == "0":  # Success
-                # Process Sui blockchain deposit
-                if self.sui_connector:
-                    # In production, mint USDC to user's Sui wallet
-                    sui_tx_id = f"sui_mint_{int(time.time())}"
-                    transaction.sui_transaction_id = sui_tx_id
-                
-                transaction.status = "completed"
-                transaction.completed_at = time.strftime("%Y-%m-%d %H:%M:%S")
-                
-                logger.info(f"Deposit completed: {transaction_id}")
-                return True
-            else:
-                transaction.status = "failed"
-                logger.warning(f"M-Pesa payment failed: {mpesa_status}")
-                return False
+            completed = self._settle_deposit(transaction, str(mpesa_status["ResultCode"]),
+                                             mpesa_status.get("ResultDesc", ""))
+            # A callback may have settled it while the poll was in flight; that result stands
+            if not await asyncio.to_thread(self.ledger.record_if_status, [transaction], "pending"):
+                current = await asyncio.to_thread(self.ledger.get, transaction_id)
+                return current.status == "completed"
+            return completed
                 
         except Exception as e:
             logger.error(f"Deposit processing failed: {e}")
             raise
     
+    def _settle_deposit(self, transaction: PaymentTransaction, result_code: str, result_desc: str) -> bool:
+        """Mark a pending deposit completed or failed from an M-Pesa result (caller persists it)"""
+        if result_code == "0":  # Success
+            # Process Sui blockchain deposit
+            if self.sui_connector:
+                # In production, mint USDC to user's Sui wallet
+                sui_tx_id = new_id("sui_mint")
+                transaction.sui_transaction_id = sui_tx_id
+            
+            transaction.status = "completed"
+            transaction.completed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            logger.info(f"Deposit completed: {transaction.transaction_id}")
+            return True
+        
+        transaction.status = "failed"
+        transaction.completed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        logger.warning(f"M-Pesa payment failed for {transaction.transaction_id}: {result_code} {result_desc}")
+        return False
+    
+    def complete_deposits_from_callbacks(self, results: List[Tuple[str, str, str, Dict[str, Any]]]) -> Dict[str, str]:
+        """
+        Settle pending deposits from a batch of M-Pesa STK callback results
+        
+        Matching uses the ledger's mpesa_transaction_id index (one query for the
+        whole batch) and all updates are written in one database transaction,
+        each only if the deposit is still pending. Blocks on the ledger, so
+        async callers run it in a thread.
+        A successful result whose Amount or PhoneNumber does not match the
+        deposit is not applied: the deposit stays pending, is marked for
+        review and is left out of automatic reconciliation.
+        
+        Args:
+            results: (CheckoutRequestID, ResultCode, ResultDesc, CallbackMetadata items) tuples
+            
+        Returns:
+            Mapping of CheckoutRequestID to outcome: "completed", "failed",
+            "duplicate" (already settled), "mismatch" (held for review) or
+            "unknown" (no matching deposit)
+        """
+        transactions = self.ledger.get_many_by_mpesa_ids([checkout_id for checkout_id, _, _, _ in results])
+        outcomes: Dict[str, str] = {}
+        settled: Dict[str, PaymentTransaction] = {}
+        
+        for checkout_id, result_code, result_desc, metadata in results:
+            transaction = transactions.get(checkout_id)
+            if transaction is None:
+                outcomes[checkout_id] = "unknown"
+                continue
+            if transaction.status != "pending":
+                outcomes.setdefault(checkout_id, "duplicate")
+                continue
+            mismatch = self._callback_mismatch(transaction, metadata) if result_code == "0" else None
+            if mismatch is not None:
+                transaction.review_reason = mismatch
+                outcomes[checkout_id] = "mismatch"
+                settled[transaction.transaction_id] = transaction
+                logger.warning(f"Deposit {transaction.transaction_id} held for review: {mismatch}")
+            else:
+                completed = self._settle_deposit(transaction, result_code, result_desc)
+                outcomes[checkout_id] = "completed" if completed else "failed"
+                settled[transaction.transaction_id] = transaction
+        
+        if settled:
+            written = self.ledger.record_if_status(list(settled.values()), "pending")
+            for transaction in settled.values():
+                if transaction.transaction_id not in written:
+                    # Settled by a status poll or another worker since it was read
+                    outcomes[transaction.mpesa_transaction_id] = "duplicate"
+        return outcomes
+    
+    @staticmethod
+    def _callback_mismatch(transaction: PaymentTransaction, metadata: Dict[str, Any]) -> Optional[str]:
+        """Why a successful callback's metadata does not fit the deposit, or None if it does"""
+        # The STK push asked for the amount rounded to whole shillings
+        expected_amount = transaction.amount_kes.to_integral_value(rounding=ROUND_HALF_UP)
+        try:
+            amount = Decimal(str(metadata.get("Amount")))
+        except (InvalidOperation, ValueError):
+            amount = None
+        if amount is None or not amount.is_finite() or amount != expected_amount:
+            return f"callback amount {metadata.get('Amount')} does not match KES {expected_amount}"
+        
+        if transaction.phone_number is not None:
+            expected_phone = "".join(ch for ch in transaction.phone_number if ch.isdigit())
+            phone = "".join(ch for ch in str(metadata.get("PhoneNumber", "")) if ch.isdigit())
+            if phone != expected_phone:
+                return f"callback phone number {metadata.get('PhoneNumber')} does not match the deposit"
+        return None
+    
+    def get_stale_pending_deposits(self, older_than: float, limit: int) -> List[PaymentTransaction]:
+        """
+        Pending deposits created more than `older_than` seconds ago, oldest first
+        
+        These are deposits whose STK callback has not arrived in time.
+        """
+        cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - older_than))
+        transactions, _ = self.ledger.query(
+            status="pending", transaction_type="deposit", needs_review=False,
+            until=cutoff, limit=limit, oldest_first=True
+        )
+        return transactions
+    
+    def get_deposits_for_review(self, limit: int = 100) -> List[PaymentTransaction]:
+        """Pending deposits held back because their callback did not match, oldest first"""
+        transactions, _ = self.ledger.query(
+            status="pending", transaction_type="deposit", needs_review=True,
+            limit=limit, oldest_first=True
+        )
+        return transactions
+    
     async def create_project_escrow(self, project_id: str, client_user_id: str,
                                   total_amount_kes: Decimal, milestones: List[Dict],
-                                  participants: List[str]) -> EscrowPayment:
+                                  participants: List[str],
+                                  idempotency_key: Optional[str] = None) -> EscrowPayment:
         """
         Create escrow contract for project payments
         1. Client deposits total amount in KES
         2. Converted to USDC and locked in Sui smart contract
         3. Released based on milestone completion
+        
+        A retry carrying the same idempotency_key returns the original escrow.
+        If the first attempt failed after its deposit went out, the retry
+        reuses that deposit rather than charging the client again.
+        
+        Raises:
+            IdempotencyConflict: If idempotency_key was used for a different escrow
         """
+        if idempotency_key is None:
+            return await self._create_project_escrow(
+                project_id, client_user_id, total_amount_kes, milestones, participants
+            )
+        escrow, _ = await self.idempotency.run(
+            ("escrow", idempotency_key),
+            request_fingerprint(project_id, client_user_id, total_amount_kes, milestones, participants),
+            lambda: self._create_project_escrow(
+                project_id, client_user_id, total_amount_kes, milestones, participants,
+                deposit_idempotency_key=f"escrow:{idempotency_key}"
+            )
+        )
+        return escrow
+    
+    async def _create_project_escrow(self, project_id: str, client_user_id: str,
+                                     total_amount_kes: Decimal, milestones: List[Dict],
+                                     participants: List[str],
+                                     deposit_idempotency_key: Optional[str] = None) -> EscrowPayment:
+        """Take the client's deposit and lock it in a new escrow"""
         try:
-            escrow_id = f"escrow_{project_id}_{int(time.time())}"
+            escrow_id = new_id(f"escrow_{project_id}")
             
             # Convert to USDC
             exchange_rate = await self.exchange_service.get_kes_to_usdc_rate()
-            total_amount_usdc = self.exchange_service.kes_to_usdc(total_amount_kes)
+            total_amount_usdc = await self.exchange_service.kes_to_usdc(total_amount_kes, exchange_rate)
             
             # Process initial deposit from client
             deposit_transaction = await self.initiate_deposit(
                 client_user_id, 
                 "+254700000000",  # Would come from user profile
                 total_amount_kes,
-                f"Project {project_id} Escrow"
+                f"Project {project_id} Escrow",
+                idempotency_key=deposit_idempotency_key
             )
             
             # Create escrow contract on Sui
@@ -334,7 +821,8 @@ class HybridPaymentSystem:
             milestone_amount_usdc = Decimal(str(milestone["amount_usdc"]))
             
             # Convert USDC to KES at current rate
-            milestone_amount_kes = self.exchange_service.usdc_to_kes(milestone_amount_usdc)
+            exchange_rate = await self.exchange_service.get_kes_to_usdc_rate()
+            milestone_amount_kes = await self.exchange_service.usdc_to_kes(milestone_amount_usdc, exchange_rate)
             
             # Release from Sui smart contract
             if self.sui_connector:
@@ -343,22 +831,22 @@ class HybridPaymentSystem:
                 )
             
             # Create withdrawal transaction
-            transaction_id = f"withdrawal_{int(time.time())}_{hash(recipient_user_id) % 10000}"
+            transaction_id = new_id("withdrawal")
             
             transaction = PaymentTransaction(
                 transaction_id=transaction_id,
                 user_id=recipient_user_id,
                 amount_kes=milestone_amount_kes,
                 amount_usdc=milestone_amount_usdc,
-                exchange_rate=await self.exchange_service.get_kes_to_usdc_rate(),
+                exchange_rate=exchange_rate,
                 transaction_type="milestone_payment",
                 status="completed",
-                sui_transaction_id=sui_release_tx if self.sui_connector else f"mock_sui_{int(time.time())}",
+                sui_transaction_id=sui_release_tx if self.sui_connector else new_id("mock_sui"),
                 created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
                 completed_at=time.strftime("%Y-%m-%d %H:%M:%S")
             )
             
-            self.transaction_history[transaction_id] = transaction
+            await asyncio.to_thread(self.ledger.record, transaction)
             
             # In production, trigger M-Pesa B2C payment to recipient
             logger.info(f"Milestone payment released: {transaction_id} - USDC {milestone_amount_usdc} -> KES {milestone_amount_kes}")
@@ -369,21 +857,321 @@ class HybridPaymentSystem:
             logger.error(f"Milestone payment release failed: {e}")
             raise
     
-    def get_transaction_history(self, user_id: str) -> List[PaymentTransaction]:
-        """Get transaction history for a user"""
-        return [
-            tx for tx in self.transaction_history.values() 
-            if tx.user_id == user_id
+    async def release_milestone_to_participants(self, escrow_id: str, milestone_index: int,
+                                                recipient_phone_numbers: Optional[Dict[str, str]] = None,
+                                                max_concurrency: int = 10) -> MilestonePayout:
+        """
+        Release a milestone to every participant of an escrow in one operation
+        1. Snapshot the exchange rate once and split the milestone evenly in micro-USDC
+        2. Record a pending payout per recipient (deterministic IDs, so reruns find them)
+        3. Release the milestone on Sui once; the contract splits it between members
+        4. Submit each recipient's M-Pesa B2C payment, with at most
+           `max_concurrency` submissions in flight
+        
+        A payout is only "b2c_submitted" once M-Pesa accepts it; it becomes
+        "completed" or "failed" when the B2C result callback arrives (see
+        complete_payouts_from_b2c_results). Every state is written to the
+        ledger before the next step, so a rerun skips submitted recipients,
+        resubmits failed ones and reuses the amounts and rate recorded on
+        the first run.
+        
+        Args:
+            escrow_id: Escrow to pay out from
+            milestone_index: Milestone to release (0-based)
+            recipient_phone_numbers: M-Pesa numbers per participant (defaults to
+                the participant ID itself)
+            max_concurrency: Most B2C submissions in flight at once
+            
+        Returns:
+            MilestonePayout with one transaction per recipient
+        """
+        escrow = self.escrow_contracts.get(escrow_id)
+        if not escrow:
+            raise ValueError(f"Escrow not found: {escrow_id}")
+        if not 0 <= milestone_index < len(escrow.milestones):
+            raise ValueError(f"Invalid milestone index: {milestone_index}")
+        if not escrow.participants:
+            raise ValueError(f"Escrow has no participants: {escrow_id}")
+        
+        # [lock, holders]; dropped by the last holder so finished milestones leave nothing behind
+        key = (escrow_id, milestone_index)
+        entry = self._payout_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                transactions = await self._prepare_milestone_payouts(escrow, milestone_index)
+                await self._release_milestone_on_chain(escrow, milestone_index, transactions)
+                errors = await self._submit_payouts(
+                    escrow, milestone_index, transactions,
+                    recipient_phone_numbers or {}, max_concurrency
+                )
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._payout_locks[key]
+        
+        failed = {
+            transaction.user_id: error
+            for transaction, error in zip(transactions, errors) if error is not None
+        }
+        if failed:
+            status = "partial"
+        elif all(transaction.status == "completed" for transaction in transactions):
+            status = "completed"
+        else:
+            status = "submitted"
+        
+        logger.info(f"Milestone {milestone_index} of {escrow_id} submitted for "
+                    f"{len(transactions) - len(failed)}/{len(transactions)} participants")
+        return MilestonePayout(
+            escrow_id=escrow_id,
+            milestone_index=milestone_index,
+            exchange_rate=transactions[0].exchange_rate,
+            transactions=transactions,
+            failed_recipients=failed,
+            status=status
+        )
+    
+    async def _prepare_milestone_payouts(self, escrow: EscrowPayment,
+                                         milestone_index: int) -> List[PaymentTransaction]:
+        """Load the per-recipient payout records of a milestone, creating missing ones"""
+        recipients = list(dict.fromkeys(escrow.participants))
+        transaction_ids = [
+            f"payout_{escrow.escrow_id}_{milestone_index}_{recipient}" for recipient in recipients
         ]
+        found = await asyncio.to_thread(self.ledger.get_many, transaction_ids)
+        existing = {transaction_id: found.get(transaction_id) for transaction_id in transaction_ids}
+        missing = [transaction_id for transaction_id, transaction in existing.items() if transaction is None]
+        if not missing:
+            return [existing[transaction_id] for transaction_id in transaction_ids]
+        
+        # One rate snapshot for the whole milestone
+        previous = next((tx for tx in existing.values() if tx is not None), None)
+        exchange_rate = (previous.exchange_rate if previous is not None
+                         else await self.exchange_service.get_kes_to_usdc_rate())
+        
+        # Even split in micro-USDC; the remainder goes one unit each to the first recipients
+        milestone_usdc = Decimal(str(escrow.milestones[milestone_index]["amount_usdc"]))
+        total_micro = int((milestone_usdc * MICRO_USDC_PER_USDC).to_integral_value(rounding=ROUND_HALF_UP))
+        share, remainder = divmod(total_micro, len(recipients))
+        shares_micro = [share + (1 if index < remainder else 0) for index in range(len(recipients))]
+        shares_cents = await self.exchange_service.usdc_to_kes_batch(shares_micro, exchange_rate)
+        
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        new_transactions = []
+        for recipient, transaction_id, micro, cents in zip(recipients, transaction_ids, shares_micro, shares_cents):
+            if existing[transaction_id] is None:
+                existing[transaction_id] = PaymentTransaction(
+                    transaction_id=transaction_id,
+                    user_id=recipient,
+                    amount_kes=Decimal(cents).scaleb(-2),
+                    amount_usdc=Decimal(micro).scaleb(-6),
+                    exchange_rate=exchange_rate,
+                    transaction_type="milestone_payment",
+                    status="pending",
+                    created_at=created_at
+                )
+                new_transactions.append(existing[transaction_id])
+        await asyncio.to_thread(self.ledger.record_many, new_transactions)
+        return [existing[transaction_id] for transaction_id in transaction_ids]
+    
+    async def _release_milestone_on_chain(self, escrow: EscrowPayment, milestone_index: int,
+                                          transactions: List[PaymentTransaction]):
+        """Release the milestone on Sui once and note the release on every payout"""
+        unreleased = [transaction for transaction in transactions if transaction.sui_transaction_id is None]
+        if not unreleased:
+            return
+        if self.sui_connector:
+            # Releasing an already released milestone returns the original release
+            sui_transaction_id = await self.sui_connector.release_milestone_payment(
+                escrow.escrow_id, milestone_index, escrow.project_id
+            )
+        else:
+            sui_transaction_id = new_id("mock_sui")
+        for transaction in unreleased:
+            transaction.sui_transaction_id = sui_transaction_id
+        await asyncio.to_thread(self.ledger.record_many, unreleased)
+    
+    async def _submit_payouts(self, escrow: EscrowPayment, milestone_index: int,
+                              transactions: List[PaymentTransaction],
+                              phone_numbers: Dict[str, str],
+                              max_concurrency: int) -> List[Optional[str]]:
+        """Submit the B2C payments not yet accepted by M-Pesa; returns an error or None per payout"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def submit(transaction: PaymentTransaction) -> Optional[str]:
+            if transaction.status in ("b2c_submitted", "completed"):
+                return None
+            if transaction.status == "b2c_submitting":
+                # A previous run sent the request but never saw M-Pesa's answer;
+                # resending could pay twice, so wait for its result callback
+                if transaction.review_reason is None:
+                    transaction.review_reason = "B2C request outcome unknown"
+                    await asyncio.to_thread(self.ledger.record, transaction)
+                return "B2C request outcome unknown; awaiting its M-Pesa result"
+            async with semaphore:
+                try:
+                    await self._submit_b2c_payout(
+                        transaction, escrow, milestone_index,
+                        phone_numbers.get(transaction.user_id, transaction.user_id)
+                    )
+                    return None
+                except Exception as e:
+                    logger.error(f"Milestone payout to {transaction.user_id} failed: {e}")
+                    return str(e) or type(e).__name__
+        
+        return await asyncio.gather(*(submit(transaction) for transaction in transactions))
+    
+    async def _submit_b2c_payout(self, transaction: PaymentTransaction, escrow: EscrowPayment,
+                                 milestone_index: int, phone_number: str):
+        """
+        Send one recipient's B2C payment and record that M-Pesa accepted it
+        
+        The payout is recorded as "b2c_submitting" before the request goes
+        out. Only when M-Pesa clearly did not act on it (a refused or never
+        sent request) does it move to "failed" or back to "pending"; any other
+        error leaves it "b2c_submitting", flagged for review, so it is never
+        sent twice.
+        """
+        transaction.status = "b2c_submitting"
+        transaction.mpesa_transaction_id = None
+        transaction.completed_at = None
+        await asyncio.to_thread(self.ledger.record, transaction)
+        try:
+            response = await self.mpesa.initiate_b2c_payment(
+                phone_number, transaction.amount_kes,
+                f"{escrow.project_id} milestone {milestone_index}",
+                transaction.transaction_id
+            )
+        except aiohttp.ClientConnectorError:
+            transaction.status = "pending"
+            await asyncio.to_thread(self.ledger.record, transaction)
+            raise
+        except HttpError as e:
+            if e.status >= 500:
+                transaction.review_reason = f"B2C request outcome unknown: {e}"
+            else:
+                transaction.status = "failed"
+            await asyncio.to_thread(self.ledger.record, transaction)
+            raise
+        except RuntimeError:
+            # Daraja answered with a non-zero ResponseCode
+            transaction.status = "failed"
+            await asyncio.to_thread(self.ledger.record, transaction)
+            raise
+        except Exception as e:
+            transaction.review_reason = f"B2C request outcome unknown: {e or type(e).__name__}"
+            await asyncio.to_thread(self.ledger.record, transaction)
+            raise
+        
+        transaction.status = "b2c_submitted"
+        transaction.mpesa_transaction_id = response["ConversationID"]
+        await asyncio.to_thread(self.ledger.record, transaction)
+    
+    def complete_payouts_from_b2c_results(self, results: List[Tuple[str, str, str, str]]) -> Dict[str, str]:
+        """
+        Settle submitted milestone payouts from M-Pesa B2C result callbacks
+        
+        Payouts are matched on the ConversationID saved when M-Pesa accepted
+        them, falling back to the OriginatorConversationID (the payout's own
+        transaction ID) for a submission whose response was never seen.
+        Each update is written only if the payout is still awaiting its
+        result. Blocks on the ledger, so async callers run it in a thread.
+        
+        Args:
+            results: (ConversationID, OriginatorConversationID, ResultCode, ResultDesc) tuples
+            
+        Returns:
+            Mapping of ConversationID (or OriginatorConversationID when that is
+            empty) to outcome: "completed", "failed", "duplicate" (already
+            settled) or "unknown" (no matching payout)
+        """
+        by_conversation = self.ledger.get_many_by_mpesa_ids(
+            [conversation_id for conversation_id, _, _, _ in results if conversation_id])
+        by_originator = self.ledger.get_many(
+            [originator_id for conversation_id, originator_id, _, _ in results
+             if originator_id and conversation_id not in by_conversation])
+        outcomes: Dict[str, str] = {}
+        keys: Dict[str, str] = {}  # transaction ID -> result key
+        settled: Dict[str, List[PaymentTransaction]] = {"b2c_submitted": [], "b2c_submitting": []}
+        
+        for conversation_id, originator_id, result_code, result_desc in results:
+            key = conversation_id or originator_id
+            transaction = by_conversation.get(conversation_id) or by_originator.get(originator_id)
+            if transaction is None or transaction.transaction_type != "milestone_payment":
+                outcomes[key] = "unknown"
+                continue
+            if transaction.status not in settled or transaction.transaction_id in keys:
+                outcomes.setdefault(key, "duplicate")
+                continue
+            keys[transaction.transaction_id] = key
+            settled[transaction.status].append(transaction)
+            transaction.mpesa_transaction_id = transaction.mpesa_transaction_id or conversation_id or None
+            transaction.completed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            if result_code == "0":
+                transaction.status = "completed"
+                transaction.review_reason = None
+                outcomes[key] = "completed"
+                logger.info(f"Milestone payout completed: {transaction.transaction_id}")
+            else:
+                transaction.status = "failed"
+                outcomes[key] = "failed"
+                logger.warning(f"Milestone payout {transaction.transaction_id} failed: {result_code} {result_desc}")
+        
+        for expected_status, transactions in settled.items():
+            if not transactions:
+                continue
+            written = self.ledger.record_if_status(transactions, expected_status)
+            for transaction in transactions:
+                if transaction.transaction_id not in written:
+                    # Settled by another worker since it was read
+                    outcomes[keys[transaction.transaction_id]] = "duplicate"
+        return outcomes
+    
+    def get_transaction(self, transaction_id: str) -> Optional[PaymentTransaction]:
+        """Get a single transaction from the ledger"""
+        return self.ledger.get(transaction_id)
+    
+    def get_transaction_history(self, user_id: str) -> List[PaymentTransaction]:
+        """Get transaction history for a user, newest first"""
+        transactions, _ = self.ledger.query(user_id=user_id)
+        return transactions
+    
+    def get_transaction_history_page(self, user_id: str,
+                                     limit: int = 50,
+                                     cursor: Optional[str] = None,
+                                     status: Optional[str] = None,
+                                     transaction_type: Optional[str] = None,
+                                     since: Optional[str] = None,
+                                     until: Optional[str] = None) -> Tuple[List[PaymentTransaction], Optional[str]]:
+        """
+        Get one page of a user's transaction history, newest first.
+        
+        Args:
+            user_id: User whose transactions to list
+            limit: Page size
+            cursor: Cursor returned with the previous page
+            status: Only transactions in this status
+            transaction_type: Only transactions of this type
+            since: Only transactions created at or after this "%Y-%m-%d %H:%M:%S" time
+            until: Only transactions created before this time
+            
+        Returns:
+            (transactions, next_cursor) tuple; next_cursor is None on the last page
+        """
+        return self.ledger.query(
+            user_id=user_id, status=status, transaction_type=transaction_type,
+            since=since, until=until, limit=limit, cursor=cursor
+        )
     
     def get_escrow_details(self, escrow_id: str) -> Optional[EscrowPayment]:
         """Get escrow contract details"""
         return self.escrow_contracts.get(escrow_id)
 
 # Factory function
-def create_payment_system(sui_connector=None):
+def create_payment_system(sui_connector=None, ledger=None):
     """Create hybrid payment system instance"""
-    return HybridPaymentSystem(sui_connector)
+    return HybridPaymentSystem(sui_connector, ledger)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""
+HerBid Result Cache
+Bounded LRU cache with per-entry TTL used to memoize AGI engine queries.
+
+Every caller that hits a key gets the same stored object, so cached values
+must be immutable: tuples, frozen dataclasses and FrozenDict.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict for values held in the cache.
+
+    Subclasses dict, so dataclasses.asdict and jsonify treat it like any other
+    mapping; every mutating method raises TypeError.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __reduce__(self):
+        # Rebuild through the constructor; the default dict protocol refills via __setitem__
+        return type(self), (dict(self),)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a fixed TTL.
+
+    Callers are expected to fold anything that invalidates a result (such as a
+    knowledge base generation counter) into the key, so the cache never has to
+    be flushed explicitly; stale keys simply age out or get evicted.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached results before LRU eviction
+            ttl: Seconds an entry stays valid after it is stored
+            clock: Monotonic time source (injectable for testing)
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key.
+
+        Returns:
+            (found, value) tuple; value is None when not found
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value = entry
+            if self._clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
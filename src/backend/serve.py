@@ -0,0 +1,159 @@
+"""
+GigeBid Production Server
+Runs the backend API under gunicorn's pre-fork worker model instead of Flask's
+single-process development server.
+
+The API (and with it the AGI engine's knowledge base, indexes and scorer) is
+built once in the master process before workers are forked, so every worker
+shares that memory copy-on-write.
+
+Usage:
+    python3 serve.py --workers 4 --threads 8 --port 5000
+
+Send SIGHUP to the master for a graceful worker restart; in-flight requests get
+`graceful_timeout` seconds to finish.
+
+Escrow state is kept in the SQLite ledger database (see escrow_store), so an
+escrow created by one worker can be read and released by any other. Point
+GIGEBID_LEDGER_PATH or GIGEBID_DATA_DIR at storage every worker can reach.
+
+Note that knowledge base writes (POST /api/businesses, /api/contracts) only
+reach the worker that handled them, and are lost when that worker restarts.
+Worker recycling via max_requests is therefore off by default.
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+from typing import Any, Dict
+
+from gunicorn.app.base import BaseApplication
+
+from api import GigeBidBackendAPI, create_gigebid_api
+
+
+def default_worker_count() -> int:
+    """gunicorn's recommended (2 x CPU) + 1 workers"""
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def build_server_options(host: str = "0.0.0.0",
+                         port: int = 5000,
+                         workers: int = None,
+                         threads: int = 4,
+                         keepalive: int = 5,
+                         timeout: int = 30,
+                         graceful_timeout: int = 30,
+                         max_requests: int = 0,
+                         max_requests_jitter: int = 1000,
+                         backlog: int = 2048) -> Dict[str, Any]:
+    """
+    Build gunicorn settings for the GigeBid API.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        workers: Number of worker processes (defaults to 2 x CPU + 1)
+        threads: Threads per worker; more than one selects the gthread worker
+        keepalive: Seconds to hold idle keep-alive connections open
+        timeout: Seconds before a silent worker is killed and replaced
+        graceful_timeout: Seconds workers get to finish requests on reload/shutdown
+        max_requests: Recycle a worker after this many requests (0 disables)
+        max_requests_jitter: Random spread on max_requests so workers don't recycle together
+        backlog: Maximum number of pending connections
+
+    Returns:
+        Dictionary of gunicorn configuration values
+    """
+    return {
+        "bind": f"{host}:{port}",
+        "workers": workers or default_worker_count(),
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "keepalive": keepalive,
+        "timeout": timeout,
+        "graceful_timeout": graceful_timeout,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests_jitter,
+        "backlog": backlog,
+        # Build the engine once in the master so workers share it copy-on-write
+        "preload_app": True,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+
+
+class GigeBidProductionServer(BaseApplication):
+    """gunicorn application wrapping an already constructed GigeBidBackendAPI"""
+
+    def __init__(self, api: GigeBidBackendAPI, options: Dict[str, Any]):
+        self.api = api
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        """Apply our options on top of gunicorn's defaults"""
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        """Return the WSGI application served by every worker"""
+        return self.api.app
+
+
+def serve(**options):
+    """
+    Preload the API and run it under gunicorn.
+
+    Args:
+        **options: Keyword arguments for build_server_options
+    """
+    api = create_gigebid_api()
+
+    # Objects created during preload are never freed, so move them out of the
+    # collector's view; otherwise GC passes in the workers touch their headers
+    # and turn shared pages into private copies.
+    gc.collect()
+    gc.freeze()
+
+    server_options = build_server_options(**options)
+    print(f"Starting GigeBid Backend API (production) on {server_options['bind']} "
+          f"with {server_options['workers']} workers x {server_options['threads']} threads")
+    GigeBidProductionServer(api, server_options).run()
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def main():
+    """Command line entry point; flags override GIGEBID_* environment variables"""
+    parser = argparse.ArgumentParser(description="Run the GigeBid backend API in production mode")
+    parser.add_argument("--host", default=os.environ.get("GIGEBID_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=_env_int("GIGEBID_PORT", 5000))
+    parser.add_argument("--workers", type=int, default=_env_int("GIGEBID_WORKERS", default_worker_count()))
+    parser.add_argument("--threads", type=int, default=_env_int("GIGEBID_THREADS", 4))
+    parser.add_argument("--keepalive", type=int, default=_env_int("GIGEBID_KEEPALIVE", 5))
+    parser.add_argument("--timeout", type=int, default=_env_int("GIGEBID_TIMEOUT", 30))
+    parser.add_argument("--graceful-timeout", type=int, default=_env_int("GIGEBID_GRACEFUL_TIMEOUT", 30))
+    parser.add_argument("--max-requests", type=int, default=_env_int("GIGEBID_MAX_REQUESTS", 0))
+    args = parser.parse_args()
+
+    serve(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=args.threads,
+        keepalive=args.keepalive,
+        timeout=args.timeout,
+        graceful_timeout=args.graceful_timeout,
+        max_requests=args.max_requests,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+HerBid Skill Coverage Solver
+Exact minimum-size team formation for the AGI engine. Contract requirements are
+encoded as bitmasks so that covering a contract becomes a weighted set-cover
+problem that can be solved with branch-and-bound instead of brute force.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class SearchTimeout(Exception):
+    """Raised by SearchBudget.tick when a search exceeds its time budget"""
+
+
+class SearchBudget:
+    """
+    Node counter and deadline of one search.
+
+    Created per call rather than stored on the solver, so concurrent solves on
+    a shared solver cannot cut each other's searches short.
+    """
+    __slots__ = ("deadline", "nodes")
+
+    CLOCK_CHECK_INTERVAL = 1024
+
+    def __init__(self, time_budget: float):
+        self.deadline = time.perf_counter() + time_budget
+        self.nodes = 0
+
+    def tick(self):
+        """Count a search node and enforce the time budget"""
+        self.nodes += 1
+        if self.nodes % self.CLOCK_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+
+@dataclass
+class CoverageResult:
+    """Data class for skill coverage solver results"""
+    team: List[str]
+    exact: bool  # False when the greedy fallback was used
+    nodes_explored: int
+
+
+class SkillCoverageSolver:
+    """
+    Finds the smallest set of businesses that covers a contract's required skills.
+
+    The search runs in three stages:
+      1. Encoding: required skills become bits, businesses become masks, and
+         businesses that contribute no required skill are pruned.
+      2. Sizing: masks that are subsets of another mask are eliminated and a
+         branch-and-bound search finds the minimum team size, seeded with a
+         greedy upper bound.
+      3. Selection: the first team of that size in the caller's candidate order
+         is returned, so results match an exhaustive ``combinations`` scan.
+
+    If the time budget runs out, the best team found so far (at worst the
+    greedy cover) is returned with ``exact=False``.
+    """
+
+    def __init__(self, time_budget: float = 1.0):
+        """
+        Initialize the solver.
+
+        Args:
+            time_budget: Maximum seconds to spend on the exact search per solve
+        """
+        self.time_budget = time_budget
+
+    @staticmethod
+    def encode_skills(required_skills: Iterable[str]) -> Dict[str, int]:
+        """Assign a bit to every required skill (sorted for determinism)"""
+        return {skill: 1 << i for i, skill in enumerate(sorted(set(required_skills)))}
+
+    def solve(self,
+              required_skills: Iterable[str],
+              candidates: Sequence[Tuple[str, Iterable[str]]]) -> CoverageResult:
+        """
+        Find a minimum-size team covering all required skills.
+
+        Args:
+            required_skills: Skills the contract requires
+            candidates: Ordered (business_name, skills) pairs to choose from
+
+        Returns:
+            CoverageResult with an empty team if no cover exists
+        """
+        budget = SearchBudget(self.time_budget)
+
+        skill_bits = self.encode_skills(required_skills)
+        full_mask = (1 << len(skill_bits)) - 1
+
+        if full_mask == 0:
+            # Nothing to cover: any single candidate is a complete team
+            team = [candidates[0][0]] if candidates else []
+            return CoverageResult(team=team, exact=True, nodes_explored=0)
+
+        # Encode candidates, dropping businesses that contribute nothing
+        useful: List[Tuple[str, int]] = []
+        union = 0
+        for name, skills in candidates:
+            mask = 0
+            for skill in skills:
+                mask |= skill_bits.get(skill, 0)
+            if mask:
+                useful.append((name, mask))
+                union |= mask
+
+        if union != full_mask:
+            return CoverageResult(team=[], exact=True, nodes_explored=0)
+
+        # Businesses with identical masks are interchangeable for sizing
+        first_by_mask: Dict[int, str] = {}
+        for name, mask in useful:
+            first_by_mask.setdefault(mask, name)
+
+        greedy_team = self._greedy_cover(first_by_mask, full_mask)
+
+        try:
+            reduced = self._eliminate_dominated(list(first_by_mask), budget)
+            best_masks = self._minimum_cover(reduced, full_mask, len(greedy_team), budget)
+        except SearchTimeout:
+            return CoverageResult(team=greedy_team, exact=False, nodes_explored=budget.nodes)
+
+        min_size = len(best_masks) if best_masks is not None else len(greedy_team)
+        if best_masks is None:
+            fallback_team = greedy_team
+        else:
+            fallback_team = [first_by_mask[mask] for mask in best_masks]
+
+        try:
+            team = self._first_cover_of_size(useful, full_mask, min_size, budget)
+        except SearchTimeout:
+            return CoverageResult(team=fallback_team, exact=False, nodes_explored=budget.nodes)
+
+        return CoverageResult(team=team or fallback_team, exact=True, nodes_explored=budget.nodes)
+
+    @staticmethod
+    def _greedy_cover(first_by_mask: Dict[int, str], full_mask: int) -> List[str]:
+        """Classic greedy cover: repeatedly take the mask covering the most new skills"""
+        team = []
+        uncovered = full_mask
+        masks = list(first_by_mask)
+        while uncovered:
+            best_mask = max(masks, key=lambda m: bin(m & uncovered).count("1"))
+            team.append(first_by_mask[best_mask])
+            uncovered &= ~best_mask
+        return team
+
+    def _eliminate_dominated(self, masks: List[int], budget: SearchBudget) -> List[int]:
+        """Drop masks that are strict subsets of another mask"""
+        masks.sort(key=lambda m: bin(m).count("1"), reverse=True)
+        maximal: List[int] = []
+        for mask in masks:
+            budget.tick()
+            if not any(mask & other == mask for other in maximal):
+                maximal.append(mask)
+        return maximal
+
+    def _minimum_cover(self, masks: List[int], full_mask: int, upper_bound: int,
+                       budget: SearchBudget) -> Optional[List[int]]:
+        """Branch-and-bound search for the minimum number of masks covering full_mask"""
+        bit_count = full_mask.bit_length()
+        covering: List[List[int]] = [
+            sorted((m for m in masks if m >> bit & 1), key=lambda m: bin(m).count("1"), reverse=True)
+            for bit in range(bit_count)
+        ]
+        max_pop = max(bin(m).count("1") for m in masks)
+
+        best: List[Optional[List[int]]] = [None]
+        best_size = [upper_bound]
+        seen: Dict[int, int] = {}
+
+        def search(uncovered: int, chosen: List[int]):
+            budget.tick()
+            if not uncovered:
+                if len(chosen) < best_size[0] or best[0] is None:
+                    best[0] = list(chosen)
+                    best_size[0] = len(chosen)
+                return
+
+            remaining = bin(uncovered).count("1")
+            lower_bound = len(chosen) + -(-remaining // max_pop)
+            if lower_bound > best_size[0] or (lower_bound == best_size[0] and best[0] is not None):
+                return
+
+            # Reaching the same uncovered set with as few picks already was explored
+            if seen.get(uncovered, best_size[0] + 1) <= len(chosen):
+                return
+            seen[uncovered] = len(chosen)
+
+            # Branch on the uncovered skill with the fewest providers
+            pivot = min(
+                (bit for bit in range(bit_count) if uncovered >> bit & 1),
+                key=lambda bit: len(covering[bit])
+            )
+            for mask in covering[pivot]:
+                chosen.append(mask)
+                search(uncovered & ~mask, chosen)
+                chosen.pop()
+
+        search(full_mask, [])
+        return best[0]
+
+    def _first_cover_of_size(self, useful: List[Tuple[str, int]], full_mask: int,
+                             size: int, budget: SearchBudget) -> Optional[List[str]]:
+        """Find the lexicographically first cover of exactly `size` candidates"""
+        count = len(useful)
+        suffix_union = [0] * (count + 1)
+        suffix_max_pop = [0] * (count + 1)
+        for i in range(count - 1, -1, -1):
+            mask = useful[i][1]
+            suffix_union[i] = suffix_union[i + 1] | mask
+            suffix_max_pop[i] = max(suffix_max_pop[i + 1], bin(mask).count("1"))
+
+        # (uncovered, slots) -> smallest start index proven infeasible
+        infeasible: Dict[Tuple[int, int], int] = {}
+
+        def search(start: int, uncovered: int, slots: int, chosen: List[int]) -> bool:
+            budget.tick()
+            if not uncovered:
+                return True
+            if slots == 0:
+                return False
+            key = (uncovered, slots)
+            if start >= infeasible.get(key, count + 1):
+                return False
+            if (suffix_union[start] & uncovered != uncovered or
+                    bin(uncovered).count("1") > slots * suffix_max_pop[start]):
+                infeasible[key] = min(start, infeasible.get(key, count + 1))
+                return False
+
+            for i in range(start, count):
+                if suffix_union[i] & uncovered != uncovered:
+                    break
+                mask = useful[i][1]
+                # In a minimum cover every member adds a skill no other member has
+                if not mask & uncovered:
+                    continue
+                chosen.append(i)
+                if search(i + 1, uncovered & ~mask, slots - 1, chosen):
+                    return True
+                chosen.pop()
+
+            infeasible[key] = min(start, infeasible.get(key, count + 1))
+            return False
+
+        chosen: List[int] = []
+        if search(0, full_mask, size, chosen):
+            return [useful[i][0] for i in chosen]
+        return None
@@ -2,14 +2,27 @@
 HerBid Sui Integration
 This module handles all Sui blockchain interactions including escrow creation,
 smart contract deployment, and transaction management.
+
+The mock escrow state lives in an EscrowStore (the ledger's SQLite database by
+default), standing in for on-chain objects that every API worker process sees
+alike, so an escrow created by one gunicorn worker can be read and released by
+any other. The mock client's transaction log is still kept per process.
 """
 
+import asyncio
 import json
+import threading
 import time
+from collections import deque
+from decimal import Decimal
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 
+from escrow_store import EscrowStore
+from id_generator import new_id
+from sui_transactions import MockPtbExecutor, ProgrammableTransaction, build_transfer_batches
+
 # Note: In a real implementation, you would install the Sui Python SDK
 # pip install pysui
 # For now, we'll create a mock implementation
@@ -46,22 +59,57 @@ class TeamMember:
     allocation_percentage: float
     skills_provided: List[str]
 
+@dataclass
+class EscrowState:
+    """Current state of an escrow contract, as tracked by the connector"""
+    escrow: EscrowDetails
+    team_members: List[TeamMember]
+    released_amount: int = 0
+    releases: Dict[int, TransactionResult] = field(default_factory=dict)  # milestone number -> release
+    
+    @property
+    def milestones_completed(self) -> int:
+        return len(self.releases)
+    
+    @property
+    def remaining_balance(self) -> int:
+        return self.escrow.total_amount - self.released_amount
+    
+    def milestone_amount(self, milestone_number: int) -> int:
+        """Amount released by a milestone; the last one also takes the rounding remainder"""
+        share, remainder = divmod(self.escrow.total_amount, self.escrow.milestone_count)
+        return share + (remainder if milestone_number == self.escrow.milestone_count else 0)
+
 class SuiConnector:
     """
     Handles all interactions with the Sui blockchain for HerBid platform.
     Manages escrow contracts, payments, and smart contract interactions.
+    
+    Escrow state is kept in an EscrowStore keyed by escrow ID, so status
+    lookups and milestone releases are single indexed lookups however many
+    contracts exist, and are shared by every process using the same store.
+    The log of submitted transactions keeps only the most recent
+    MAX_TRANSACTION_HISTORY entries.
     """
     
-    def __init__(self, network: str = "devnet"):
+    # Transactions kept in the mock client's history log
+    MAX_TRANSACTION_HISTORY = 10000
+    
+    def __init__(self, network: str = "devnet", escrow_store: Optional[EscrowStore] = None):
         """
         Initialize Sui client connection.
         
         Args:
             network: Sui network to connect to (mainnet, testnet, devnet)
+            escrow_store: Store holding the mock escrow state (one on the
+                ledger database by default)
         """
         self.network = network
         self.client = None
         self.contract_address = "0x1234567890abcdef"  # Mock contract address
+        self.escrows = escrow_store if escrow_store is not None else EscrowStore()  # escrow ID -> state, shared across processes
+        self.executor = MockPtbExecutor()  # Stands in for signing and submitting PTBs
+        self._lock = threading.Lock()  # Flask worker threads and asyncio.to_thread share the connector
         
         try:
             # In real implementation:
@@ -77,12 +125,25 @@ class SuiConnector:
             print(f"Error initializing Sui connector: {e}")
             self.initialized = False
 
+    def _escrow_state(self, escrow_id: str) -> Optional[EscrowState]:
+        """Load an escrow's current state from the store"""
+        record = self.escrows.get(escrow_id)
+        if record is None:
+            return None
+        releases = {
+            milestone_number: TransactionResult(transaction_id, TransactionStatus.SUCCESS, gas_used)
+            for milestone_number, (transaction_id, gas_used) in record.pop("releases").items()
+        }
+        team_members = [TeamMember(**member) for member in record.pop("team_members")]
+        released_amount = record.pop("released_amount")
+        return EscrowState(EscrowDetails(**record), team_members, released_amount, releases)
+
     def _mock_sui_client(self):
         """Mock Sui client for demonstration"""
         return {
             "network": self.network,
             "connected": True,
-            "mock_transactions": []
+            "mock_transactions": deque(maxlen=self.MAX_TRANSACTION_HISTORY)
         }
 
     def create_escrow_contract(self, 
@@ -127,7 +188,7 @@ class SuiConnector:
             # result = self.client.sign_and_execute_transaction(tx)
             
             # Mock implementation
-            escrow_id = f"escrow_{project_id}_{int(time.time())}"
+            escrow_id = new_id(f"escrow_{project_id}")
             
             escrow_details = EscrowDetails(
                 escrow_id=escrow_id,
@@ -140,11 +201,13 @@ class SuiConnector:
             )
             
             # Store in mock database
-            self.client["mock_transactions"].append({
-                "type": "create_escrow",
-                "escrow": escrow_details,
-                "team_members": team_members
-            })
+            self.escrows.add(asdict(escrow_details), [asdict(member) for member in team_members])
+            with self._lock:
+                self.client["mock_transactions"].append({
+                    "type": "create_escrow",
+                    "escrow": escrow_details,
+                    "team_members": team_members
+                })
             
             print(f"Escrow contract created: {escrow_id}")
             return escrow_details
@@ -160,6 +223,9 @@ class SuiConnector:
         """
         Releases payment for a completed milestone.
         
+        Releasing a milestone that was already released returns the original
+        release rather than paying it out twice.
+        
         Args:
             escrow_id: ID of the escrow contract
             milestone_number: Which milestone to release (1-based)
@@ -185,26 +251,45 @@ class SuiConnector:
             # result = self.client.sign_and_execute_transaction(tx)
             
             # Mock implementation
-            transaction_id = f"tx_milestone_{escrow_id}_{milestone_number}_{int(time.time())}"
-            
-            # Simulate transaction execution
-            success = True  # In real implementation, this would depend on blockchain execution
-            
-            if success:
-                result = TransactionResult(
-                    transaction_id=transaction_id,
-                    status=TransactionStatus.SUCCESS,
-                    gas_used=1000000  # Mock gas usage
-                )
-                print(f"Milestone {milestone_number} payment released for escrow {escrow_id}")
-            else:
-                result = TransactionResult(
+            transaction_id = new_id("tx_milestone")
+            
+            state = self._escrow_state(escrow_id)
+            if state is None:
+                return TransactionResult(transaction_id, TransactionStatus.FAILED, 0,
+                                         f"Escrow not found: {escrow_id}")
+            if not 1 <= milestone_number <= state.escrow.milestone_count:
+                return TransactionResult(
                     transaction_id=transaction_id,
                     status=TransactionStatus.FAILED,
                     gas_used=500000,
                     error_message="Insufficient permissions or invalid milestone"
                 )
-            
+            if milestone_number in state.releases:
+                return state.releases[milestone_number]
+            
+            # Another process may release the same milestone meanwhile; the
+            # store keeps whichever release was recorded first
+            recorded_id, gas_used = self.escrows.record_release(
+                escrow_id, milestone_number, state.milestone_amount(milestone_number),
+                transaction_id, 1000000  # Mock gas usage
+            )
+            result = TransactionResult(
+                transaction_id=recorded_id,
+                status=TransactionStatus.SUCCESS,
+                gas_used=gas_used
+            )
+            if recorded_id != transaction_id:
+                return result
+            with self._lock:
+                self.client["mock_transactions"].append({
+                    "type": "release_milestone",
+                    "escrow_id": escrow_id,
+                    "milestone_number": milestone_number,
+                    "approver": approver_address,
+                    "transaction_id": transaction_id
+                })
+            
+            print(f"Milestone {milestone_number} payment released for escrow {escrow_id}")
             return result
             
         except Exception as e:
@@ -242,15 +327,16 @@ class SuiConnector:
             # result = self.client.sign_and_execute_transaction(tx)
             
             # Mock implementation
-            consortium_id = f"consortium_{consortium_name.lower().replace(' ', '_')}_{int(time.time())}"
+            consortium_id = new_id(f"consortium_{consortium_name.lower().replace(' ', '_')}")
             
-            self.client["mock_transactions"].append({
-                "type": "create_consortium",
-                "consortium_id": consortium_id,
-                "name": consortium_name,
-                "members": founding_members,
-                "governance": governance_rules
-            })
+            with self._lock:
+                self.client["mock_transactions"].append({
+                    "type": "create_consortium",
+                    "consortium_id": consortium_id,
+                    "name": consortium_name,
+                    "members": founding_members,
+                    "governance": governance_rules
+                })
             
             print(f"Consortium contract created: {consortium_id}")
             return consortium_id
@@ -276,21 +362,21 @@ class SuiConnector:
             # In real implementation:
             # result = self.client.sui_getObject(escrow_id)
             
-            # Mock implementation - search for escrow in transactions
-            for tx in self.client["mock_transactions"]:
-                if tx.get("type") == "create_escrow" and tx["escrow"].escrow_id == escrow_id:
-                    escrow = tx["escrow"]
-                    return {
-                        "escrow_id": escrow.escrow_id,
-                        "project_id": escrow.project_id,
-                        "total_amount": escrow.total_amount,
-                        "status": escrow.status,
-                        "milestones_completed": 0,  # Would be calculated from blockchain state
-                        "remaining_balance": escrow.total_amount,
-                        "member_addresses": escrow.member_addresses
-                    }
-            
-            return None
+            # Mock implementation
+            state = self._escrow_state(escrow_id)
+            if state is None:
+                return None
+            escrow = state.escrow
+            return {
+                "escrow_id": escrow.escrow_id,
+                "project_id": escrow.project_id,
+                "total_amount": escrow.total_amount,
+                "status": escrow.status,
+                "milestone_count": escrow.milestone_count,
+                "milestones_completed": state.milestones_completed,
+                "remaining_balance": state.remaining_balance,
+                "member_addresses": escrow.member_addresses
+            }
             
         except Exception as e:
             print(f"Error getting escrow status: {e}")
@@ -326,7 +412,7 @@ class SuiConnector:
             # result = self.client.sign_and_execute_transaction(tx)
             
             # Mock implementation
-            transaction_id = f"tx_transfer_{int(time.time())}"
+            transaction_id = new_id("tx_transfer")
             
             # Simulate successful transfer
             result = TransactionResult(
@@ -422,25 +508,175 @@ class SuiConnector:
         
         return payment_splits
 
-    def batch_transfer(self, transfers: List[Tuple[str, str, int]]) -> List[TransactionResult]:
+    def pay_team_split(self,
+                       from_address: str,
+                       team_members: List[TeamMember],
+                       total_amount: int,
+                       token_type: str = "SUI") -> List[TransactionResult]:
+        """
+        Pays a team its allocation split in one programmable transaction block.
+        
+        Args:
+            from_address: Wallet paying the team
+            team_members: List of team member details
+            total_amount: Total amount to split
+            token_type: Type of token to transfer
+            
+        Returns:
+            List of TransactionResult objects, one per block submitted
+        """
+        splits = self.create_team_payment_split(team_members, total_amount)
+        return self.batch_transfer(
+            [(from_address, address, amount) for address, amount in splits if amount > 0],
+            token_type
+        )
+
+    def batch_transfer(self, 
+                       transfers: List[Tuple[str, str, int]],
+                       token_type: str = "SUI") -> List[TransactionResult]:
         """
-        Executes multiple transfers in a batch transaction.
+        Executes multiple transfers as programmable transaction blocks.
+        
+        Each sender's transfers go into one block (more only when they exceed
+        the protocol's per-block limits), so the batch pays one base gas fee
+        and one round trip per block instead of per transfer. Every block is
+        atomic: if it fails, none of its transfers happen.
         
         Args:
             transfers: List of (from_address, to_address, amount) tuples
+            token_type: Type of token to transfer
             
         Returns:
-            List of TransactionResult objects
+            List of TransactionResult objects, one per block submitted
         """
-        results = []
+        if not self.initialized:
+            return [TransactionResult("", TransactionStatus.FAILED, 0, "Sui connector not initialized")]
         
-        for from_addr, to_addr, amount in transfers:
-            result = self.transfer_tokens(from_addr, to_addr, amount)
-            if result:
-                results.append(result)
+        try:
+            blocks = build_transfer_batches(transfers, token_type)
+        except ValueError as e:
+            return [TransactionResult("", TransactionStatus.FAILED, 0, str(e))]
         
+        results = [self._execute_block(block) for block in blocks]
+        succeeded = sum(result.status == TransactionStatus.SUCCESS for result in results)
+        print(f"Batch transfer: {len(transfers)} transfers in {len(blocks)} PTBs, {succeeded} succeeded")
         return results
 
+    def _execute_block(self, block: ProgrammableTransaction) -> TransactionResult:
+        """Submits one programmable transaction block"""
+        try:
+            # In real implementation:
+            # tx = SuiTransaction(client=self.client, initial_sender=block.sender)
+            # coins = tx.split_coin(coin=tx.gas, amounts=[amount for _, amount in block.transfers])
+            # for (recipient, _), coin in zip(block.transfers, coins):
+            #     tx.transfer_objects(transfers=[coin], recipient=recipient)
+            # result = tx.execute(gas_budget=block.estimate_gas().budget)
+            effects = self.executor.execute(block)
+        except Exception as e:
+            return TransactionResult("", TransactionStatus.FAILED, 0, str(e))
+        
+        return TransactionResult(
+            transaction_id=effects.digest,
+            status=TransactionStatus.SUCCESS if effects.success else TransactionStatus.FAILED,
+            gas_used=effects.gas_used,
+            error_message=effects.error
+        )
+
+class AsyncSuiConnector:
+    """
+    Asyncio adapter exposing SuiConnector to the hybrid payment system.
+    
+    SuiConnector calls block on network I/O, so each one runs in the default
+    thread pool via asyncio.to_thread and the event loop keeps serving other
+    requests meanwhile. The adapter also translates between the payment
+    system's escrow model (USDC amounts, participant IDs, 0-based milestones)
+    and the on-chain one (micro-USDC, team members, 1-based milestones).
+    
+    The payment escrow ID -> on-chain escrow ID mapping is kept in memory,
+    like the payment system's own escrow records, so it serves the single
+    payment API process it was created in.
+    """
+    
+    # USDC uses 6 decimal places on chain
+    USDC_DECIMALS = 6
+    
+    def __init__(self, connector: Optional[SuiConnector] = None):
+        """
+        Args:
+            connector: Synchronous connector to wrap (a devnet one by default)
+        """
+        self.connector = connector or SuiConnector("devnet")
+        self.escrow_ids: Dict[str, str] = {}  # payment escrow ID -> on-chain escrow ID
+    
+    async def create_escrow_contract(self, 
+                                   escrow_id: str,
+                                   total_amount_usdc: Decimal,
+                                   milestones: List[Dict[str, Any]],
+                                   participants: List[str]) -> str:
+        """
+        Lock an escrow's USDC on chain, splitting it evenly between participants.
+        
+        Args:
+            escrow_id: Payment system escrow ID
+            total_amount_usdc: Total escrow amount in USDC
+            milestones: Milestone definitions
+            participants: Participant wallet addresses
+            
+        Returns:
+            On-chain escrow ID
+        """
+        if not participants:
+            raise ValueError("Escrow needs at least one participant")
+        
+        allocation = 100.0 / len(participants)
+        team_members = [
+            TeamMember(participant, participant, allocation, []) for participant in participants
+        ]
+        total_amount = int(Decimal(total_amount_usdc).scaleb(self.USDC_DECIMALS))
+        
+        escrow = await asyncio.to_thread(
+            self.connector.create_escrow_contract,
+            escrow_id, total_amount, team_members, len(milestones)
+        )
+        if escrow is None:
+            raise RuntimeError(f"Sui escrow creation failed for {escrow_id}")
+        
+        self.escrow_ids[escrow_id] = escrow.escrow_id
+        return escrow.escrow_id
+    
+    async def release_milestone_payment(self, 
+                                      escrow_id: str,
+                                      milestone_index: int,
+                                      recipient: str) -> str:
+        """
+        Release a milestone from an on-chain escrow.
+        
+        The contract splits the release between the escrow's members, so a
+        milestone is released once however many participants it pays.
+        
+        Args:
+            escrow_id: Payment system escrow ID
+            milestone_index: Milestone to release (0-based)
+            recipient: Address recorded as approving the release
+            
+        Returns:
+            Sui transaction ID
+        """
+        chain_escrow_id = self.escrow_ids.get(escrow_id, escrow_id)
+        result = await asyncio.to_thread(
+            self.connector.release_milestone_payment,
+            chain_escrow_id, milestone_index + 1, recipient
+        )
+        if result is None or result.status != TransactionStatus.SUCCESS:
+            error = result.error_message if result else "no result"
+            raise RuntimeError(f"Sui milestone release failed for {escrow_id}: {error}")
+        return result.transaction_id
+    
+    async def get_escrow_status(self, escrow_id: str) -> Optional[Dict[str, Any]]:
+        """On-chain status of a payment system escrow"""
+        chain_escrow_id = self.escrow_ids.get(escrow_id, escrow_id)
+        return await asyncio.to_thread(self.connector.get_escrow_status, chain_escrow_id)
+
 # Integration helper functions
 
 def create_project_escrow_from_agi_recommendation(agi_engine, sui_connector, 
@@ -0,0 +1,328 @@
+"""
+GigeBid Sui Programmable Transactions
+Batched token transfers as Sui programmable transaction blocks (PTBs).
+
+A PTB executes a list of commands atomically under one signature and one gas
+payment. A batch of transfers from one sender is therefore built as a single
+SplitCoins command that carves every amount out of the source coin, followed
+by one TransferObjects command per recipient. Batches larger than the
+protocol limits are split across several PTBs, each still atomic. Gas is
+estimated from a mock gas schedule (a live node would dry-run the block).
+MockPtbExecutor applies blocks to in-memory balances all-or-nothing, so the
+atomicity (tests/test_sui_transactions.py) and throughput (python3
+sui_transactions.py) of batching can be checked without a network.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from id_generator import new_id
+
+# Sui protocol limits (ProtocolConfig) that bound a single PTB
+MAX_PTB_COMMANDS = 1024
+MAX_PTB_INPUTS = 2048
+MAX_COMMAND_ARGUMENTS = 512
+
+# SplitCoins takes the source coin plus one argument per amount
+MAX_TRANSFERS_PER_PTB = MAX_COMMAND_ARGUMENTS - 1
+
+# Mock gas schedule, in MIST (1 SUI = 10^9 MIST)
+REFERENCE_GAS_PRICE = 1000
+BASE_COMPUTATION_UNITS = 400  # signature checks, gas smashing, effects
+COMMAND_COMPUTATION_UNITS = 20
+INPUT_COMPUTATION_UNITS = 5
+STORAGE_COST_PER_OBJECT = 50000  # each coin created by SplitCoins
+GAS_BUDGET_MARGIN = 1.2
+
+GAS_COIN = "GasCoin"
+
+
+@dataclass(frozen=True)
+class PtbCommand:
+    """One PTB command; arguments are input indexes or ("result", command, nested) references"""
+    kind: str
+    arguments: Tuple
+
+
+@dataclass(frozen=True)
+class GasEstimate:
+    """Estimated gas cost of a transaction block, in MIST"""
+    computation_cost: int
+    storage_cost: int
+    storage_rebate: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.computation_cost + self.storage_cost - self.storage_rebate
+
+    @property
+    def budget(self) -> int:
+        """Gas budget to submit with, leaving headroom over the estimate"""
+        return int(self.total * GAS_BUDGET_MARGIN)
+
+
+@dataclass
+class ProgrammableTransaction:
+    """A built PTB moving one token type from one sender"""
+    sender: str
+    token_type: str
+    inputs: List[Tuple[str, object]]  # ("pure", value) or ("object", object ID)
+    commands: List[PtbCommand]
+    transfers: List[Tuple[str, int]]  # (recipient, amount) in command order
+
+    @property
+    def total_amount(self) -> int:
+        return sum(amount for _, amount in self.transfers)
+
+    def estimate_gas(self) -> GasEstimate:
+        """Estimate gas from the block's shape under the mock gas schedule"""
+        units = (BASE_COMPUTATION_UNITS
+                 + COMMAND_COMPUTATION_UNITS * len(self.commands)
+                 + INPUT_COMPUTATION_UNITS * len(self.inputs))
+        return GasEstimate(
+            computation_cost=units * REFERENCE_GAS_PRICE,
+            storage_cost=STORAGE_COST_PER_OBJECT * len(self.transfers)
+        )
+
+    def validate(self):
+        """
+        Check the block against protocol limits.
+
+        Raises:
+            ValueError: If a limit is exceeded
+        """
+        if len(self.commands) > MAX_PTB_COMMANDS:
+            raise ValueError(f"PTB has {len(self.commands)} commands (limit {MAX_PTB_COMMANDS})")
+        if len(self.inputs) > MAX_PTB_INPUTS:
+            raise ValueError(f"PTB has {len(self.inputs)} inputs (limit {MAX_PTB_INPUTS})")
+        for command in self.commands:
+            if len(command.arguments) > MAX_COMMAND_ARGUMENTS:
+                raise ValueError(f"{command.kind} has {len(command.arguments)} arguments "
+                                 f"(limit {MAX_COMMAND_ARGUMENTS})")
+
+
+class TransferBatchBuilder:
+    """
+    Builds PTBs for a batch of transfers from one sender.
+
+    SUI is split from the gas coin; other tokens from `coin_object_id`.
+    Amounts and recipient addresses are deduplicated into shared pure inputs.
+    """
+
+    def __init__(self, sender: str, token_type: str = "SUI", coin_object_id: Optional[str] = None,
+                 max_transfers_per_ptb: int = MAX_TRANSFERS_PER_PTB):
+        """
+        Args:
+            sender: Address signing and paying for the blocks
+            token_type: Token being transferred
+            coin_object_id: Coin to split non-SUI amounts from
+            max_transfers_per_ptb: Transfers per block (capped by protocol limits)
+        """
+        if not 1 <= max_transfers_per_ptb <= MAX_TRANSFERS_PER_PTB:
+            raise ValueError(f"max_transfers_per_ptb must be between 1 and {MAX_TRANSFERS_PER_PTB}")
+        self.sender = sender
+        self.token_type = token_type
+        self.coin_object_id = coin_object_id or f"coin::{token_type}::{sender}"
+        self.max_transfers_per_ptb = max_transfers_per_ptb
+        self._transfers: List[Tuple[str, int]] = []
+
+    def transfer(self, recipient: str, amount: int) -> "TransferBatchBuilder":
+        """Queue a transfer"""
+        if amount <= 0:
+            raise ValueError(f"Transfer amount must be positive, got {amount}")
+        self._transfers.append((recipient, int(amount)))
+        return self
+
+    def build(self) -> List[ProgrammableTransaction]:
+        """Build the queued transfers into as few PTBs as the limits allow"""
+        return [
+            self._build_block(self._transfers[start:start + self.max_transfers_per_ptb])
+            for start in range(0, len(self._transfers), self.max_transfers_per_ptb)
+        ]
+
+    def _build_block(self, transfers: List[Tuple[str, int]]) -> ProgrammableTransaction:
+        """One PTB: SplitCoins for every amount, then TransferObjects per recipient"""
+        inputs: List[Tuple[str, object]] = []
+        pure_indexes: Dict[object, int] = {}
+
+        def pure(value) -> int:
+            if value not in pure_indexes:
+                pure_indexes[value] = len(inputs)
+                inputs.append(("pure", value))
+            return pure_indexes[value]
+
+        if self.token_type == "SUI":
+            source = GAS_COIN
+        else:
+            source = len(inputs)
+            inputs.append(("object", self.coin_object_id))
+
+        split = PtbCommand("SplitCoins", (source,) + tuple(pure(amount) for _, amount in transfers))
+
+        # Coins for the same recipient go out in one TransferObjects command
+        coins_by_recipient: "OrderedDict[str, List[Tuple]]" = OrderedDict()
+        for nested, (recipient, _) in enumerate(transfers):
+            coins_by_recipient.setdefault(recipient, []).append(("result", 0, nested))
+        commands = [split] + [
+            PtbCommand("TransferObjects", tuple(coins) + (pure(recipient),))
+            for recipient, coins in coins_by_recipient.items()
+        ]
+
+        block = ProgrammableTransaction(self.sender, self.token_type, inputs, commands, list(transfers))
+        block.validate()
+        return block
+
+
+@dataclass
+class TransactionEffects:
+    """What a node reports after executing a transaction block"""
+    digest: str
+    success: bool
+    gas_used: int
+    error: Optional[str] = None
+
+
+@dataclass
+class _ExecutorStats:
+    transactions: int = 0
+    failed: int = 0
+    transfers: int = 0
+    commands: int = 0
+    gas_used: int = 0
+    busy_seconds: float = 0.0
+
+
+class MockPtbExecutor:
+    """
+    Executes PTBs against in-memory balances.
+
+    Each block is applied atomically: either every transfer in it lands or
+    none does (a failed block still pays its gas, as on chain). Without
+    `balances` funds are not tracked and every valid block succeeds.
+    """
+
+    def __init__(self, balances: Optional[Dict[Tuple[str, str], int]] = None, latency: float = 0.0):
+        """
+        Args:
+            balances: (address, token type) -> balance in smallest units; None disables balance checks
+            latency: Seconds each submission takes, standing in for the network round trip
+        """
+        self.balances = balances
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._stats = _ExecutorStats()
+
+    def balance(self, address: str, token_type: str = "SUI") -> int:
+        """Tracked balance of an address"""
+        return (self.balances or {}).get((address, token_type), 0)
+
+    def execute(self, block: ProgrammableTransaction) -> TransactionEffects:
+        """Validate, charge gas for and apply one block"""
+        started = time.perf_counter()
+        block.validate()
+        if self.latency:
+            time.sleep(self.latency)
+
+        gas = block.estimate_gas().total
+        digest = new_id("tx_ptb")
+        with self._lock:
+            error = self._apply(block, gas)
+            stats = self._stats
+            stats.transactions += 1
+            stats.commands += len(block.commands)
+            stats.gas_used += gas
+            if error:
+                stats.failed += 1
+            else:
+                stats.transfers += len(block.transfers)
+            stats.busy_seconds += time.perf_counter() - started
+        return TransactionEffects(digest, error is None, gas, error)
+
+    def _apply(self, block: ProgrammableTransaction, gas: int) -> Optional[str]:
+        """Apply a block's balance changes all-or-nothing, returning an error if it aborts"""
+        if self.balances is None:
+            return None
+        balances = self.balances
+        gas_key = (block.sender, "SUI")
+        if balances.get(gas_key, 0) < gas:
+            return f"InsufficientGas: {block.sender} cannot pay {gas} MIST"
+
+        # Stage every change first so an abort leaves balances untouched
+        changes: Dict[Tuple[str, str], int] = {gas_key: -gas}
+        source_key = (block.sender, block.token_type)
+        changes[source_key] = changes.get(source_key, 0) - block.total_amount
+        if balances.get(source_key, 0) + changes[source_key] < 0:
+            balances[gas_key] -= gas
+            return (f"InsufficientCoinBalance: {block.sender} cannot send "
+                    f"{block.total_amount} {block.token_type}")
+        for recipient, amount in block.transfers:
+            key = (recipient, block.token_type)
+            changes[key] = changes.get(key, 0) + amount
+        for key, delta in changes.items():
+            balances[key] = balances.get(key, 0) + delta
+        return None
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Executor counters and throughput"""
+        with self._lock:
+            stats = self._stats
+            return {
+                "transactions": stats.transactions,
+                "failed_transactions": stats.failed,
+                "transfers": stats.transfers,
+                "commands": stats.commands,
+                "gas_used": stats.gas_used,
+                "transfers_per_second": stats.transfers / stats.busy_seconds if stats.busy_seconds else 0.0
+            }
+
+
+def build_transfer_batches(transfers: Sequence[Tuple[str, str, int]], token_type: str = "SUI",
+                           max_transfers_per_ptb: int = MAX_TRANSFERS_PER_PTB) -> List[ProgrammableTransaction]:
+    """
+    Group (from_address, to_address, amount) transfers by sender and build their PTBs.
+
+    A PTB has a single sender, so each sender's transfers get their own blocks;
+    senders keep the order in which they first appear.
+    """
+    builders: "OrderedDict[str, TransferBatchBuilder]" = OrderedDict()
+    for from_address, to_address, amount in transfers:
+        if from_address not in builders:
+            builders[from_address] = TransferBatchBuilder(
+                from_address, token_type, max_transfers_per_ptb=max_transfers_per_ptb
+            )
+        builders[from_address].transfer(to_address, amount)
+    return [block for builder in builders.values() for block in builder.build()]
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.002
+    transfers = [("0xtreasury", f"0xmember{index % 300}", 1000 + index) for index in range(count)]
+
+    # One PTB per transfer, as the old loop over transfer_tokens submitted them
+    executor = MockPtbExecutor(latency=latency)
+    started = time.perf_counter()
+    for transfer in transfers:
+        for block in build_transfer_batches([transfer]):
+            executor.execute(block)
+    one_by_one = time.perf_counter() - started
+    single_gas = executor.get_metrics()["gas_used"]
+
+    executor = MockPtbExecutor(latency=latency)
+    started = time.perf_counter()
+    blocks = build_transfer_batches(transfers)
+    for block in blocks:
+        executor.execute(block)
+    batched = time.perf_counter() - started
+    batched_gas = executor.get_metrics()["gas_used"]
+
+    print(f"{count} transfers, {latency * 1000:.1f}ms per submission")
+    print(f"  one PTB each: {one_by_one:.2f}s ({count / one_by_one:,.0f}/s), gas {single_gas:,} MIST")
+    print(f"  batched:      {batched:.3f}s ({count / batched:,.0f}/s) in {len(blocks)} PTBs, "
+          f"gas {batched_gas:,} MIST")
+
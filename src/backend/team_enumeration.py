@@ -0,0 +1,489 @@
+"""
+HerBid Team Enumeration
+Ranked team formation for the AGI engine. Where SkillCoverageSolver returns one
+minimum-size team, TeamEnumerator returns the K best teams under an objective
+that weighs pairwise compatibility, reputation, team size and each member's
+share of the contract budget, plus the Pareto front of team size vs. score.
+"""
+
+import heapq
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from skill_coverage import SearchBudget, SearchTimeout, SkillCoverageSolver
+
+
+@dataclass(frozen=True)
+class TeamObjective:
+    """
+    Weights of the team objective.
+
+    score = compatibility_weight * mean pairwise compatibility
+          + reputation_weight * mean reputation
+          + budget_weight * budget term
+          - size_penalty * (members - 1)
+
+    The budget term is 100 once each member's share of the contract budget
+    reaches member_budget_target and falls linearly below it; contracts
+    without a budget get the full term.
+    """
+    compatibility_weight: float = 0.5
+    reputation_weight: float = 0.3
+    budget_weight: float = 0.2
+    size_penalty: float = 5.0
+    member_budget_target: float = 100000.0
+
+    def score(self, compatibility: float, average_reputation: float, size: int,
+              budget: Optional[float]) -> float:
+        """Objective value of a team (non-decreasing in compatibility and reputation)"""
+        if budget is None:
+            budget_term = 100.0
+        else:
+            budget_term = 100.0 * min(1.0, budget / size / self.member_budget_target)
+        return (self.compatibility_weight * compatibility
+                + self.reputation_weight * average_reputation
+                + self.budget_weight * budget_term
+                - self.size_penalty * (size - 1))
+
+
+@dataclass
+class TeamCandidate:
+    """A business that may join a team"""
+    name: str
+    skills: Sequence[str]
+    location: Any
+    industry: Any
+    reputation: float
+
+
+@dataclass
+class ScoredTeam:
+    """Data class for one enumerated team"""
+    members: List[str]
+    score: float
+    compatibility: float
+    average_reputation: float
+
+
+@dataclass
+class EnumerationResult:
+    """Data class for team enumeration results"""
+    teams: List[ScoredTeam]  # best first
+    pareto_front: List[ScoredTeam]  # by size; each scores higher than every smaller team
+    exact: bool  # False when the time budget ran out
+    nodes_explored: int
+
+
+class TeamEnumerator:
+    """
+    Enumerates the best teams covering a contract's required skills.
+
+    Teams are irredundant covers: every member provides a required skill no
+    other member does, so a team has at most one member per required skill.
+    The search is a branch-and-bound over the uncovered skill with the fewest
+    providers, made exact and fast by three prunings:
+      1. Candidates: the objective sees a business only through its location,
+         industry and reputation, and a team holds at most one business per
+         required-skill mask. So within each (mask, location, industry) group
+         only the k most reputable businesses can appear in the k best teams.
+      2. Bounds: a partial team is dropped once no completion of any reachable
+         size could enter the top k or improve the Pareto front.
+      3. Redundancy: a branch stops as soon as a member becomes redundant.
+
+    If the time budget runs out, the best teams found so far are returned
+    with ``exact=False``.
+    """
+
+    def __init__(self, time_budget: float = 1.0):
+        """
+        Initialize the enumerator.
+
+        Args:
+            time_budget: Maximum seconds to spend per enumeration
+        """
+        self.time_budget = time_budget
+
+    def enumerate(self,
+                  required_skills: Sequence[str],
+                  candidates: Sequence[TeamCandidate],
+                  pair_score: Callable[[TeamCandidate, TeamCandidate], float],
+                  k: int = 10,
+                  max_size: Optional[int] = None,
+                  budget: Optional[float] = None,
+                  objective: TeamObjective = TeamObjective(),
+                  max_pair_score: float = 100.0,
+                  single_member_compatibility: float = 50.0) -> EnumerationResult:
+        """
+        Find the k best teams and the Pareto front of size vs. score.
+
+        Args:
+            required_skills: Skills the contract requires
+            candidates: Businesses to choose from; earlier ones win ties
+            pair_score: Compatibility of two candidates
+            k: Number of teams to return
+            max_size: Largest team considered (default: one member per required skill)
+            budget: Contract budget, if known
+            objective: Objective weights
+            max_pair_score: Upper bound on pair_score, used for pruning
+            single_member_compatibility: Compatibility of a one-member team
+
+        Returns:
+            EnumerationResult with no teams if no cover exists
+
+        Raises:
+            ValueError: If k is not positive
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        search_budget = SearchBudget(self.time_budget)
+
+        skill_bits = SkillCoverageSolver.encode_skills(required_skills)
+        full_mask = (1 << len(skill_bits)) - 1
+
+        if full_mask == 0:
+            # Nothing to cover: every single candidate is a complete team
+            scored = [
+                (objective.score(single_member_compatibility, candidate.reputation, 1, budget), -ordinal, candidate)
+                for ordinal, candidate in enumerate(candidates)
+            ]
+            teams = [
+                ScoredTeam([candidate.name], score, single_member_compatibility, candidate.reputation)
+                for score, _, candidate in heapq.nlargest(k, scored, key=lambda entry: entry[:2])
+            ]
+            return EnumerationResult(teams=teams, pareto_front=teams[:1], exact=True, nodes_explored=0)
+
+        # Encode candidates, keeping the k most reputable of each interchangeable group
+        groups: Dict[Tuple[int, Any, Any], List[Tuple[float, int]]] = {}
+        masks: List[int] = []
+        union = 0
+        for ordinal, candidate in enumerate(candidates):
+            mask = 0
+            for skill in candidate.skills:
+                mask |= skill_bits.get(skill, 0)
+            masks.append(mask)
+            if mask:
+                union |= mask
+                group = groups.setdefault((mask, candidate.location, candidate.industry), [])
+                entry = (candidate.reputation, -ordinal)
+                if len(group) < k:
+                    heapq.heappush(group, entry)
+                elif entry > group[0]:
+                    heapq.heapreplace(group, entry)
+
+        if union != full_mask:
+            return EnumerationResult(teams=[], pareto_front=[], exact=True, nodes_explored=0)
+
+        # Members of each group, most reputable first; groups ordered by their first member
+        group_members = sorted(
+            [-negative_ordinal for _, negative_ordinal in sorted(group, key=lambda entry: (-entry[0], -entry[1]))]
+            for group in groups.values()
+        )
+
+        search = _BranchAndBound(search_budget, candidates, group_members, [masks[members[0]] for members in group_members],
+                                 full_mask, pair_score, k, max_size, budget, objective, max_pair_score,
+                                 single_member_compatibility)
+        exact = True
+        try:
+            search.run()
+        except SearchTimeout:
+            exact = False
+
+        return EnumerationResult(
+            teams=search.ranked_teams(),
+            pareto_front=search.pareto_front(),
+            exact=exact,
+            nodes_explored=search_budget.nodes
+        )
+
+
+class _BranchAndBound:
+    """
+    State of one enumeration.
+
+    The search runs over groups, each represented by its most reputable
+    member. A cover of groups is scored with those representatives, which is
+    the best any choice of members can do; its other member choices are then
+    expanded best first and stop as soon as one falls out of the top k.
+    """
+
+    def __init__(self, search_budget: SearchBudget, candidates: Sequence[TeamCandidate],
+                 group_members: List[List[int]], masks: List[int], full_mask: int,
+                 pair_score: Callable[[TeamCandidate, TeamCandidate], float],
+                 k: int, max_size: Optional[int], budget: Optional[float],
+                 objective: TeamObjective, max_pair_score: float,
+                 single_member_compatibility: float):
+        self.search_budget = search_budget
+        self.candidates = candidates
+        self.group_members = group_members
+        self.masks = masks
+        self.full_mask = full_mask
+        self.pair_score = pair_score
+        self.k = k
+        skill_count = bin(full_mask).count("1")
+        self.max_size = min(max_size or skill_count, skill_count, len(group_members))
+        self.budget = budget
+        self.objective = objective
+        self.max_pair_score = max_pair_score
+        self.single_member_compatibility = single_member_compatibility
+
+        self.reputations = [candidates[members[0]].reputation for members in group_members]
+        self.max_pop = max(bin(mask).count("1") for mask in masks)
+        self.bits_of = [[bit for bit in range(full_mask.bit_length()) if mask >> bit & 1] for mask in masks]
+        # Providers of each skill, most reputable first: sibling bounds then only decrease
+        order = sorted(range(len(group_members)), key=lambda group: (-self.reputations[group], group))
+        self.covering: List[List[int]] = [[] for _ in range(full_mask.bit_length())]
+        for group in order:
+            for bit in self.bits_of[group]:
+                self.covering[bit].append(group)
+        # best_reputation_sums[n]: largest total reputation n more members can add
+        top_reputations = sorted(self.reputations, reverse=True)[:self.max_size]
+        self.best_reputation_sums = [0.0]
+        for reputation in top_reputations:
+            self.best_reputation_sums.append(self.best_reputation_sums[-1] + reputation)
+
+        self._pair_scores: Dict[Tuple[int, int], float] = {}
+        # Min-heap of the k best (score, tiebreak, members, compatibility, average reputation),
+        # worst on top; members are candidate ordinals and the tiebreak favours earlier ones
+        self._top: List[Tuple[float, Tuple[int, ...], Tuple[int, ...], float, float]] = []
+        self._best_by_size: Dict[int, Tuple[float, Tuple[int, ...], Tuple[int, ...], float, float]] = {}
+
+    def _pair(self, a: int, b: int) -> float:
+        """Memoized pair score of two candidate ordinals"""
+        key = (a, b) if a < b else (b, a)
+        score = self._pair_scores.get(key)
+        if score is None:
+            score = self._pair_scores[key] = self.pair_score(self.candidates[a], self.candidates[b])
+        return score
+
+    def _threshold(self) -> Optional[float]:
+        """Score a team must reach to enter the top k, None while it has room"""
+        return self._top[0][0] if len(self._top) >= self.k else None
+
+    def _worth_exploring(self, chosen: int, smallest: int, pair_sum: float, reputation_sum: float,
+                         next_reputation: Optional[float] = None) -> bool:
+        """
+        Whether some completion of a partial team could enter the top k or the Pareto front.
+
+        Args:
+            chosen: Members so far
+            smallest: Fewest members a completed team can have
+            pair_sum: Compatibility summed over the pairs of chosen members
+            reputation_sum: Reputation summed over the chosen members
+            next_reputation: Reputation of the next member, if already known
+        """
+        threshold = self._threshold()
+        front = None
+        for size in range(1, smallest):
+            best = self._best_by_size.get(size)
+            if best is not None and (front is None or best[0] > front):
+                front = best[0]
+
+        known_pairs = chosen * (chosen - 1) / 2
+        for size in range(smallest, self.max_size + 1):
+            best = self._best_by_size.get(size)
+            if best is not None and (front is None or best[0] > front):
+                front = best[0]
+            if size == 1:
+                compatibility = self.single_member_compatibility
+            else:
+                pairs = size * (size - 1) / 2
+                compatibility = (pair_sum + (pairs - known_pairs) * self.max_pair_score) / pairs
+            if next_reputation is None:
+                reputation_bound = reputation_sum + self.best_reputation_sums[size - chosen]
+            else:
+                reputation_bound = reputation_sum + next_reputation + self.best_reputation_sums[size - chosen - 1]
+            bound = self.objective.score(compatibility, reputation_bound / size, size, self.budget)
+            if threshold is None or bound >= threshold or front is None or bound > front:
+                return True
+        return False
+
+    def run(self):
+        chosen: List[int] = []  # groups
+        forbidden = [False] * len(self.group_members)
+        forbidden_providers = [0] * len(self.covering)
+        masks = self.masks
+        reputations = self.reputations
+        representatives = [members[0] for members in self.group_members]
+        search_budget = self.search_budget
+
+        def search(uncovered: int, pair_sum: float, reputation_sum: float):
+            search_budget.tick()
+            if not uncovered:
+                self._record(chosen, pair_sum, reputation_sum)
+                return
+            count = len(chosen)
+            if count >= self.max_size:
+                return
+            smallest = count + -(-bin(uncovered).count("1") // self.max_pop)
+            if count and not self._worth_exploring(count, smallest, pair_sum, reputation_sum):
+                return
+
+            # Branch on the uncovered skill with the fewest remaining providers
+            pivot = min(
+                (bit for bit in range(len(self.covering)) if uncovered >> bit & 1),
+                key=lambda bit: len(self.covering[bit]) - forbidden_providers[bit]
+            )
+
+            # Each team is generated once: a branch excludes the providers tried before it
+            excluded = []
+            for group in self.covering[pivot]:
+                if forbidden[group]:
+                    continue
+                # Providers come in falling reputation, so once one cannot pay off none after it can
+                if not self._worth_exploring(count, max(smallest, count + 1), pair_sum, reputation_sum,
+                                             reputations[group]):
+                    break
+                if not self._redundant_after(chosen, group):
+                    member = representatives[group]
+                    added_pairs = sum(self._pair(member, representatives[other]) for other in chosen)
+                    chosen.append(group)
+                    search(uncovered & ~masks[group], pair_sum + added_pairs, reputation_sum + reputations[group])
+                    chosen.pop()
+                forbidden[group] = True
+                excluded.append(group)
+                for bit in self.bits_of[group]:
+                    forbidden_providers[bit] += 1
+            for group in excluded:
+                forbidden[group] = False
+                for bit in self.bits_of[group]:
+                    forbidden_providers[bit] -= 1
+
+        search(self.full_mask, 0.0, 0.0)
+
+    def _redundant_after(self, chosen: List[int], new: int) -> bool:
+        """Whether adding new leaves some current member without a skill of its own"""
+        masks = self.masks
+        new_mask = masks[new]
+        for position, group in enumerate(chosen):
+            others = new_mask
+            for other in chosen[:position] + chosen[position + 1:]:
+                others |= masks[other]
+            if masks[group] & ~others == 0:
+                return True
+        return False
+
+    def _entry(self, members: Sequence[int], pair_sum: float, reputation_sum: float):
+        """Heap entry of a complete team of candidate ordinals"""
+        size = len(members)
+        if size == 1:
+            compatibility = self.single_member_compatibility
+        else:
+            compatibility = pair_sum / (size * (size - 1) / 2)
+        average_reputation = reputation_sum / size
+        score = self.objective.score(compatibility, average_reputation, size, self.budget)
+        ordered = tuple(sorted(members))
+        return (score, tuple(-ordinal for ordinal in ordered), ordered, compatibility, average_reputation)
+
+    def _offer(self, entry) -> bool:
+        """Offer a team to the top k; False if it did not make it"""
+        if len(self._top) < self.k:
+            heapq.heappush(self._top, entry)
+            return True
+        if entry[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, entry)
+            return True
+        return False
+
+    def _record(self, chosen: List[int], pair_sum: float, reputation_sum: float):
+        """Offer a cover of groups and, best first, its other member choices"""
+        groups = list(chosen)
+        size = len(groups)
+        candidates = self.candidates
+        group_members = self.group_members
+
+        def team(ranks):
+            return [group_members[group][rank] for group, rank in zip(groups, ranks)]
+
+        best = self._entry(team([0] * size), pair_sum, reputation_sum)
+        previous = self._best_by_size.get(size)
+        if previous is None or best[:2] > previous[:2]:
+            self._best_by_size[size] = best
+
+        # Scores only fall as any member is swapped for a less reputable one of its group,
+        # so the expansion stops at the first choice scoring below the top k. A choice's
+        # successors bump one rank at or after the last bumped position, so each is made once.
+        frontier = [(-best[0], best[2], (0,) * size, 0, best)]
+        while frontier:
+            _, _, ranks, last, entry = heapq.heappop(frontier)
+            if not self._offer(entry):
+                if entry[0] < self._top[0][0]:
+                    break
+                continue
+            for position in range(last, size):
+                rank = ranks[position] + 1
+                if rank >= len(group_members[groups[position]]):
+                    continue
+                bumped = ranks[:position] + (rank,) + ranks[position + 1:]
+                members = team(bumped)
+                bumped_pairs = sum(self._pair(members[i], members[j])
+                                   for i in range(size) for j in range(i + 1, size))
+                bumped_reputation = sum(candidates[member].reputation for member in members)
+                bumped_entry = self._entry(members, bumped_pairs, bumped_reputation)
+                threshold = self._threshold()
+                if threshold is None or bumped_entry[0] >= threshold:
+                    heapq.heappush(frontier, (-bumped_entry[0], bumped_entry[2], bumped, position, bumped_entry))
+
+    def _to_team(self, entry) -> ScoredTeam:
+        score, _, members, compatibility, average_reputation = entry
+        return ScoredTeam(
+            members=[self.candidates[ordinal].name for ordinal in members],
+            score=score,
+            compatibility=compatibility,
+            average_reputation=average_reputation
+        )
+
+    def ranked_teams(self) -> List[ScoredTeam]:
+        return [self._to_team(entry) for entry in sorted(self._top, key=lambda entry: entry[:2], reverse=True)]
+
+    def pareto_front(self) -> List[ScoredTeam]:
+        front = []
+        best_score = None
+        for size in sorted(self._best_by_size):
+            entry = self._best_by_size[size]
+            if best_score is None or entry[0] > best_score:
+                front.append(self._to_team(entry))
+                best_score = entry[0]
+        return front
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(11)
+    skill_pool = [f"Skill {i}" for i in range(60)]
+    towns = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika"]
+    industries = ["Technology", "Marketing", "Design", "Finance", "Logistics", "Agriculture"]
+    complementary = {("Technology", "Marketing"), ("Design", "Technology"), ("Finance", "Technology")}
+
+    def pair_score(a: TeamCandidate, b: TeamCandidate) -> float:
+        score = 50.0
+        if a.location == b.location:
+            score += 15.0
+        if (a.industry, b.industry) in complementary or (b.industry, a.industry) in complementary:
+            score += 10.0
+        average_reputation = (a.reputation + b.reputation) / 2
+        score += 15.0 if average_reputation >= 85 else 10.0 if average_reputation >= 75 else 0.0
+        return min(score, 100.0)
+
+    def make_candidates(n):
+        return [
+            TeamCandidate(f"Business {i}", rng.sample(skill_pool, rng.randint(1, 4)),
+                          rng.choice(towns), rng.choice(industries), rng.randint(50, 100))
+            for i in range(n)
+        ]
+
+    # Exactness against brute force is checked in tests/test_team_enumeration.py
+    candidates = make_candidates(count)
+    required = rng.sample(skill_pool, 5)
+    for k in (1, 10, 50):
+        started = time.perf_counter()
+        result = TeamEnumerator(time_budget=5.0).enumerate(required, candidates, pair_score, k=k,
+                                                           budget=800000, max_pair_score=90.0)
+        elapsed = time.perf_counter() - started
+        print(f"{count} businesses, {len(required)} skills, k={k}: {elapsed * 1000:.0f}ms, "
+              f"{result.nodes_explored} nodes, exact={result.exact}, "
+              f"best {result.teams[0].score:.1f} ({len(result.teams[0].members)} members), "
+              f"front sizes {[len(team.members) for team in result.pareto_front]}")
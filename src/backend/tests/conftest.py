@@ -0,0 +1,10 @@
+"""
+Pytest configuration for the backend tests.
+The backend modules import each other as top-level modules (they run from
+src/backend), so that directory goes on sys.path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,47 @@
+"""
+Tests for request validation in the Flask API.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from api import GigeBidBackendAPI
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("GIGEBID_LEDGER_PATH", str(tmp_path / "ledger.db"))
+    return GigeBidBackendAPI().app.test_client()
+
+
+@pytest.mark.parametrize("business_data, field", [
+    ({"industry": "Design", "reputation": 80}, "location"),
+    ({"location": "Nairobi", "reputation": 80}, "industry"),
+    ({"location": "Nairobi", "industry": "Design"}, "reputation"),
+    ({"location": "Nairobi", "industry": "Design", "reputation": "high"}, "reputation"),
+    ({"location": "Nairobi", "industry": "Design", "reputation": 80, "skills": "Logo Design"}, "skills"),
+    (["Nairobi"], "business_data")
+])
+def test_invalid_business_is_rejected_with_400(client, business_data, field):
+    response = client.post("/api/businesses", json={"business_name": "Studio", "business_data": business_data})
+
+    assert response.status_code == 400
+    assert field in response.get_json()["error"]
+    assert client.get("/api/businesses/Studio").status_code == 404
+
+
+def test_valid_business_is_added(client):
+    response = client.post("/api/businesses", json={"business_name": "Studio", "business_data": {
+        "location": "Nairobi", "industry": "Design", "reputation": 80, "skills": ["Logo Design"]
+    }})
+    assert response.status_code == 200
+
+
+def test_payment_api_does_not_import_the_flask_app():
+    probe = "import sys, payment_api; print(sorted({'api', 'flask', 'metta_integration'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output.strip().splitlines()[-1] == "[]"
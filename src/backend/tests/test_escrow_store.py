@@ -0,0 +1,82 @@
+"""
+Tests for escrow state shared between SuiConnector instances (one per worker process).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from escrow_store import EscrowStore
+from sui_api import SuiConnector, TeamMember, TransactionStatus
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two connectors on separate connections to one database, as in two gunicorn workers"""
+    path = str(tmp_path / "ledger.db")
+    return SuiConnector("devnet", EscrowStore(path)), SuiConnector("devnet", EscrowStore(path))
+
+
+def create_escrow(connector, milestone_count=3):
+    team_members = [
+        TeamMember("Sarah's Marketing Agency", "0x1234", 40.0, ["Digital Marketing"]),
+        TeamMember("Jane's Dev House", "0x5678", 60.0, ["Web Development"])
+    ]
+    return connector.create_escrow_contract("tender_1", 1000, team_members, milestone_count)
+
+
+def test_escrow_created_by_one_worker_is_released_by_another(workers):
+    first, second = workers
+    escrow = create_escrow(first)
+
+    status = second.get_escrow_status(escrow.escrow_id)
+    assert status["member_addresses"] == ["0x1234", "0x5678"]
+    assert status["remaining_balance"] == 1000
+
+    for milestone_number in (1, 2, 3):
+        result = second.release_milestone_payment(escrow.escrow_id, milestone_number, "0xclient")
+        assert result.status == TransactionStatus.SUCCESS
+
+    status = first.get_escrow_status(escrow.escrow_id)
+    assert status["milestones_completed"] == 3
+    assert status["remaining_balance"] == 0
+    assert status["status"] == "completed"
+
+
+def test_milestone_released_once_across_workers(workers):
+    first, second = workers
+    escrow = create_escrow(first)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda connector: connector.release_milestone_payment(escrow.escrow_id, 3, "0xclient"),
+            [first, second] * 8
+        ))
+
+    assert len({result.transaction_id for result in results}) == 1
+    status = second.get_escrow_status(escrow.escrow_id)
+    assert status["milestones_completed"] == 1
+    # The last milestone takes the rounding remainder: 333 + 1
+    assert status["remaining_balance"] == 1000 - 334
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_releases_through_its_own_connection(tmp_path):
+    store = EscrowStore(str(tmp_path / "ledger.db"))
+    connector = SuiConnector("devnet", store)
+    escrow = create_escrow(connector)
+    inherited = store._connection
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            result = connector.release_milestone_payment(escrow.escrow_id, 1, "0x1234")
+            os._exit(0 if store._connection is not inherited
+                     and result.status == TransactionStatus.SUCCESS else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert 1 in store.get(escrow.escrow_id)["releases"]
@@ -0,0 +1,98 @@
+"""
+Property tests: fixed-point conversion matches ExchangeRateService's Decimal arithmetic.
+"""
+
+import random
+from decimal import ROUND_HALF_UP, Decimal, localcontext
+
+import pytest
+
+import fixed_point
+from fixed_point import (KES_CENTS_PER_KES, MICRO_USDC_PER_USDC, FixedPointConverter,
+                         from_minor_units, to_minor_units)
+
+np = fixed_point.np
+
+
+def reference_kes_to_usdc(kes_cents, rate):
+    """ExchangeRateService.kes_to_usdc, in minor units"""
+    with localcontext() as context:
+        context.prec = 60
+        return to_minor_units(
+            ((kes * rate).quantize(Decimal('0.000001'), rounding=ROUND_HALF_UP)
+             for kes in from_minor_units(kes_cents, KES_CENTS_PER_KES)),
+            MICRO_USDC_PER_USDC
+        )
+
+
+def reference_usdc_to_kes(micro_usdc, rate):
+    """ExchangeRateService.usdc_to_kes, in minor units"""
+    with localcontext() as context:
+        context.prec = 60
+        return to_minor_units(
+            ((usdc / rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+             for usdc in from_minor_units(micro_usdc, MICRO_USDC_PER_USDC)),
+            KES_CENTS_PER_KES
+        )
+
+
+def random_rate(rng):
+    """A rate quantized like ExchangeRateService rates"""
+    usd_to_kes = Decimal(rng.randint(50_00, 500_00)) / 100
+    return (Decimal("1.00") / usd_to_kes).quantize(Decimal('0.000001'), rounding=ROUND_HALF_UP)
+
+
+def random_amounts(rng, count, limit):
+    """Mix of small, large, negative and half-way-prone amounts"""
+    return [rng.choice((rng.randint(0, 1000), rng.randint(0, limit), -rng.randint(0, limit),
+                        rng.randint(0, 10) * 50))
+            for _ in range(count)]
+
+
+# The last limit forces the big-int fallback
+@pytest.mark.parametrize("limit", [10 ** 6, 10 ** 12, 10 ** 17])
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_decimal_reference(seed, limit):
+    rng = random.Random(seed * 1000 + len(str(limit)))
+    rate = random_rate(rng)
+    converter = FixedPointConverter(rate)
+    kes_cents = random_amounts(rng, 200, limit)
+    micro_usdc = random_amounts(rng, 200, limit)
+
+    expected_usdc = reference_kes_to_usdc(kes_cents, rate)
+    expected_kes = reference_usdc_to_kes(micro_usdc, rate)
+    assert converter.kes_cents_to_micro_usdc(kes_cents) == expected_usdc
+    assert converter.micro_usdc_to_kes_cents(micro_usdc) == expected_kes
+    if np is not None:
+        assert converter.kes_cents_to_micro_usdc(np.array(kes_cents)).tolist() == expected_usdc
+        assert converter.micro_usdc_to_kes_cents(np.array(micro_usdc)).tolist() == expected_kes
+
+
+def test_pure_python_path_matches_reference(monkeypatch):
+    monkeypatch.setattr(fixed_point, "np", None)
+    rng = random.Random(7)
+    for _ in range(20):
+        rate = random_rate(rng)
+        converter = FixedPointConverter(rate)
+        amounts = random_amounts(rng, 200, rng.choice((10 ** 6, 10 ** 17)))
+        assert converter.kes_cents_to_micro_usdc(amounts) == reference_kes_to_usdc(amounts, rate)
+        assert converter.micro_usdc_to_kes_cents(amounts) == reference_usdc_to_kes(amounts, rate)
+
+
+@pytest.mark.skipif(np is None, reason="NumPy not installed")
+def test_int64_path_never_overflows_near_its_bound():
+    rate = Decimal("0.006969")
+    converter = FixedPointConverter(rate)
+    # USDC -> KES multiplies by less than half the divisor, so there are amounts
+    # whose product n stays below 2**62 while 2 * n + d passes 2**63
+    multiplier, _ = converter._to_kes
+    edge = (2 ** 62 - 1) // multiplier
+    # One array per amount, so none is pushed onto the big-int path by a larger neighbour
+    for amount in (edge - 1, edge, edge + 1, -edge, -(edge + 1)):
+        expected = reference_usdc_to_kes([amount], rate)
+        assert converter.micro_usdc_to_kes_cents(np.array([amount], dtype=np.int64)).tolist() == expected
+        assert converter.micro_usdc_to_kes_cents([amount]) == expected
+
+    extremes = [np.iinfo(np.int64).min, np.iinfo(np.int64).max]
+    assert (converter.kes_cents_to_micro_usdc(np.array(extremes, dtype=np.int64)).tolist()
+            == reference_kes_to_usdc(extremes, rate))
@@ -0,0 +1,65 @@
+"""
+Tests for which failures PooledHttpClient retries.
+"""
+
+import asyncio
+import socket
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from http_client import HttpError, PooledHttpClient
+
+
+async def with_flaky_server(method, retry=None):
+    """Send one request to a server that always answers 503; returns how many reached it"""
+    hits = []
+
+    async def unavailable(request):
+        hits.append(request.method)
+        return web.json_response({"error": "busy"}, status=503)
+
+    app = web.Application()
+    app.router.add_route("*", "/", unavailable)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    client = PooledHttpClient(max_retries=2, backoff_base=0)
+    try:
+        with pytest.raises(HttpError):
+            await client.request_json(method, f"http://127.0.0.1:{port}/", retry=retry)
+    finally:
+        await client.close()
+        await runner.cleanup()
+    return len(hits)
+
+
+@pytest.mark.parametrize("method, retry, attempts", [
+    ("GET", None, 3),
+    ("POST", None, 1),  # e.g. an STK push: the server may already have acted on it
+    ("POST", True, 3),
+    ("GET", False, 1)
+])
+def test_sent_requests_retried_only_when_safe(method, retry, attempts):
+    assert asyncio.run(with_flaky_server(method, retry)) == attempts
+
+
+def test_post_retried_when_connection_never_opened():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    # Nothing listens on the port, so every attempt fails before anything is sent
+    client = PooledHttpClient(max_retries=2, backoff_base=0)
+
+    async def post():
+        try:
+            await client.request_json("POST", f"http://127.0.0.1:{port}/", json={})
+        finally:
+            await client.close()
+
+    with pytest.raises(aiohttp.ClientConnectorError):
+        asyncio.run(post())
+    assert client.requests == 3
@@ -0,0 +1,41 @@
+"""
+Tests for IdGenerator ordering across threads and clock adjustments.
+"""
+
+import threading
+import time
+
+from id_generator import IdGenerator
+
+
+def test_string_order_is_issue_order_across_threads():
+    generator = IdGenerator()
+    results = [[] for _ in range(4)]
+
+    def worker(slot):
+        results[slot] = [generator.next_id("tx") for _ in range(20000)] + generator.next_ids(100, "tx")
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    generated = [generated_id for chunk in results for generated_id in chunk]
+    assert len(set(generated)) == len(generated)
+    # Sequence numbers are handed out in issue order
+    assert sorted(generated) == sorted(generated, key=lambda generated_id: IdGenerator.parse(generated_id)[3])
+
+
+def test_ids_keep_rising_when_the_wall_clock_steps_back(monkeypatch):
+    generator = IdGenerator()
+    before = generator.next_id("tx")
+    real_time_ns = time.time_ns
+
+    # Re-anchoring (as a forked child does) after the clock was set back an hour
+    monkeypatch.setattr(time, "time_ns", lambda: real_time_ns() - 3600 * 10 ** 9)
+    generator._reseed()
+    after = generator.next_id("tx")
+
+    assert IdGenerator.parse(after)[1] >= IdGenerator.parse(before)[1]
+    assert generator.timestamp_ms() >= IdGenerator.parse(before)[1]
@@ -0,0 +1,140 @@
+"""
+Tests for the idempotency stores: TTL and size eviction, and keys shared between processes.
+"""
+
+import os
+import threading
+
+import pytest
+
+from idempotency import IdempotencyConflict, IdempotencyStore, SQLiteIdempotencyStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_running_entry_does_not_break_expiry_order():
+    clock = FakeClock()
+    store = IdempotencyStore(ttl=10, max_entries=2, clock=clock)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return "slow"
+
+    runner = threading.Thread(target=store.run, args=("a", "f", slow))
+    runner.start()
+    try:
+        started.wait()
+        clock.now += 1
+        store.run("b", "f", lambda: "b")
+        clock.now += 1
+        store.run("c", "f", lambda: "c")
+        # Over max_entries with "a" still running: the oldest finished entry goes instead
+        store._evict()
+        assert list(store._entries) == ["a", "c"]
+    finally:
+        release.set()
+        runner.join()
+
+    # "a" still expires first, as it was inserted first
+    clock.now += 9.5
+    store._evict()
+    assert list(store._entries) == ["c"]
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two stores on separate connections to one database, as in two gunicorn workers"""
+    path = str(tmp_path / "ledger.db")
+    clock = FakeClock()
+    return (SQLiteIdempotencyStore(path, ttl=60, lease=5, poll_interval=0.01, clock=clock),
+            SQLiteIdempotencyStore(path, ttl=60, lease=5, poll_interval=0.01, clock=clock),
+            clock)
+
+
+def test_retry_on_another_worker_is_replayed(workers):
+    first, second, _ = workers
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return ["body", 200]
+
+    assert first.run(("escrow", "k1"), "f1", compute) == (["body", 200], False)
+    assert second.run(("escrow", "k1"), "f1", compute) == (["body", 200], True)
+    assert len(calls) == 1
+    with pytest.raises(IdempotencyConflict):
+        second.run(("escrow", "k1"), "f2", compute)
+
+
+def test_duplicate_waits_for_request_running_on_another_worker(workers):
+    first, second, _ = workers
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait()
+        return "done"
+
+    runner = threading.Thread(target=lambda: results.append(first.run("k", "f", slow)))
+    runner.start()
+    started.wait()
+    waiter = threading.Thread(target=lambda: results.append(second.run("k", "f", lambda: "again")))
+    waiter.start()
+    release.set()
+    runner.join()
+    waiter.join()
+    assert sorted(results) == [("done", False), ("done", True)]
+
+
+def test_failed_or_abandoned_claims_are_rerun(workers):
+    first, second, clock = workers
+    assert first.run("k", "f", lambda: 500, cacheable=lambda status: status < 500) == (500, False)
+    assert second.run("k", "f", lambda: 200, cacheable=lambda status: status < 500) == (200, False)
+
+    # A worker that died mid-request leaves a claim behind until its lease runs out
+    first._claim('"stuck"', "f", "dead_worker")
+    clock.now += 6
+    assert second.run("stuck", "f", lambda: "rerun") == ("rerun", False)
+
+
+def test_expired_and_excess_keys_are_dropped(tmp_path):
+    clock = FakeClock()
+    store = SQLiteIdempotencyStore(str(tmp_path / "ledger.db"), ttl=10, max_entries=2, clock=clock)
+    store.TRIM_INTERVAL = 1
+    for key in "abc":
+        store.run(key, "f", lambda: key)
+        clock.now += 1
+    assert len(store) == 2
+    clock.now += 10
+    store.run("d", "f", lambda: "d")
+    assert len(store) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_opens_its_own_connection(tmp_path):
+    # As under gunicorn's preload_app: built in the master, used in forked workers
+    store = SQLiteIdempotencyStore(str(tmp_path / "ledger.db"))
+    store.run("master", "f", lambda: "m")
+    inherited = store._connection
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            result, _ = store.run("worker", "f", lambda: "w")
+            os._exit(0 if store._connection is not inherited and result == "w" else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store._connection is inherited
+    assert store.run("worker", "f", lambda: "again") == ("w", True)
@@ -0,0 +1,74 @@
+"""
+Tests for KnowledgeIndex posting lists over a BusinessCatalogue.
+"""
+
+import random
+
+from business_catalogue import BusinessCatalogue
+from knowledge_index import KnowledgeIndex
+
+SKILLS = [f"Skill {i}" for i in range(12)]
+TOWNS = ["Nairobi", "Mombasa", "Kisumu"]
+INDUSTRIES = ["Technology", "Marketing", "Design"]
+
+
+def random_profile(rng):
+    return {
+        "skills": rng.sample(SKILLS, rng.randint(0, 4)),
+        "location": rng.choice(TOWNS),
+        "industry": rng.choice(INDUSTRIES),
+        "reputation": rng.randint(50, 100)
+    }
+
+
+def write(catalogue, index, business_name, business_data):
+    """Apply a write the way SnapshotDraft does"""
+    previous = index.terms(catalogue.row(business_name)) if business_name in catalogue else None
+    index.add_row(catalogue.add(business_name, business_data), previous)
+
+
+def assert_matches_scan(index, profiles):
+    names = list(profiles)
+    for skill in SKILLS:
+        assert index.businesses_with_skill(skill) == {n for n in names if skill in profiles[n]["skills"]}
+    for town in TOWNS:
+        assert index.businesses_in_location(town) == {n for n in names if profiles[n]["location"] == town}
+    for industry in INDUSTRIES:
+        assert index.businesses_in_industry(industry) == {n for n in names if profiles[n]["industry"] == industry}
+    wanted = SKILLS[:3]
+    assert index.candidates_for_skills(wanted) == [
+        n for n in names if set(wanted).intersection(profiles[n]["skills"])
+    ]
+
+
+def test_postings_follow_replaced_businesses():
+    rng = random.Random(2)
+    catalogue = BusinessCatalogue()
+    index = KnowledgeIndex(catalogue)
+    profiles = {}
+    for _ in range(300):
+        name = f"Business {rng.randrange(40)}"
+        profiles[name] = random_profile(rng)
+        write(catalogue, index, name, profiles[name])
+    assert_matches_scan(index, profiles)
+    assert KnowledgeIndex.from_catalogue(catalogue).skill_index == index.skill_index
+
+
+def test_copy_leaves_original_unchanged():
+    rng = random.Random(5)
+    catalogue = BusinessCatalogue()
+    index = KnowledgeIndex(catalogue)
+    profiles = {f"Business {i}": random_profile(rng) for i in range(30)}
+    for name, profile in profiles.items():
+        write(catalogue, index, name, profile)
+
+    copied_catalogue = catalogue.copy()
+    copied = index.copy(copied_catalogue)
+    copied_profiles = dict(profiles)
+    for i in range(0, 30, 3):
+        name = f"Business {i}"
+        copied_profiles[name] = random_profile(rng)
+        write(copied_catalogue, copied, name, copied_profiles[name])
+
+    assert_matches_scan(index, profiles)
+    assert_matches_scan(copied, copied_profiles)
@@ -0,0 +1,78 @@
+"""
+Tests for knowledge base snapshots: published versions stay immutable and
+their materialized teams match a full recompute.
+"""
+
+import random
+
+import pytest
+
+from metta_integration import AGI_GigeBid_Engine
+
+
+@pytest.fixture
+def engine():
+    return AGI_GigeBid_Engine(knowledge_graph_path=None)
+
+
+def test_published_contracts_are_read_only(engine):
+    caller_data = {"required_skills": ["Graphic Design"], "budget": 1000, "tags": ["design"]}
+    engine.add_contract_to_knowledge_base("Logo Refresh", caller_data)
+    caller_data["required_skills"].append("Hacked")
+    first = engine.snapshot
+
+    requirements = engine.get_contract_requirements("Government Tender #123")
+    assert requirements["required_skills"] == ("Digital Marketing", "Web Development")
+    with pytest.raises((TypeError, AttributeError)):
+        requirements["required_skills"].append("Hacked")
+    with pytest.raises(TypeError):
+        requirements["budget"] = 0
+    assert engine.get_contract_requirements("Logo Refresh")["required_skills"] == ("Graphic Design",)
+    assert engine.get_contract_requirements("Logo Refresh")["tags"] == ("design",)
+
+    # Later versions share the contract objects but never change them
+    engine.add_contract_to_knowledge_base("Brand Audit", {"required_skills": ["Digital Marketing"]})
+    assert engine.snapshot.contracts["Logo Refresh"] is first.contracts["Logo Refresh"]
+    assert engine.snapshot.contract_index.required_skills("Logo Refresh") == frozenset({"Graphic Design"})
+
+
+SKILLS = ["Digital Marketing", "Web Development", "Graphic Design", "Mobile App Development",
+          "UI/UX Design", "Financial Analysis", "Copywriting"]
+
+
+def test_materialized_teams_match_full_recompute(engine):
+    rng = random.Random(5)
+    for step in range(40):
+        write = rng.random()
+        if write < 0.6:
+            engine.add_business_to_knowledge_base(rng.choice([f"Business {step}", "Business 0"]), {
+                "skills": rng.sample(SKILLS, rng.randint(1, 3)),
+                "location": rng.choice(["Nairobi", "Mombasa"]),
+                "industry": rng.choice(["Technology", "Marketing", "Design", "Finance"]),
+                "reputation": rng.randint(50, 100)
+            })
+        elif write < 0.8:
+            engine.add_contract_to_knowledge_base(f"Contract {step}", {
+                "required_skills": rng.sample(SKILLS, rng.randint(0, 3)), "budget": 100000
+            })
+        else:
+            engine.add_complementary_industries(*rng.sample(["Technology", "Marketing", "Design", "Finance"], 2))
+
+        snapshot = engine.snapshot
+        assert dict(snapshot.teams) == engine._materialize_teams(snapshot, None), step
+
+
+def test_unexpected_materialize_error_fails_the_publish(engine, monkeypatch):
+    before = engine.snapshot
+
+    def broken(contract_name, available_businesses):
+        raise RuntimeError("solver bug")
+
+    monkeypatch.setattr(engine, "_form_optimal_team", broken)
+    with pytest.raises(RuntimeError):
+        engine.add_business_to_knowledge_base("Studio", {
+            "skills": ["Web Development"], "location": "Nairobi", "industry": "Design", "reputation": 80
+        })
+
+    assert engine.snapshot is before
+    assert engine.get_business_profile("Studio") is None
@@ -0,0 +1,130 @@
+"""
+Tests for milestone payouts: one Sui release per milestone, B2C submission
+states and settlement from B2C result callbacks.
+"""
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from mpesa_callbacks import parse_b2c_result
+from payment_system import EscrowPayment, create_payment_system
+from transaction_ledger import TransactionLedger
+
+
+class CountingSuiConnector:
+    def __init__(self):
+        self.releases = []
+
+    async def release_milestone_payment(self, escrow_id, milestone_index, approver):
+        self.releases.append((escrow_id, milestone_index))
+        return "sui_release_1"
+
+
+@pytest.fixture
+def payment_system():
+    system = create_payment_system(sui_connector=CountingSuiConnector(),
+                                   ledger=TransactionLedger(":memory:"))
+    system.escrow_contracts["escrow_1"] = EscrowPayment(
+        escrow_id="escrow_1", project_id="PROJ_1",
+        total_amount_kes=Decimal("10000"), total_amount_usdc=Decimal("70"),
+        milestones=[{"name": "Design", "amount_usdc": 21.0}],
+        participants=["dev1", "dev2", "dev3"], created_at="2024-01-01 00:00:00"
+    )
+    system.b2c_requests = []
+
+    async def initiate_b2c_payment(phone_number, amount, reference, originator_id):
+        system.b2c_requests.append(originator_id)
+        return {"ConversationID": f"AG_{originator_id}", "OriginatorConversationID": originator_id,
+                "ResponseCode": "0"}
+
+    system.mpesa.initiate_b2c_payment = initiate_b2c_payment
+    return system
+
+
+def b2c_result(conversation_id, originator_id, result_code=0):
+    return {"Result": {
+        "ResultType": 0, "ResultCode": result_code, "ResultDesc": "The service request is processed successfully.",
+        "OriginatorConversationID": originator_id, "ConversationID": conversation_id,
+        "TransactionID": "NLJ41HAY6Q"
+    }}
+
+
+def settle(payment_system, payload):
+    result = parse_b2c_result(payload)
+    return payment_system.complete_payouts_from_b2c_results(
+        [(result.conversation_id, result.originator_conversation_id, result.result_code, result.result_desc)]
+    )
+
+
+def test_payout_waits_for_b2c_results(payment_system):
+    payout = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+
+    assert payment_system.sui_connector.releases == [("escrow_1", 0)]
+    assert payout.status == "submitted"
+    assert {tx.status for tx in payout.transactions} == {"b2c_submitted"}
+    assert {tx.sui_transaction_id for tx in payout.transactions} == {"sui_release_1"}
+    assert sum(tx.amount_usdc for tx in payout.transactions) == Decimal("21")
+    assert payment_system._payout_locks == {}
+    assert "status" not in payment_system.escrow_contracts["escrow_1"].milestones[0]
+
+    for tx in payout.transactions:
+        assert settle(payment_system, b2c_result(tx.mpesa_transaction_id, tx.transaction_id)) == {
+            tx.mpesa_transaction_id: "completed"
+        }
+    first = payout.transactions[0]
+    assert settle(payment_system, b2c_result(first.mpesa_transaction_id, first.transaction_id)) == {
+        first.mpesa_transaction_id: "duplicate"
+    }
+
+    rerun = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+    assert rerun.status == "completed"
+    assert len(payment_system.b2c_requests) == 3
+    assert payment_system.sui_connector.releases == [("escrow_1", 0)]
+
+
+def test_failed_result_is_resubmitted_on_rerun(payment_system):
+    payout = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+    failed = payout.transactions[1]
+    assert settle(payment_system, b2c_result(failed.mpesa_transaction_id, failed.transaction_id, 2001)) == {
+        failed.mpesa_transaction_id: "failed"
+    }
+
+    rerun = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+    assert payment_system.b2c_requests.count(failed.transaction_id) == 2
+    assert rerun.status == "submitted"
+
+
+def test_unanswered_submission_is_never_resent(payment_system):
+    async def lost_response(phone_number, amount, reference, originator_id):
+        payment_system.b2c_requests.append(originator_id)
+        raise asyncio.TimeoutError()
+
+    working = payment_system.mpesa.initiate_b2c_payment
+    payment_system.mpesa.initiate_b2c_payment = lost_response
+    payout = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+    assert payout.status == "partial"
+    assert {tx.status for tx in payout.transactions} == {"b2c_submitting"}
+
+    payment_system.mpesa.initiate_b2c_payment = working
+    rerun = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+    assert len(payment_system.b2c_requests) == 3
+    assert set(rerun.failed_recipients) == {"dev1", "dev2", "dev3"}
+    assert all(tx.review_reason for tx in rerun.transactions)
+
+    # The result still settles it, matched on our originator ID
+    lost = rerun.transactions[0]
+    assert settle(payment_system, b2c_result("AG_late", lost.transaction_id)) == {"AG_late": "completed"}
+    settled = payment_system.get_transaction(lost.transaction_id)
+    assert (settled.status, settled.mpesa_transaction_id, settled.review_reason) == ("completed", "AG_late", None)
+
+
+def test_rejected_submission_fails_and_unknown_results_are_ignored(payment_system):
+    async def rejected(phone_number, amount, reference, originator_id):
+        raise RuntimeError("B2C payment rejected: Invalid Initiator")
+
+    payment_system.mpesa.initiate_b2c_payment = rejected
+    payout = asyncio.run(payment_system.release_milestone_to_participants("escrow_1", 0))
+    assert {tx.status for tx in payout.transactions} == {"failed"}
+    assert settle(payment_system, b2c_result("AG_other", "payout_other")) == {"AG_other": "unknown"}
@@ -0,0 +1,99 @@
+"""
+Tests for M-Pesa callback origin checks and settlement against the ledger.
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from mpesa_callbacks import CallbackVerifier, parse_stk_callback
+from payment_system import create_payment_system
+from transaction_ledger import PaymentTransaction, TransactionLedger
+
+
+def stk_callback(checkout_request_id, result_code=0, amount=None, phone_number=None):
+    callback = {
+        "MerchantRequestID": "merchant_1",
+        "CheckoutRequestID": checkout_request_id,
+        "ResultCode": result_code,
+        "ResultDesc": "The service request is processed successfully."
+    }
+    if amount is not None:
+        callback["CallbackMetadata"] = {"Item": [
+            {"Name": "Amount", "Value": amount},
+            {"Name": "MpesaReceiptNumber", "Value": "OGI1234"},
+            {"Name": "PhoneNumber", "Value": phone_number}
+        ]}
+    return {"Body": {"stkCallback": callback}}
+
+
+@pytest.fixture
+def payment_system():
+    system = create_payment_system(ledger=TransactionLedger(":memory:"))
+    system.ledger.record(PaymentTransaction(
+        transaction_id="dep_1", user_id="user_1",
+        amount_kes=Decimal("1000.40"), amount_usdc=Decimal("7.7"), exchange_rate=Decimal("0.0077"),
+        transaction_type="deposit", status="pending", mpesa_transaction_id="ws_CO_1",
+        created_at="2024-01-01 00:00:00", phone_number="+254708374149"
+    ))
+    return system
+
+
+def settle(payment_system, payload):
+    result = parse_stk_callback(payload)
+    return payment_system.complete_deposits_from_callbacks(
+        [(result.checkout_request_id, result.result_code, result.result_desc, result.metadata)]
+    )
+
+
+def test_unconfigured_verifier_rejects_everything():
+    verifier = CallbackVerifier()
+    assert not verifier.verify(None, "196.201.214.200")
+    assert verifier.rejected == 1
+
+
+def test_token_and_allowlist_must_both_pass():
+    verifier = CallbackVerifier("s3cret", ["196.201.214.0/24"])
+    assert verifier.verify("s3cret", "196.201.214.200")
+    assert not verifier.verify("wrong", "196.201.214.200")
+    assert not verifier.verify(None, "196.201.214.200")
+    assert not verifier.verify("s3cret", "10.0.0.1")
+    assert not verifier.verify("s3cret", None)
+
+
+def test_matching_callback_completes_deposit(payment_system):
+    outcomes = settle(payment_system, stk_callback("ws_CO_1", amount=1000, phone_number=254708374149))
+    assert outcomes == {"ws_CO_1": "completed"}
+    assert payment_system.get_transaction("dep_1").status == "completed"
+
+
+@pytest.mark.parametrize("amount, phone_number", [
+    (1, 254708374149),
+    (1000, 254700000000),
+    (None, None)
+])
+def test_mismatched_callback_leaves_deposit_for_review(payment_system, amount, phone_number):
+    payload = stk_callback("ws_CO_1", amount=amount, phone_number=phone_number)
+    assert settle(payment_system, payload) == {"ws_CO_1": "mismatch"}
+    transaction = payment_system.get_transaction("dep_1")
+    assert transaction.status == "pending"
+    assert transaction.review_reason
+    assert [t.transaction_id for t in payment_system.get_deposits_for_review()] == ["dep_1"]
+    assert payment_system.get_stale_pending_deposits(0, 10) == []
+
+
+def test_failed_callback_needs_no_metadata(payment_system):
+    assert settle(payment_system, stk_callback("ws_CO_1", result_code=1032)) == {"ws_CO_1": "failed"}
+
+
+def test_deposit_settled_elsewhere_is_not_overwritten(payment_system):
+    transactions = payment_system.ledger.get_many_by_mpesa_ids(["ws_CO_1"])
+    # Another worker (or a status poll) fails the deposit after this batch read it
+    settled = payment_system.ledger.get("dep_1")
+    settled.status = "failed"
+    payment_system.ledger.record(settled)
+
+    stale = transactions["ws_CO_1"]
+    stale.status = "completed"
+    assert payment_system.ledger.record_if_status([stale], "pending") == set()
+    assert payment_system.get_transaction("dep_1").status == "failed"
@@ -0,0 +1,96 @@
+"""
+Tests for PartnershipScorer against the scalar scoring rules it vectorizes.
+"""
+
+import random
+
+import pytest
+
+import partnership_scoring
+from business_catalogue import BusinessCatalogue
+from knowledge_index import ComplementaryIndustries
+from partnership_scoring import PartnershipScorer
+
+TOWNS = ["Nairobi", "Mombasa", "Kisumu", "Nakuru"]
+INDUSTRIES = ["Technology", "Marketing", "Design", "Finance", "Logistics"]
+PAIRS = [("Marketing", "Technology"), ("Technology", "Design"), ("Design", "Marketing"),
+         ("Finance", "Technology")]
+
+
+def reference_score(business_a, business_b, relation: ComplementaryIndustries) -> float:
+    """Scalar reference: one pair at a time, straight from the profile dicts"""
+    score = 50.0  # Base score
+
+    # Location bonus
+    if business_a["location"] == business_b["location"]:
+        score += 15.0
+
+    # Industry synergy bonus
+    if relation.are_complementary(business_a["industry"], business_b["industry"]):
+        score += 10.0
+
+    # Reputation bonus
+    avg_reputation = (business_a["reputation"] + business_b["reputation"]) / 2
+    if avg_reputation >= 85:
+        score += 15.0
+    elif avg_reputation >= 75:
+        score += 10.0
+
+    return min(score, 100.0)
+
+
+@pytest.fixture
+def businesses():
+    rng = random.Random(4)
+    return {
+        f"Business {i}": {
+            "skills": [],
+            "location": rng.choice(TOWNS),
+            "industry": rng.choice(INDUSTRIES),
+            "reputation": rng.randint(60, 100)
+        }
+        for i in range(60)
+    }
+
+
+@pytest.fixture
+def relation():
+    return ComplementaryIndustries(PAIRS)
+
+
+def test_score_matrix_matches_reference(businesses, relation):
+    scorer = PartnershipScorer.from_knowledge_base({"businesses": businesses}, relation)
+    names = list(businesses)
+    matrix = scorer.score_matrix(names, names)
+    for i, name_a in enumerate(names):
+        for j, name_b in enumerate(names):
+            assert matrix[i][j] == reference_score(businesses[name_a], businesses[name_b], relation)
+
+
+def test_pure_python_path_matches_reference(businesses, relation, monkeypatch):
+    monkeypatch.setattr(partnership_scoring, "np", None)
+    scorer = PartnershipScorer.from_knowledge_base({"businesses": businesses}, relation)
+    names = list(businesses)
+    scores = scorer.score_one_to_many(names[0], names)
+    assert scores == [reference_score(businesses[names[0]], businesses[name], relation) for name in names]
+
+
+def test_empty_relation_is_shared():
+    relation = ComplementaryIndustries()
+    scorer = PartnershipScorer(BusinessCatalogue(), relation)
+    assert scorer.complementary_industries is relation
+    relation.add_pair("Marketing", "Technology")
+    scorer.catalogue.add("a", {"location": "Nairobi", "industry": "Marketing", "reputation": 60})
+    scorer.catalogue.add("b", {"location": "Mombasa", "industry": "Technology", "reputation": 60})
+    scorer.refresh()
+    assert scorer.score_matrix(["a"], ["b"]) == [[60.0]]
+
+
+def test_overwritten_business_is_rescored(businesses, relation):
+    scorer = PartnershipScorer.from_knowledge_base({"businesses": businesses}, relation)
+    updated = dict(businesses["Business 1"], location=businesses["Business 0"]["location"], reputation=100)
+    scorer.catalogue.add("Business 1", updated)
+    scorer.refresh()
+    assert scorer.score_matrix(["Business 0"], ["Business 1"]) == [
+        [reference_score(businesses["Business 0"], updated, relation)]
+    ]
@@ -0,0 +1,29 @@
+"""
+Tests for FrozenDict, the read-only mapping held in cached results.
+"""
+
+import copy
+import pickle
+
+import pytest
+
+from metta_integration import AGI_GigeBid_Engine
+from result_cache import FrozenDict
+
+
+def test_frozen_dict_copies_and_pickles():
+    frozen = FrozenDict({"Web Development": "Jane's Dev House", "skills": ("a", "b")})
+
+    for clone in (copy.copy(frozen), copy.deepcopy(frozen), pickle.loads(pickle.dumps(frozen))):
+        assert type(clone) is FrozenDict
+        assert clone == frozen
+        with pytest.raises(TypeError):
+            clone["Web Development"] = "someone else"
+
+
+def test_cached_team_can_be_deep_copied():
+    engine = AGI_GigeBid_Engine(knowledge_graph_path=None)
+    team = engine.form_optimal_team("Government Tender #123")
+
+    assert copy.deepcopy(team) == team
+    assert pickle.loads(pickle.dumps(team)) == team
@@ -0,0 +1,53 @@
+"""
+Equivalence tests: SkillCoverageSolver returns the team the original
+``combinations`` scan returned.
+"""
+
+import random
+from itertools import combinations
+
+import pytest
+
+from metta_integration import DEFAULT_KNOWLEDGE_GRAPH_PATH, AGI_GigeBid_Engine
+from skill_coverage import SkillCoverageSolver
+
+SKILLS = [f"Skill {i}" for i in range(10)]
+
+
+def brute_force_team(required_skills, candidates):
+    """The engine's original search: the first covering combination, smallest size first"""
+    for team_size in range(1, len(candidates) + 1):
+        for team in combinations(candidates, team_size):
+            team_skills = set()
+            for _, skills in team:
+                team_skills.update(skills)
+            if set(required_skills).issubset(team_skills):
+                return [name for name, _ in team]
+    return []
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_combinations_scan(seed):
+    rng = random.Random(seed)
+    required_skills = rng.sample(SKILLS, rng.randint(0, 6))
+    candidates = [
+        (f"Business {index}", rng.sample(SKILLS, rng.randint(0, 4)))
+        for index in range(rng.randint(0, 12))
+    ]
+
+    result = SkillCoverageSolver().solve(required_skills, candidates)
+
+    assert result.exact
+    assert result.team == brute_force_team(required_skills, candidates)
+
+
+@pytest.mark.parametrize("knowledge_graph_path", [None, DEFAULT_KNOWLEDGE_GRAPH_PATH])
+def test_engine_teams_match_on_seed_data(knowledge_graph_path):
+    engine = AGI_GigeBid_Engine(knowledge_graph_path=knowledge_graph_path)
+    snapshot = engine.snapshot
+    candidates = [(name, snapshot.businesses.get(name)["skills"]) for name in snapshot.businesses.names]
+
+    for contract_name, contract in snapshot.contracts.items():
+        team = engine.form_optimal_team(contract_name)
+        expected = brute_force_team(contract["required_skills"], candidates)
+        assert (list(team.team_members) if team else []) == expected
@@ -0,0 +1,34 @@
+"""
+Tests for batched transfer PTBs and the mock executor's all-or-nothing execution.
+"""
+
+from sui_transactions import MockPtbExecutor, build_transfer_batches
+
+
+def test_underfunded_block_moves_nothing_but_gas():
+    balances = {("0xa", "SUI"): 10 ** 9, ("0xa", "USDC"): 2500}
+    executor = MockPtbExecutor(balances)
+    first, second = build_transfer_batches(
+        [("0xa", "0xb", 1000), ("0xa", "0xc", 1000), ("0xa", "0xb", 1000), ("0xa", "0xc", 1000)],
+        token_type="USDC", max_transfers_per_ptb=2
+    )
+
+    assert executor.execute(first).success
+    effects = executor.execute(second)
+
+    assert not effects.success
+    assert effects.error.startswith("InsufficientCoinBalance")
+    assert (executor.balance("0xa", "USDC"), executor.balance("0xb", "USDC"),
+            executor.balance("0xc", "USDC")) == (500, 1000, 1000)
+    assert executor.balance("0xa") == 10 ** 9 - first.estimate_gas().total - second.estimate_gas().total
+    assert executor.get_metrics()["failed_transactions"] == 1
+
+
+def test_batches_split_by_sender_and_size():
+    transfers = [("0xa", f"0xm{index}", 1) for index in range(5)] + [("0xb", "0xm0", 7)]
+    blocks = build_transfer_batches(transfers, max_transfers_per_ptb=2)
+
+    assert [(block.sender, len(block.transfers)) for block in blocks] == [
+        ("0xa", 2), ("0xa", 2), ("0xa", 1), ("0xb", 1)
+    ]
+    assert sum(block.total_amount for block in blocks) == 12
@@ -0,0 +1,116 @@
+"""
+Exactness tests: TeamEnumerator's K best teams and Pareto front match a
+brute-force scan of every irredundant cover.
+"""
+
+import itertools
+import random
+
+import pytest
+
+from api import GigeBidBackendAPI
+from skill_coverage import SkillCoverageSolver
+from team_enumeration import TeamCandidate, TeamEnumerator, TeamObjective
+
+SKILL_POOL = [f"Skill {i}" for i in range(12)]
+TOWNS = ["Nairobi", "Mombasa", "Kisumu"]
+INDUSTRIES = ["Technology", "Marketing", "Design", "Finance"]
+COMPLEMENTARY = {("Technology", "Marketing"), ("Design", "Technology"), ("Finance", "Technology")}
+
+
+def pair_score(a, b):
+    score = 50.0
+    if a.location == b.location:
+        score += 15.0
+    if (a.industry, b.industry) in COMPLEMENTARY or (b.industry, a.industry) in COMPLEMENTARY:
+        score += 10.0
+    average_reputation = (a.reputation + b.reputation) / 2
+    score += 15.0 if average_reputation >= 85 else 10.0 if average_reputation >= 75 else 0.0
+    return min(score, 100.0)
+
+
+def make_candidates(rng, n):
+    return [
+        TeamCandidate(f"Business {i}", rng.sample(SKILL_POOL, rng.randint(1, 4)),
+                      rng.choice(TOWNS), rng.choice(INDUSTRIES), rng.randint(50, 100))
+        for i in range(n)
+    ]
+
+
+def brute_force(required, candidates, budget, max_size=None):
+    """(score, size) of every irredundant cover, best first"""
+    bits = SkillCoverageSolver.encode_skills(required)
+    full = (1 << len(bits)) - 1
+    masks = [sum(bits.get(skill, 0) for skill in set(candidate.skills)) for candidate in candidates]
+    useful = [index for index, mask in enumerate(masks) if mask]
+    objective = TeamObjective()
+    scored = []
+    for size in range(1, min(len(bits), max_size or len(bits)) + 1):
+        for team in itertools.combinations(useful, size):
+            union = 0
+            for index in team:
+                union |= masks[index]
+            if union != full:
+                continue
+            if not all(_provides_own(masks, team, index) for index in team):
+                continue
+            pairs = [pair_score(candidates[a], candidates[b]) for a, b in itertools.combinations(team, 2)]
+            compatibility = sum(pairs) / len(pairs) if pairs else 50.0
+            reputation = sum(candidates[index].reputation for index in team) / size
+            scored.append((round(objective.score(compatibility, reputation, size, budget), 9), size))
+    scored.sort(key=lambda entry: -entry[0])
+    return scored
+
+
+def _provides_own(masks, team, index):
+    """Whether team[index] covers a skill no other member does"""
+    others = 0
+    for other in team:
+        if other != index:
+            others |= masks[other]
+    return masks[index] & ~others != 0
+
+
+def pareto_scores(scored):
+    """Best score per size, keeping each size only if it beats every smaller one"""
+    best_by_size = {}
+    for score, size in scored:
+        best_by_size[size] = max(score, best_by_size.get(size, score))
+    front = []
+    for size in sorted(best_by_size):
+        if not front or best_by_size[size] > front[-1][0]:
+            front.append((best_by_size[size], size))
+    return front
+
+
+@pytest.mark.parametrize("trial", range(30))
+def test_k_best_and_pareto_front_match_brute_force(trial):
+    rng = random.Random(trial)
+    candidates = make_candidates(rng, 30)
+    required = rng.sample(SKILL_POOL, rng.randint(1, 4))
+    budget = rng.choice([None, 150000, 600000])
+    max_size = rng.choice([None, None, 2])
+
+    result = TeamEnumerator(time_budget=30.0).enumerate(
+        required, candidates, pair_score, k=10, max_size=max_size, budget=budget, max_pair_score=90.0
+    )
+    expected = brute_force(required, candidates, budget, max_size)
+
+    assert result.exact
+    assert [round(team.score, 9) for team in result.teams] == [score for score, _ in expected[:10]]
+    assert [(round(team.score, 9), len(team.members)) for team in result.pareto_front] == pareto_scores(expected)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("GIGEBID_LEDGER_PATH", str(tmp_path / "ledger.db"))
+    return GigeBidBackendAPI().app.test_client()
+
+
+@pytest.mark.parametrize("k, status", [(1, 200), (50, 200), (0, 400), (51, 400), ("many", 400)])
+def test_ranked_endpoint_limits_k(client, k, status):
+    response = client.post("/api/teams/ranked", json={"contract_name": "Government Tender #123", "k": k})
+
+    assert response.status_code == status
+    if status == 200:
+        assert 1 <= len(response.get_json()["data"]["teams"]) <= k
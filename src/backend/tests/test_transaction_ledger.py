@@ -0,0 +1,113 @@
+"""
+Tests for TransactionLedger: keyset paging, query filters and compare-and-set writes.
+"""
+
+import itertools
+import random
+from dataclasses import replace
+from decimal import Decimal
+
+import pytest
+
+from transaction_ledger import PaymentTransaction, TransactionLedger
+
+USERS = ["user_a", "user_b"]
+STATUSES = ["pending", "completed", "failed"]
+TYPES = ["deposit", "milestone_payment"]
+
+
+def make_transactions(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        PaymentTransaction(
+            transaction_id=f"tx_{index:03d}",
+            user_id=rng.choice(USERS),
+            amount_kes=Decimal(rng.randint(100, 100000)).scaleb(-2),
+            amount_usdc=Decimal(rng.randint(1, 10 ** 6)).scaleb(-6),
+            exchange_rate=Decimal("0.007700"),
+            transaction_type=rng.choice(TYPES),
+            status=rng.choice(STATUSES),
+            # Few distinct timestamps, so the transaction ID has to break ties
+            created_at=f"2024-01-0{rng.randint(1, 4)} 12:00:00",
+            review_reason=rng.choice([None, None, "callback amount mismatch"])
+        )
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def ledger():
+    ledger = TransactionLedger(":memory:")
+    ledger.record_many(make_transactions(120))
+    yield ledger
+    ledger.close()
+
+
+def expected_rows(filters, oldest_first=False):
+    rows = [tx for tx in make_transactions(120) if all(
+        value is None or (
+            tx.created_at >= value if key == "since" else
+            tx.created_at < value if key == "until" else
+            (tx.review_reason is not None) == value if key == "needs_review" else
+            getattr(tx, key) == value
+        )
+        for key, value in filters.items()
+    )]
+    return sorted(rows, key=lambda tx: (tx.created_at, tx.transaction_id), reverse=not oldest_first)
+
+
+@pytest.mark.parametrize("oldest_first", [False, True])
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_cursor_pages_cover_every_row_once_in_order(ledger, limit, oldest_first):
+    pages, cursor = [], None
+    while True:
+        page, cursor = ledger.query(user_id="user_a", limit=limit, cursor=cursor, oldest_first=oldest_first)
+        assert len(page) <= limit
+        pages.append(page)
+        if cursor is None:
+            break
+
+    assert all(pages[:-1]) and all(len(page) == limit for page in pages[:-1])
+    assert list(itertools.chain(*pages)) == expected_rows({"user_id": "user_a"}, oldest_first)
+
+
+@pytest.mark.parametrize("user_id, status, transaction_type, since, until, needs_review", [
+    (user_id, status, transaction_type, since, until, needs_review)
+    for user_id in (None, "user_b")
+    for status in (None, "pending")
+    for transaction_type in (None, "deposit")
+    for since, until in ((None, None), ("2024-01-02 00:00:00", "2024-01-04 00:00:00"))
+    for needs_review in (None, True, False)
+])
+def test_filters_combine(ledger, user_id, status, transaction_type, since, until, needs_review):
+    filters = {"user_id": user_id, "status": status, "transaction_type": transaction_type,
+               "since": since, "until": until, "needs_review": needs_review}
+
+    transactions, cursor = ledger.query(**filters)
+
+    assert cursor is None
+    assert transactions == expected_rows(filters)
+
+
+def test_malformed_cursor_is_rejected(ledger):
+    with pytest.raises(ValueError):
+        ledger.query(cursor="not-a-cursor")
+
+
+def test_record_if_status_writes_only_rows_still_in_that_status(ledger):
+    pending = ledger.get("tx_000")
+    settled_elsewhere = replace(ledger.get("tx_001"), status="completed")
+    ledger.record(settled_elsewhere)
+    ledger.record(replace(pending, status="pending"))
+
+    updates = [replace(pending, status="completed"), replace(settled_elsewhere, status="failed"),
+               replace(pending, transaction_id="tx_missing", status="completed")]
+    written = ledger.record_if_status(updates, "pending")
+
+    assert written == {"tx_000"}
+    assert ledger.get("tx_000").status == "completed"
+    assert ledger.get("tx_001").status == "completed"
+    assert "tx_missing" not in ledger
+    # A second settlement of the same row finds it no longer pending
+    assert ledger.record_if_status([replace(pending, status="failed")], "pending") == set()
+    assert ledger.get("tx_000").status == "completed"
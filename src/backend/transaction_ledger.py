@@ -0,0 +1,415 @@
+"""
+GigeBid Transaction Ledger
+Persistent SQLite store for PaymentTransaction records.
+
+Transactions live on disk rather than in a process-wide dict, so history
+survives restarts and memory use does not grow with transaction volume.
+History queries are served from composite B-tree indexes and paged with
+keyset cursors, so each page costs O(log n + page size) however deep it is.
+
+Every method blocks on SQLite; async callers run them via asyncio.to_thread.
+"""
+
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+from dataclasses import asdict, dataclass, fields
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PaymentTransaction:
+    """Payment transaction record"""
+    transaction_id: str
+    user_id: str
+    amount_kes: Decimal
+    amount_usdc: Decimal
+    exchange_rate: Decimal
+    transaction_type: str  # 'deposit', 'withdrawal', 'escrow_payment'
+    status: str  # 'pending', 'completed', 'failed'
+    mpesa_transaction_id: Optional[str] = None
+    sui_transaction_id: Optional[str] = None
+    created_at: str = ""
+    completed_at: Optional[str] = None
+    phone_number: Optional[str] = None  # M-Pesa number a deposit was requested from
+    review_reason: Optional[str] = None  # set when a deposit is held for manual review
+
+
+def default_ledger_path() -> str:
+    """
+    Ledger database file from the environment.
+
+    GIGEBID_LEDGER_PATH names the file directly; otherwise it is
+    gigebid_ledger.db in GIGEBID_DATA_DIR, or in the user's data directory
+    ($XDG_DATA_HOME/gigebid, by default ~/.local/share/gigebid).
+    """
+    path = os.environ.get("GIGEBID_LEDGER_PATH")
+    if path:
+        return path
+    data_dir = os.environ.get("GIGEBID_DATA_DIR") or os.path.join(
+        os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"),
+        "gigebid"
+    )
+    return os.path.join(data_dir, "gigebid_ledger.db")
+
+# Connections inherited across fork; kept referenced so they are never closed in the child
+_abandoned_connections: List[sqlite3.Connection] = []
+
+
+class ProcessLocalConnection:
+    """
+    One SQLite connection per process for the stores sharing the ledger database.
+
+    SQLite connections must not be carried across fork(): serve.py builds the
+    API in the gunicorn master (preload_app) and forks the workers, which would
+    otherwise all write through the connection they inherited. A forked child
+    abandons the inherited connection, since closing it could disturb the
+    parent's open transaction, and opens its own on first use. ":memory:"
+    databases are private to each process after fork and keep theirs.
+
+    Subclasses set self.path, call _open_connection() and use
+    self._connection while holding self._lock.
+    """
+
+    def _open_connection(self):
+        """Open this process's connection and reopen it in forked children"""
+        self._lock = threading.Lock()
+        self._local_connection: Optional[sqlite3.Connection] = None
+        store = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: store() is not None and store()._after_fork())
+        return self._connection
+
+    def _after_fork(self):
+        """Drop the parent's lock and connection in a forked child"""
+        # A lock held by another thread at fork time would stay locked in the child
+        self._lock = threading.Lock()
+        if self.path != ":memory:" and self._local_connection is not None:
+            _abandoned_connections.append(self._local_connection)
+            self._local_connection = None
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        if self._local_connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                         timeout=30.0)
+            connection.row_factory = sqlite3.Row
+            if self.path != ":memory:":
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            self._local_connection = connection
+        return self._local_connection
+
+
+# (created_at, transaction_id) of the last row on a page
+LedgerKey = Tuple[str, str]
+
+_COLUMNS = [field.name for field in fields(PaymentTransaction)]
+_DECIMAL_COLUMNS = {"amount_kes", "amount_usdc", "exchange_rate"}
+
+# Columns added after the first release; older ledger files gain them on open
+_ADDED_COLUMNS = ("phone_number", "review_reason")
+
+# Stay well below SQLite's bound-parameter limit in IN (...) lookups
+_MAX_QUERY_PARAMS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    amount_kes TEXT NOT NULL,
+    amount_usdc TEXT NOT NULL,
+    exchange_rate TEXT NOT NULL,
+    transaction_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    mpesa_transaction_id TEXT,
+    sui_transaction_id TEXT,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    phone_number TEXT,
+    review_reason TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_transactions_user_created
+    ON transactions (user_id, created_at, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_status_created
+    ON transactions (status, created_at, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_created
+    ON transactions (transaction_type, created_at, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_created
+    ON transactions (created_at, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_mpesa
+    ON transactions (mpesa_transaction_id) WHERE mpesa_transaction_id IS NOT NULL;
+"""
+
+
+def _encode_cursor(key: LedgerKey) -> str:
+    """Encode the sort key of the last returned transaction as an opaque cursor"""
+    payload = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor: str) -> LedgerKey:
+    """Decode a cursor produced by _encode_cursor"""
+    try:
+        created_at, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(transaction_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class TransactionLedger(ProcessLocalConnection):
+    """
+    SQLite-backed transaction store.
+
+    One connection per process is shared by all its callers and serialized
+    with a lock; every statement is a single indexed lookup or write, so
+    holding it is brief. File-backed ledgers run in WAL mode so readers
+    never block the writer.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (and if needed create) a ledger.
+
+        Args:
+            path: SQLite database file, or ":memory:" for a throwaway ledger
+                (default_ledger_path() when not given)
+        """
+        path = path or default_ledger_path()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        connection = self._open_connection()
+        connection.executescript(_SCHEMA)
+        existing = {row["name"] for row in connection.execute("PRAGMA table_info(transactions)")}
+        for column in _ADDED_COLUMNS:
+            if column not in existing:
+                connection.execute(f"ALTER TABLE transactions ADD COLUMN {column} TEXT")
+        self._upsert_sql = (
+            f"INSERT OR REPLACE INTO transactions ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+        )
+        self._update_if_status_sql = (
+            f"UPDATE transactions SET {', '.join(f'{column} = ?' for column in _COLUMNS)} "
+            f"WHERE transaction_id = ? AND status = ?"
+        )
+        logger.info(f"Transaction ledger opened: {path}")
+
+    @staticmethod
+    def _to_row(transaction: PaymentTransaction) -> List[Any]:
+        """Flatten a transaction into column values (Decimals stored as exact text)"""
+        values = asdict(transaction)
+        return [
+            str(values[column]) if column in _DECIMAL_COLUMNS else values[column]
+            for column in _COLUMNS
+        ]
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> PaymentTransaction:
+        """Rebuild a transaction from a result row"""
+        values = dict(row)
+        for column in _DECIMAL_COLUMNS:
+            values[column] = Decimal(values[column])
+        return PaymentTransaction(**values)
+
+    def record(self, transaction: PaymentTransaction):
+        """Insert a transaction or overwrite the stored version of it"""
+        row = self._to_row(transaction)
+        with self._lock:
+            self._connection.execute(self._upsert_sql, row)
+
+    def record_many(self, transactions: List[PaymentTransaction]):
+        """Insert or overwrite several transactions in one database transaction"""
+        rows = [self._to_row(transaction) for transaction in transactions]
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(self._upsert_sql, rows)
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def record_if_status(self, transactions: List[PaymentTransaction], expected_status: str) -> Set[str]:
+        """
+        Overwrite stored transactions whose status is still `expected_status`.
+
+        The status checks and writes run in one database transaction, so a
+        transaction settled concurrently (by another thread or process) is
+        never overwritten.
+
+        Returns:
+            IDs of the transactions that were written
+        """
+        rows = [self._to_row(transaction) + [transaction.transaction_id, expected_status]
+                for transaction in transactions]
+        written: Set[str] = set()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for transaction, row in zip(transactions, rows):
+                    if self._connection.execute(self._update_if_status_sql, row).rowcount:
+                        written.add(transaction.transaction_id)
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+        return written
+
+    def get(self, transaction_id: str) -> Optional[PaymentTransaction]:
+        """Look up a transaction by ID"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM transactions WHERE transaction_id = ?", (transaction_id,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_many(self, transaction_ids: List[str]) -> Dict[str, PaymentTransaction]:
+        """
+        Look up many transactions by ID in a few primary-key queries.
+
+        Returns:
+            Mapping of transaction ID to transaction for the IDs that were found
+        """
+        found: Dict[str, PaymentTransaction] = {}
+        ids = list(dict.fromkeys(transaction_ids))
+        with self._lock:
+            for start in range(0, len(ids), _MAX_QUERY_PARAMS):
+                chunk = ids[start:start + _MAX_QUERY_PARAMS]
+                rows = self._connection.execute(
+                    f"SELECT * FROM transactions WHERE transaction_id IN "
+                    f"({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                for row in rows:
+                    found[row["transaction_id"]] = self._from_row(row)
+        return found
+
+    def get_by_mpesa_id(self, mpesa_transaction_id: str) -> Optional[PaymentTransaction]:
+        """Look up a transaction by its M-Pesa CheckoutRequestID"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM transactions WHERE mpesa_transaction_id = ?", (mpesa_transaction_id,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_many_by_mpesa_ids(self, mpesa_transaction_ids: List[str]) -> Dict[str, PaymentTransaction]:
+        """
+        Look up many transactions by M-Pesa CheckoutRequestID in a few indexed queries.
+
+        Returns:
+            Mapping of CheckoutRequestID to transaction for the IDs that were found
+        """
+        found: Dict[str, PaymentTransaction] = {}
+        ids = list(dict.fromkeys(mpesa_transaction_ids))
+        with self._lock:
+            for start in range(0, len(ids), _MAX_QUERY_PARAMS):
+                chunk = ids[start:start + _MAX_QUERY_PARAMS]
+                rows = self._connection.execute(
+                    f"SELECT * FROM transactions WHERE mpesa_transaction_id IN "
+                    f"({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                for row in rows:
+                    found[row["mpesa_transaction_id"]] = self._from_row(row)
+        return found
+
+    def __contains__(self, transaction_id: str) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM transactions WHERE transaction_id = ?", (transaction_id,)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def query(self,
+              user_id: Optional[str] = None,
+              status: Optional[str] = None,
+              transaction_type: Optional[str] = None,
+              since: Optional[str] = None,
+              until: Optional[str] = None,
+              limit: Optional[int] = None,
+              cursor: Optional[str] = None,
+              oldest_first: bool = False,
+              needs_review: Optional[bool] = None) -> Tuple[List[PaymentTransaction], Optional[str]]:
+        """
+        Fetch transactions newest first (or oldest first), one page at a time.
+
+        Args:
+            user_id: Only transactions of this user
+            status: Only transactions in this status
+            transaction_type: Only transactions of this type
+            since: Only transactions created at or after this "%Y-%m-%d %H:%M:%S" time
+            until: Only transactions created before this time
+            limit: Maximum number of transactions to return (None for all)
+            cursor: Cursor returned with the previous page
+            oldest_first: Return the oldest transactions first
+            needs_review: Only transactions held for review (True) or not held (False)
+
+        Returns:
+            (transactions, next_cursor) tuple; next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        conditions = []
+        params: List[Any] = []
+        for column, value in (("user_id", user_id), ("status", status),
+                              ("transaction_type", transaction_type)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        if needs_review is not None:
+            conditions.append("review_reason IS NOT NULL" if needs_review else "review_reason IS NULL")
+        if cursor:
+            comparison = ">" if oldest_first else "<"
+            conditions.append(f"(created_at, transaction_id) {comparison} (?, ?)")
+            params.extend(_decode_cursor(cursor))
+
+        direction = "ASC" if oldest_first else "DESC"
+        sql = "SELECT * FROM transactions"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY created_at {direction}, transaction_id {direction}"
+        if limit is not None:
+            # Fetch one extra row to learn whether another page exists
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor((last["created_at"], last["transaction_id"]))
+        return [self._from_row(row) for row in rows], next_cursor
+
+    def status_counts(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """Number of transactions per status, optionally for a single user"""
+        sql = "SELECT status, COUNT(*) FROM transactions"
+        params: Tuple[Any, ...] = ()
+        if user_id is not None:
+            sql += " WHERE user_id = ?"
+            params = (user_id,)
+        sql += " GROUP BY status"
+        with self._lock:
+            return dict(self._connection.execute(sql, params).fetchall())
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
@@ -30,4 +30,9 @@ echo ""
 echo "Press Ctrl+C to stop the server"
 echo ""
 
+# GIGEBID_ENV=production runs the pre-fork gunicorn server (see src/backend/serve.py)
+if [ "$GIGEBID_ENV" = "production" ]; then
+    cd src/backend && exec python3 serve.py
+fi
+
 cd src/backend && python3 api.py